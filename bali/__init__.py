@@ -1,12 +1,33 @@
+from importlib import import_module
+
 from pydantic import BaseModel
 
-from bali.core import APIRouter, Bali, db, cache, cache_memoize
+from bali.core import db, cache, cache_memoize
 from bali.db.managers import Manager, AsyncManager
-from bali.decorators import event_handler, init_handler
-from bali.resources import Resource, ModelResource
 
 __version__ = '3.5.2'
 
+# Subsystems are imported when the attribute is accessed,
+# eg: an event worker won't import FastAPI/uvicorn/gRPC
+_LAZY_ATTRIBUTES = {
+    'APIRouter': 'bali.routing',
+    'Bali': 'bali.application',
+    'event_handler': 'bali.decorators',
+    'init_handler': 'bali.decorators',
+    'Resource': 'bali.resources',
+    'ModelResource': 'bali.resources',
+    'AsyncModelResource': 'bali.resources',
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
 
 class Schema(BaseModel):
     pass
@@ -1,9 +1,11 @@
 import re
-from typing import Callable, Any
+from typing import TYPE_CHECKING, Callable, Any
 
-from grpc import Server
 from pydantic import BaseModel
 
+if TYPE_CHECKING:
+    from grpc import Server
+
 
 def singleton(cls):
     _instance = {}
@@ -28,7 +30,7 @@ def singleton(cls):
 ServiceAdderNamePattern = re.compile(r"^add_.*_to_server$")
 
 
-def get_service_adder(module) -> Callable[[object, Server], None]:
+def get_service_adder(module) -> Callable[[object, 'Server'], None]:
     namespace = vars(module)
     for i in dir(module):
         if ServiceAdderNamePattern.match(i):
@@ -54,8 +56,19 @@ def pluralize(noun):
         return noun + 's'
 
 
-def parse_dict(item: Any, schema: BaseModel = None):
-    """Parse model instance, schema, dict to dict"""
+def parse_dict(item: Any, schema: BaseModel = None, fields=None):
+    """Parse model instance, schema, dict to dict
+
+    :param fields: sparse fieldset, only these fields are serialized,
+                   attributes of model instance out of fields are not accessed
+    """
+    if fields:
+        if isinstance(item, dict):
+            return {k: item[k] for k in fields if k in item}
+        if hasattr(item, '_sa_instance_state'):
+            return {k: getattr(item, k, None) for k in fields}
+        return item.dict(include=set(fields))
+
     if isinstance(item, dict):
         return item
 
@@ -65,6 +78,20 @@ def parse_dict(item: Any, schema: BaseModel = None):
             raise ValueError(
                 "Model instance can't parse to dict without schema"
             )
-        return schema.from_orm(item).dict()
+        from .db.serializers import get_schema_serializer
+        return get_schema_serializer(type(item), schema).to_dict(item)
 
     return item.dict()
+
+
+def get_setting(app, name, default=None):
+    """Retrieve application option
+
+    Lookup order: `Bali(**kwargs)` option, settings attribute in upper case
+    (eg: `http_workers` -> `HTTP_WORKERS`), then default value.
+    """
+    if name in app.kwargs:
+        return app.kwargs[name]
+
+    from bali import core
+    return getattr(core._settings, name.upper(), default)
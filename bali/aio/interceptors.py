@@ -2,6 +2,7 @@
 gRPC interceptors
 """
 import grpc
+import inspect
 import logging
 
 from google.protobuf import json_format
@@ -25,15 +26,102 @@ class ProcessInterceptor(ServerInterceptor):
         except Exception:
             pass
 
+    @staticmethod
+    def log(request, method_name, log_type):
+        logger.info(
+            '%s %s: %s',
+            method_name,
+            json_format.MessageToDict(
+                request, including_default_value_fields=True, preserving_proto_field_name=True
+            ),
+            log_type,
+        )
+
+    def wrap_behavior(self, behavior: Callable, method_name: str) -> Callable:
+        """Wrap unary behavior with setup/teardown
+
+        Sync behavior is executed in the migration thread pool,
+        so the scoped session must be removed in the same thread.
+        """
+        if inspect.iscoroutinefunction(behavior):
+
+            async def async_wrapper(request, context):
+                self.setup()
+                try:
+                    _settings.ENABLED_RPC_LOGGING and self.log(request, method_name, 'Request')
+                    result = await behavior(request, context)
+                    _settings.ENABLED_RPC_LOGGING and self.log(request, method_name, 'Response')
+                finally:
+                    self.teardown()
+                return result
+
+            return async_wrapper
+
+        def wrapper(request, context):
+            self.setup()
+            try:
+                _settings.ENABLED_RPC_LOGGING and self.log(request, method_name, 'Request')
+                result = behavior(request, context)
+                _settings.ENABLED_RPC_LOGGING and self.log(request, method_name, 'Response')
+            finally:
+                self.teardown()
+            return result
+
+        return wrapper
+
+    def wrap_stream_behavior(self, behavior: Callable, method_name: str) -> Callable:
+        """Wrap unary-stream behavior with setup/teardown
+
+        Teardown runs when the response stream is exhausted, fails
+        or is cancelled. Sync generators are iterated in the migration
+        thread pool, coroutine behaviors write by `context.write`.
+        """
+        if inspect.iscoroutinefunction(behavior):
+            return self.wrap_behavior(behavior, method_name)
+
+        if inspect.isasyncgenfunction(behavior):
+
+            async def async_generator_wrapper(request, context):
+                self.setup()
+                try:
+                    _settings.ENABLED_RPC_LOGGING and self.log(request, method_name, 'Request')
+                    async for response in behavior(request, context):
+                        yield response
+                    _settings.ENABLED_RPC_LOGGING and self.log(request, method_name, 'Response')
+                finally:
+                    self.teardown()
+
+            return async_generator_wrapper
+
+        def generator_wrapper(request, context):
+            self.setup()
+            try:
+                _settings.ENABLED_RPC_LOGGING and self.log(request, method_name, 'Request')
+                yield from behavior(request, context)
+                _settings.ENABLED_RPC_LOGGING and self.log(request, method_name, 'Response')
+            finally:
+                self.teardown()
+
+        return generator_wrapper
+
     async def intercept_service(
         self,
         continuation: Callable,
         handler_call_details: grpc.HandlerCallDetails,
     ) -> Any:
-        self.setup()
-        try:
-            result = await continuation(handler_call_details)
-        finally:
-            self.teardown()
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return handler
 
-        return result
+        method_name = handler_call_details.method
+        if handler.unary_unary is not None:
+            return handler._replace(
+                unary_unary=self.wrap_behavior(handler.unary_unary, method_name)
+            )
+        if handler.unary_stream is not None:
+            return handler._replace(
+                unary_stream=self.wrap_stream_behavior(
+                    handler.unary_stream, method_name
+                )
+            )
+        return handler
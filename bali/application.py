@@ -1,36 +1,127 @@
-import gzip
 import inspect
 import logging
 import sys
+import zlib
+from contextlib import contextmanager
 from importlib import import_module
-from typing import Callable
+from typing import AsyncGenerator, Callable, Optional
 
-import typer
-import uvicorn
-from fastapi import FastAPI, Request, Response
-from fastapi.middleware.gzip import GZipMiddleware
+from fastapi import FastAPI, HTTPException, Request, Response, status
 from fastapi.routing import APIRoute
-from fastapi_migrate import Migrate
 from fastapi_pagination import add_pagination
 from starlette.middleware.cors import CORSMiddleware
 
-from ._utils import singleton
-from .cli import entry
-from .middlewares import process_middleware
-from .servicer import get_servicer, make_grpc_serve
-from .utils import sync_exec
+from ._utils import get_setting, singleton
+from .executors import configure_executors
+from .middlewares import (
+    CompressionMiddleware,
+    DEFAULT_EXCLUDE_CONTENT_TYPES,
+    process_middleware,
+)
 
 logger = logging.getLogger('bali')
 
 
+# Maximum decompressed request body size, can be custom by
+# `Bali(http_max_decompressed_size=...)` or `HTTP_MAX_DECOMPRESSED_SIZE`
+DEFAULT_MAX_DECOMPRESSED_SIZE = 32 * 1024 * 1024
+# Maximum output of a single decompress step
+DECOMPRESS_CHUNK_SIZE = 64 * 1024
+
+
 class GzipRequest(Request):
-    async def body(self) -> bytes:
-        if not hasattr(self, "_body"):
-            body = await super().body()
-            if "gzip" in self.headers.getlist("Content-Encoding"):
-                body = gzip.decompress(body)
-            self._body = body
-        return self._body
+    """Request with `gzip`/`deflate` Content-Encoding support
+
+    Body is decompressed incrementally while streaming, decompressed size
+    is bounded by `max_decompressed_size`, exceeded raise 413. `deflate`
+    body is zlib wrapped or raw deflate, invalid or truncated body raise 400.
+    """
+    @classmethod
+    def from_request(cls, request):
+        """Request as `GzipRequest`, the same object if it already is"""
+        if isinstance(request, cls):
+            return request
+        return cls(request.scope, request.receive)
+
+    def get_encodings(self):
+        return {
+            encoding.strip().lower()
+            for value in self.headers.getlist("Content-Encoding")
+            for encoding in value.split(',')
+        }
+
+    def get_decompressor(self):
+        if self.get_encodings() & {'gzip', 'deflate'}:
+            # auto detect gzip or zlib header
+            return zlib.decompressobj(zlib.MAX_WBITS | 32)
+        return None
+
+    @property
+    def max_decompressed_size(self):
+        state = getattr(self.scope.get('app'), 'state', None)
+        return getattr(
+            state, 'max_decompressed_size', DEFAULT_MAX_DECOMPRESSED_SIZE
+        )
+
+    async def stream(self) -> AsyncGenerator[bytes, None]:
+        decompressor = self.get_decompressor()
+        if hasattr(self, "_body") or decompressor is None:
+            async for chunk in super().stream():
+                yield chunk
+            return
+
+        max_size = self.max_decompressed_size
+        size = 0
+        # raw input kept until decompressed, replayed as raw deflate
+        # when the header is not gzip or zlib
+        received = [] if 'deflate' in self.get_encodings() else None
+
+        def check_size(data):
+            nonlocal size
+            size += len(data)
+            if max_size and size > max_size:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail='Decompressed request body too large',
+                )
+            return data
+
+        def decompress(chunk):
+            nonlocal decompressor, received
+            if received is not None:
+                received.append(chunk)
+            while chunk:
+                try:
+                    data = decompressor.decompress(chunk, DECOMPRESS_CHUNK_SIZE)
+                except zlib.error:
+                    if not received:
+                        raise
+                    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                    chunk, received = b''.join(received), None
+                    continue
+                chunk = decompressor.unconsumed_tail
+                if data:
+                    received = None
+                    yield check_size(data)
+
+        try:
+            async for chunk in super().stream():
+                for data in decompress(chunk):
+                    yield data
+            data = decompressor.flush()
+        except zlib.error:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Invalid compressed request body',
+            )
+        if not decompressor.eof:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Incomplete compressed request body',
+            )
+        if data:
+            yield check_size(data)
+        yield b""
 
 
 class GzipRoute(APIRoute):
@@ -38,7 +129,7 @@ class GzipRoute(APIRoute):
         original_route_handler = super().get_route_handler()
 
         async def custom_route_handler(request: Request) -> Response:
-            request = GzipRequest(request.scope, request.receive)
+            request = GzipRequest.from_request(request)
             return await original_route_handler(request)
 
         return custom_route_handler
@@ -67,11 +158,18 @@ class Bali:
 
         self._app = None
 
+        # batch registration depth, pagination is finalized when exit batch
+        self._batch_depth = 0
+        self._pagination_pending = False
+
         self._pb2 = None
         self._pb2_grpc = None
         self._rpc_servicer = None
         self._proto_dir = proto_dir  # default protobuf definition directory
 
+        # Named executors for sync Resource actions
+        configure_executors(get_setting(self, 'executors'))
+
         # Create FastAPI instance ref to `self._app`
         self.http()
 
@@ -101,14 +199,25 @@ class Bali:
     def rpc_servicer(self):
         return self._rpc_servicer
 
-    def _launch_http(self):
-        uvicorn.run(
-            "main:app",
-            host=self.http_host,  # fix for docker port mapping
-            port=self.http_port,
-            reload=True,
-            access_log=True,
-            reload_excludes=['*.log'],
+    def _launch_http(self, production=False, workers=None, reuse_port=False):
+        from .launcher import run_http
+
+        run_http(
+            self,
+            production=production,
+            workers=workers,
+            reuse_port=reuse_port,
+        )
+
+    def _launch_combined(self, production=False, workers=None, reuse_port=False):
+        """Launch HTTP and RPC in one process on the same event loop"""
+        from .launcher import run_combined
+
+        run_combined(
+            self,
+            production=production,
+            workers=workers,
+            reuse_port=reuse_port,
         )
 
     async def _launch_rpc(self):
@@ -147,6 +256,8 @@ class Bali:
             ServiceServicer will compose with registered resources
 
         """
+        from .servicer import make_grpc_serve
+
         service = self.kwargs.get('rpc_service')
         if service and service.serve:
             serve = service.serve
@@ -179,14 +290,38 @@ class Bali:
         """load FastAPI to instance"""
         self._app = FastAPI(title='Bali', **self.base_settings)
         self._app.router.route_class = GzipRoute
+        self._app.state.max_decompressed_size = get_setting(
+            self, 'http_max_decompressed_size', DEFAULT_MAX_DECOMPRESSED_SIZE
+        )
 
         # routers
         for router in self.kwargs.get('routers', []):
             self._app.include_router(**router)
-        # cors
         backend_cors_origins = self.kwargs.get('backend_cors_origins')
+
+        # compression, enabled with cors when not provided (legacy behavior)
+        compression = get_setting(self, 'http_compression')
+        if compression is None:
+            compression = bool(backend_cors_origins)
+        if compression:
+            self._app.add_middleware(
+                CompressionMiddleware,
+                minimum_size=get_setting(
+                    self, 'http_compression_minimum_size', 500
+                ),
+                compresslevel=get_setting(self, 'http_compression_level', 6),
+                exclude_content_types=get_setting(
+                    self,
+                    'http_compression_exclude_content_types',
+                    DEFAULT_EXCLUDE_CONTENT_TYPES,
+                ),
+                cache_max_bytes=get_setting(
+                    self, 'http_compression_cache_max_bytes', 4 * 1024 * 1024
+                ),
+            )
+
+        # cors
         if backend_cors_origins:
-            self._app.add_middleware(GZipMiddleware)
             self._app.add_middleware(
                 CORSMiddleware,
                 allow_origins=[str(origin) for origin in backend_cors_origins],
@@ -206,6 +341,8 @@ class Bali:
             self._pb2 = import_module(pb2_path)
             self._pb2_grpc = import_module(pb2_grpc_path)
 
+            from .servicer import get_servicer
+
             # TODO: Should support service module and service class
             service = self.kwargs.get('rpc_service')
             service_classes = [
@@ -231,18 +368,46 @@ class Bali:
             rpc: bool = False,
             event: bool = False,
             shell: bool = False,
+            production: bool = False,
+            workers: Optional[int] = None,
+            reuse_port: bool = False,
+            profile_startup: bool = False,
     ):
-        """Bali App entry for version < 4.0"""
+        """Bali App entry for version < 4.0
+
+        `--production` launch HTTP without reload, with multiple workers,
+        `--workers` and `--reuse-port` only works in production mode.
+
+        `--http --rpc` serves both in one process on the same event loop.
+
+        `--profile-startup` reports import time of `main` module by modules.
+        """
+        if profile_startup:
+            from .profiling import profile_startup as profile
+            profile()
+            return
+
         if not any([http, rpc, event, shell]):
+            import typer
             typer.echo(
                 'Please provided service type: '
                 '--http / --rpc / --event / --shell'
             )
 
-        if http:
-            self._launch_http()
-
-        if rpc:
+        if http and rpc:
+            self._launch_combined(
+                production=production,
+                workers=workers,
+                reuse_port=reuse_port,
+            )
+        elif http:
+            self._launch_http(
+                production=production,
+                workers=workers,
+                reuse_port=reuse_port,
+            )
+        elif rpc:
+            from .utils import sync_exec
             sync_exec(self._launch_rpc())
 
         if event:
@@ -276,7 +441,43 @@ class Bali:
                     resource_cls.as_servicer(self)
 
         if with_http:
-            add_pagination(self._app)
+            self._pagination_pending = True
+            if not self._batch_depth:
+                self.finalize_http()
+
+    @contextmanager
+    def batch_register(self):
+        """Batch registration
+
+        Routers and servicers are built by every `register()` in the block,
+        pagination and OpenAPI are finalized once when the block exits.
+
+            ```python
+            with app.batch_register():
+                for resource in resources:
+                    app.register(resource)
+            ```
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._pagination_pending:
+                self.finalize_http()
+
+    def finalize_http(self):
+        """Add pagination to registered routes, reset OpenAPI schema
+
+        `add_pagination` wraps lifespan every call, keep the lifespan
+        installed in `http()`, so startup only paginate routes once.
+        """
+        router = self._app.router
+        lifespan_context = router.lifespan_context
+        add_pagination(self._app)
+        router.lifespan_context = lifespan_context
+        self._app.openapi_schema = None
+        self._pagination_pending = False
 
     def resolve_declarative(self):
         """Resolve declarative APIs"""
@@ -285,9 +486,13 @@ class Bali:
 
         # Resolved declarative APIs to resource
         from bali.declarative import API
-        self.register([factory() for factory in API.resources_factories])
+        with self.batch_register():
+            self.register([factory() for factory in API.resources_factories])
 
     def start(self):
+        from fastapi_migrate import Migrate
+        from .cli import entry
+
         # Integrated FastAPI-Migrate
         try:
             from bali import db
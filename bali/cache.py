@@ -3,7 +3,6 @@
 Support redis backend 
 """
 import pickle
-from redis import StrictRedis
 
 DEFAULT_TIMEOUT = 300
 
@@ -19,6 +18,7 @@ class Cache:
         self._client = None
 
     def _connect(self):
+        from redis import StrictRedis
         self._client = StrictRedis(self.host, port=self.port, password=self.password)
 
     def connect(self, host, port=6379, password=None, prefix=None):
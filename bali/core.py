@@ -1,18 +1,27 @@
 import logging.config
+from importlib import import_module
 from typing import Dict
 
 from pydantic import BaseSettings
 
-# noinspection PyUnresolvedReferences
-from .application import Bali
 from .cache import cache
 from .cache_memoize import cache_memoize
-from .db import db, transaction
-# noinspection PyUnresolvedReferences
-from .routing import APIRouter
+from .db import db
 
-# Bind transaction to db
-setattr(db, 'transaction', transaction)
+# HTTP/RPC subsystems are imported when the attribute is accessed
+_LAZY_ATTRIBUTES = {
+    'Bali': 'bali.application',
+    'APIRouter': 'bali.routing',
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
 
 
 class Settings(BaseSettings):
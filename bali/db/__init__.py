@@ -2,3 +2,6 @@ from .connection import *
 from .declarative import *
 from .models import *
 from .transaction import *
+
+# Bind transaction to db
+setattr(db, 'transaction', transaction)
@@ -4,16 +4,19 @@ DB Connection
 Expose `db` instance, bind managers to model.
 """
 
-from sqla_wrapper import SQLAlchemy, BaseModel
+from typing import TYPE_CHECKING
+
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm.decl_api import DeclarativeMeta
 
 from .models import included_models
-from .. import typing
 from ..aio.sessions import AsyncSession
 from ..exceptions import DBSetupException
 
+if TYPE_CHECKING:
+    from .. import typing
+
 # SQLA-Wrapper 4.x supported session proxy methods
 # https://github.com/jpsca/sqla-wrapper/blob/v4.200628/sqla_wrapper/session_proxy.py
 SQLA_WRAPPER_SESSION_PROXIES = (
@@ -56,6 +59,8 @@ class DB:
         session_options=None,
         **kwargs
     ):
+        # SQLA-Wrapper imports alembic, only imported when connecting
+        from sqla_wrapper import SQLAlchemy, BaseModel
 
         type_checker = TypeChecker(database_uri)
 
@@ -115,7 +120,7 @@ class DB:
             return getattr(self._db, attr)
 
 
-db: typing.DB = DB()
+db: 'typing.DB' = DB()
 
 
 class TypeChecker:
@@ -18,15 +18,13 @@ from typing import List, Dict
 import pytz
 from sqlalchemy import Column, DateTime, Boolean
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.inspection import inspect
 from sqlalchemy.orm import reconstructor
-from sqlalchemy.orm.attributes import InstrumentedAttribute
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql.functions import func
 from sqlalchemy.types import TypeDecorator
 
 from .managers import Manager, AsyncManager
+from .serializers import get_serializer
 from ..aio.sessions import session_is_async
 from ..utils import timezone
 
@@ -170,21 +168,20 @@ def get_base_model(db):
             db.s.commit() if context_auto_commit.get() else db.s.flush()
 
         def _asdict(self, **kwargs):
+            """Dict of instrumented attributes (and hybrid properties),
+            serialized by the model's compiled serializer
+
+            `include_hybrid_properties` is the only option, the other
+            keyword arguments are accepted and ignored.
+            """
             include_hybrid_properties = kwargs.setdefault(
                 "include_hybrid_properties",
                 self.__asdict_include_hybrid_properties__
             )
-
-            output_fields = []
-            for i in inspect(type(self)).all_orm_descriptors:
-                if isinstance(i, InstrumentedAttribute):
-                    output_fields.append(i.key)
-                elif isinstance(
-                    i, hybrid_property
-                ) and include_hybrid_properties:
-                    output_fields.append(i.__name__)
-
-            return {i: getattr(self, i, None) for i in output_fields}
+            serializer = get_serializer(
+                type(self), include_hybrid_properties=include_hybrid_properties
+            )
+            return serializer.to_dict(self)
 
         dict = to_dict = _asdict
 
@@ -78,6 +78,11 @@ def dj_lookup_to_sqla(expression: str) -> Tuple:
     return OPERATORS[op_name], col_name
 
 
-def dj_ordering_to_sqla(expression: str):
+def dj_ordering_to_sqla(expression: str, cls=None):
+    """Django-like ordering to SQLAlchemy, eg: `-age` to `desc('age')`
+
+    Resolved to model's column when `cls` provided.
+    """
     wrapper = desc if expression.startswith(REVERSER) else asc
-    return wrapper(expression.lstrip(REVERSER))
+    name = expression.lstrip(REVERSER)
+    return wrapper(getattr(cls, name) if cls is not None else name)
@@ -0,0 +1,225 @@
+"""Model serializers
+
+Serializers of model instances are compiled once per model and cached,
+attributes are read by `operator.attrgetter` into a dict or tuple, instead
+of walking the model's ORM descriptors on every call:
+
+    ```python
+    from bali.db.serializers import get_serializer, to_dicts
+
+    serializer = get_serializer(User, include_hybrid_properties=True)
+    serializer.to_dict(user)
+    serializer.to_tuple(user)
+
+    to_dicts(User.query().all())
+    # same as `[UserSchema.from_orm(user).dict() for user in users]`
+    to_dicts(User.query().all(), schema=UserSchema)
+    ```
+
+Values are serialized as they are read, the same as
+`getattr(instance, name, None)`: naive datetime assigned to an
+`AwareDateTime` column is not converted, attributes raising
+`AttributeError` (eg: hybrid property of a missing relationship) are `None`.
+"""
+import functools
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError
+from pydantic.fields import SHAPE_SINGLETON
+from pydantic.utils import lenient_issubclass
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+
+__all__ = [
+    'ModelSerializer',
+    'SchemaSerializer',
+    'get_schema_serializer',
+    'get_serializer',
+    'to_dicts',
+]
+
+# Schema config transforms validated values
+TRANSFORMING_CONFIGS = (
+    'anystr_lower',
+    'anystr_upper',
+    'anystr_strip_whitespace',
+    'max_anystr_length',
+    'use_enum_values',
+)
+
+
+def _make_getter(names):
+    """Getter of attributes tuple, `attrgetter` returns a scalar of one name"""
+    if len(names) == 1:
+        getter = attrgetter(names[0])
+        return lambda obj: (getter(obj), )
+    if not names:
+        return lambda obj: ()
+    return attrgetter(*names)
+
+
+def _get_python_type(column):
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return None
+
+
+class _Serializer:
+    def __init__(self, keys, attributes):
+        self.keys = tuple(keys)
+        self.attributes = tuple(attributes)
+        self._getter = _make_getter(self.attributes)
+
+    def to_tuple(self, instance) -> tuple:
+        try:
+            return self._getter(instance)
+        except AttributeError:
+            # eg: hybrid property of a missing relationship
+            return tuple(getattr(instance, i, None) for i in self.attributes)
+
+    def to_dict(self, instance) -> Dict[str, Any]:
+        return dict(zip(self.keys, self.to_tuple(instance)))
+
+    def to_tuples(self, rows: Iterable) -> List[tuple]:
+        to_tuple = self.to_tuple
+        return [to_tuple(row) for row in rows]
+
+    def to_dicts(self, rows: Iterable) -> List[Dict[str, Any]]:
+        to_dict = self.to_dict
+        return [to_dict(row) for row in rows]
+
+
+class ModelSerializer(_Serializer):
+    """Compiled serializer of model instances
+
+    :param model: model class
+    :param fields: attribute names, default are the model's instrumented
+                   attributes (same as `BaseModel._asdict`)
+    :param include_hybrid_properties: default fields include hybrid properties
+    """
+    def __init__(self, model, fields=None, include_hybrid_properties=False):
+        mapper = inspect(model)
+        if fields is None:
+            fields = []
+            for descriptor in mapper.all_orm_descriptors:
+                if isinstance(descriptor, InstrumentedAttribute):
+                    fields.append(descriptor.key)
+                elif isinstance(
+                    descriptor, hybrid_property
+                ) and include_hybrid_properties:
+                    fields.append(descriptor.__name__)
+
+        self.model = model
+        super().__init__(fields, fields)
+
+
+class SchemaSerializer(_Serializer):
+    """Compiled serializer of model instances to dicts of schema's fields,
+    same as `schema.from_orm(instance).dict()`
+
+    Column values are trusted when the field's type is the column's python
+    type, the other fields are validated. Schemas with nested schemas or root
+    validators are serialized by `from_orm`.
+    """
+    def __init__(self, model, schema):
+        mapper = inspect(model)
+        fields = list(schema.__fields__.values())
+        self.model = model
+        self.schema = schema
+        self.compiled = self._is_compilable(model, schema, fields)
+        super().__init__(
+            [field.name for field in fields],
+            [field.alias for field in fields],
+        )
+
+        columns = {attr.key: attr.columns[0] for attr in mapper.column_attrs}
+        self._validated_fields = tuple(
+            field for field in fields
+            if not self._is_trusted(field, columns.get(field.alias))
+        )
+
+    @staticmethod
+    def _is_compilable(model, schema, fields) -> bool:
+        if schema.__pre_root_validators__ or schema.__post_root_validators__:
+            return False
+        if any(getattr(schema.__config__, i, None) for i in TRANSFORMING_CONFIGS):
+            return False
+        for field in fields:
+            if lenient_issubclass(field.type_, BaseModel):
+                return False
+            if not hasattr(model, field.alias):
+                return False
+        return True
+
+    @staticmethod
+    def _is_trusted(field, column) -> bool:
+        if column is None or field.class_validators:
+            return False
+        if field.shape != SHAPE_SINGLETON:
+            return False
+        if column.nullable and not field.allow_none:
+            return False
+        return field.type_ is Any or field.type_ is _get_python_type(column)
+
+    def to_dict(self, instance, by_alias=False) -> Dict[str, Any]:
+        """Same as `schema.from_orm(instance).dict(by_alias=by_alias)`"""
+        if not self.compiled:
+            return self.schema.from_orm(instance).dict(by_alias=by_alias)
+
+        values = super().to_dict(instance)
+        for field in self._validated_fields:
+            value, errors = field.validate(
+                values[field.name], values, loc=field.alias, cls=self.schema
+            )
+            if errors:
+                raise ValidationError([errors], self.schema)
+            values[field.name] = value
+        if by_alias:
+            return dict(zip(self.attributes, values.values()))
+        return values
+
+
+@functools.lru_cache(maxsize=None)
+def get_serializer(
+    model,
+    fields: Optional[Tuple[str, ...]] = None,
+    include_hybrid_properties: bool = False,
+) -> ModelSerializer:
+    """Compiled serializer of model, cached by arguments"""
+    return ModelSerializer(model, fields, include_hybrid_properties)
+
+
+@functools.lru_cache(maxsize=None)
+def get_schema_serializer(model, schema) -> SchemaSerializer:
+    """Compiled serializer of model to schema's fields, cached by arguments"""
+    return SchemaSerializer(model, schema)
+
+
+def to_dicts(
+    rows: Iterable,
+    schema=None,
+    include_hybrid_properties: bool = False,
+) -> List[Dict[str, Any]]:
+    """Serialize model instances to dicts in bulk,
+    serializer is resolved once per model class
+
+    :param schema: dicts of schema's fields, default are model's attributes
+    """
+    serializers = {}
+    results = []
+    for row in rows:
+        model = type(row)
+        serializer = serializers.get(model)
+        if serializer is None:
+            if schema is None:
+                serializer = get_serializer(
+                    model, include_hybrid_properties=include_hybrid_properties
+                )
+            else:
+                serializer = get_schema_serializer(model, schema)
+            serializers[model] = serializer
+        results.append(serializer.to_dict(row))
+    return results
@@ -6,6 +6,7 @@ from pydantic import BaseModel, create_model
 
 from ..decorators import action
 from ..resources import Resource, GENERIC_ACTIONS
+from ..schemas import schema_registry
 
 __all__ = ["API"]
 
@@ -93,6 +94,20 @@ class ResourceFactory:
 
         return type_dict
 
+    def _create_schema(self, response):
+        """Schema of dict response, memoized in `schema_registry`
+        by resource name and field types
+
+        Fields are required, response values are examples, not defaults.
+        """
+        # noinspection PyUnresolvedReferences
+        schema_name = f"{humps.pascalize(self.resource_name)}Schema"
+        fields = {k: (type(v), ...) for k, v in response.items()}
+        key = (schema_name, tuple((k, t) for k, (t, _) in fields.items()))
+        return schema_registry.get_or_create(
+            key, lambda: create_model(schema_name, **fields)
+        )
+
     def schema(self, *args, **kwargs):
         """Declare schema
 
@@ -117,9 +132,7 @@ class ResourceFactory:
             response = response[0]
 
         if isinstance(response, dict):
-            # noinspection PyUnresolvedReferences
-            schema_name = f"{humps.pascalize(self.resource_name)}Schema"
-            self._schema = create_model(schema_name, **response)
+            self._schema = self._create_schema(response)
 
             self._dict_response_values.update(list=args[0])
 
@@ -138,9 +151,7 @@ class ResourceFactory:
             response = response[0]
 
         if isinstance(response, dict):
-            # noinspection PyUnresolvedReferences
-            schema_name = f"{humps.pascalize(self.resource_name)}Schema"
-            self._schema = create_model(schema_name, **response)
+            self._schema = self._create_schema(response)
 
             self._dict_response_values.update(get=args[0])
 
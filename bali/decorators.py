@@ -3,16 +3,7 @@ import inspect
 import json
 import logging
 import traceback
-
-from fastapi.dependencies.utils import get_typed_signature
-from fastapi_pagination import LimitOffsetParams, set_page, Page
-from pydantic import BaseModel
-
-from .events import register_callback
-from .exceptions import ReturnTypeError
-from .paginate import paginate
-from .schemas import get_schema_in
-from .utils import MessageToDict, ParseDict
+import typing
 
 logger = logging.getLogger('bali')
 
@@ -33,64 +24,8 @@ def compatible_method(func):
 
         # Put args to inner function from request object
         if self._is_rpc:
-            request_data = MessageToDict(
-                self._request,
-                including_default_value_fields=True,
-                preserving_proto_field_name=True,
-            )
-
-            if func.__name__ == 'get':
-                pk = self._request.id
-                result = await func(self, pk)
-                if not isinstance(result, dict):
-                    result = result.dict()
-                response_data = {'data': result}
-
-            elif func.__name__ == 'list':
-                schema_in = get_schema_in(func)
-                result = await func(self, schema_in(**request_data))
-                # Paginated the result queryset or iterable object
-                if isinstance(result, BaseModel):
-                    raise ReturnTypeError(
-                        'Generic actions `list` should return a sequence'
-                    )
-                else:
-                    set_page(Page)
-                    params = LimitOffsetParams(
-                        limit=request_data.get('limit') or 10,
-                        offset=request_data.get('offset'),
-                    )
-                    response_data = paginate(
-                        result, params=params, is_rpc=True
-                    )
-
-            elif func.__name__ in ['create', 'update']:
-                schema_in = get_schema_in(func)
-                data = request_data.get('data')
-                result = await func(self, schema_in(**data))
-                if not isinstance(result, dict):
-                    result = result.dict()
-                response_data = {'data': result}
-
-            elif func.__name__ == 'delete':
-                pk = self._request.id
-                result = await func(self, pk)
-                response_data = {'result': bool(result)}
-
-            else:
-                # custom action
-                schema_in = get_schema_in(func)
-                result = await func(self, schema_in(**request_data))
-                if not isinstance(result, dict):
-                    result = result.dict()
-                response_data = result
-
-            # Convert response data to gRPC response
-            return ParseDict(
-                response_data,
-                self._response_message(),
-                ignore_unknown_fields=True
-            )
+            from .resources.grpc_actions import process_async_rpc
+            return await process_async_rpc(self, func)
 
         return await func(self, *args, **kwargs)
 
@@ -109,12 +44,15 @@ def action(methods=None, detail=None, **kwargs):
     :param kwargs:
         http_only: the action only support http
         rpc_only: the action only support rpc
+        executor: named executor runs the sync action,
+                  default is Resource's `executor`
     """
     methods = ['get'] if (methods is None) else methods
     methods = [method.lower() for method in methods]
 
     http_only = kwargs.get('http_only', False)
     rpc_only = kwargs.get('rpc_only', False)
+    executor = kwargs.get('executor')
 
     class Action:
         def __init__(self, func):
@@ -122,13 +60,16 @@ def action(methods=None, detail=None, **kwargs):
 
         def __set_name__(self, owner, name):
             # replace ourself with the original method
-            setattr(owner, name, compatible_method(self.func))
+            method = compatible_method(self.func)
+            method._executor = executor
+            setattr(owner, name, method)
 
             # Append actions to Resource._actions
             # Only for http actions
             if rpc_only:
                 return
 
+            from .schemas import get_schema_in
             try:
                 schema_in_annotation = get_schema_in(self.func)
             except ValueError:
@@ -169,16 +110,14 @@ def event_handler(event_type):
                         return
                     if body.get('type') != event_type:
                         return
-                typed_signature = get_typed_signature(func)
-                signature_params = typed_signature.parameters
+                signature_params = inspect.signature(func).parameters
+                type_hints = typing.get_type_hints(func)
                 event = None
-                for param_name, param in signature_params.items():
+                for param_name in signature_params:
                     if param_name in ['self', 'cls']:
                         continue
-                    if param.annotation is not inspect._empty and isinstance(
-                        body, dict
-                    ):
-                        event = param.annotation(**body)
+                    if param_name in type_hints and isinstance(body, dict):
+                        event = type_hints[param_name](**body)
                         break
                 if not handler:
                     handler = HANDLER
@@ -187,6 +126,8 @@ def event_handler(event_type):
                 return res
             except:
                 logger.error(traceback.format_exc())
+        from .events import register_callback
+
         callback = functools.partial(wrapper, None)
         register_callback(event_type, callback)
         return wrapper
@@ -13,3 +13,8 @@ class ReturnTypeError(Exception):
 class OperatorModelError(Exception):
     """Model not provided in django-like operator"""
     pass
+
+
+class InvalidCursorError(ValueError):
+    """Pagination cursor is malformed or not supported by list result"""
+    pass
@@ -0,0 +1,224 @@
+"""
+Bulkhead executors
+
+Sync Resource actions can be assigned to named, bounded thread pools,
+so a slow action only exhausts its own pool instead of the shared one.
+
+    ```python
+    app = Bali(
+        executors={
+            'reports': {
+                'max_workers': 4,
+                'max_queue': 20,
+                'rejection_policy': 'reject',
+            },
+        },
+    )
+
+    class ReportResource(Resource):
+        # all sync actions of this resource
+        executor = 'reports'
+
+        # or a single action
+        @action(executor='reports')
+        def export(self):
+            ...
+    ```
+
+Rejection policies when workers are busy and queue is full:
+
+    - `reject`: raise `ExecutorRejectedError` (HTTP 503 / gRPC RESOURCE_EXHAUSTED)
+    - `caller_runs`: run in the caller, the shared thread pool in HTTP
+      and the gRPC server thread in RPC
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent import futures
+from typing import Dict, Optional
+
+__all__ = [
+    'BoundedExecutor',
+    'ExecutorRejectedError',
+    'configure_executor',
+    'configure_executors',
+    'get_executor',
+    'occupancy',
+]
+
+REJECT = 'reject'
+CALLER_RUNS = 'caller_runs'
+REJECTION_POLICIES = (REJECT, CALLER_RUNS)
+
+DEFAULT_MAX_WORKERS = 10
+DEFAULT_MAX_QUEUE = 100
+
+EXECUTORS: Dict[str, 'BoundedExecutor'] = {}
+_lock = threading.Lock()
+
+
+class ExecutorRejectedError(Exception):
+    pass
+
+
+class BoundedExecutor(futures.ThreadPoolExecutor):
+    """Thread pool with queue depth limit and rejection policy
+
+    :param name: executor name, used as worker threads name prefix
+    :param max_workers: worker threads count
+    :param max_queue: pending tasks limit beyond busy workers,
+                      `None` means unbounded
+    :param rejection_policy: `reject` or `caller_runs`
+    """
+    def __init__(
+        self,
+        name: str,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_queue: Optional[int] = DEFAULT_MAX_QUEUE,
+        rejection_policy: str = REJECT,
+    ):
+        if rejection_policy not in REJECTION_POLICIES:
+            raise ValueError(
+                f'Executor `{name}` rejection policy must be one of '
+                f'{REJECTION_POLICIES}, got `{rejection_policy}`'
+            )
+        super().__init__(max_workers=max_workers, thread_name_prefix=name)
+        self.name = name
+        self.max_queue = max_queue
+        self.rejection_policy = rejection_policy
+
+        self._counter_lock = threading.Lock()
+        self._pending = 0
+        self._active = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def max_workers(self):
+        return self._max_workers
+
+    def _acquire(self):
+        with self._counter_lock:
+            if (
+                self.max_queue is not None
+                and self._pending >= self._max_workers + self.max_queue
+            ):
+                self.rejected += 1
+                return False
+            self._pending += 1
+            return True
+
+    def _release(self, _):
+        with self._counter_lock:
+            self._pending -= 1
+            self.completed += 1
+
+    def _run(self, fn, *args, **kwargs):
+        with self._counter_lock:
+            self._active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._counter_lock:
+                self._active -= 1
+
+    def try_submit(self, fn, *args, **kwargs) -> Optional[futures.Future]:
+        """Submit task, returns `None` when the executor is full"""
+        if not self._acquire():
+            return None
+        try:
+            future = super().submit(self._run, fn, *args, **kwargs)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def submit(self, fn, *args, **kwargs):
+        future = self.try_submit(fn, *args, **kwargs)
+        if future is None:
+            raise ExecutorRejectedError(f'Executor `{self.name}` is full')
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        """Run `fn` in the executor and wait the result
+
+        Used by sync callers (gRPC server threads), with `caller_runs`
+        policy `fn` runs in current thread when executor is full.
+        """
+        future = self.try_submit(fn, *args, **kwargs)
+        if future is None:
+            if self.rejection_policy == CALLER_RUNS:
+                return fn(*args, **kwargs)
+            raise ExecutorRejectedError(f'Executor `{self.name}` is full')
+        return future.result()
+
+    async def run(self, fn, *args, **kwargs):
+        """Run `fn` in the executor from event loop
+
+        Context variables are copied to the worker thread, with
+        `caller_runs` policy `fn` runs in the loop's default executor
+        when executor is full.
+        """
+        context = contextvars.copy_context()
+        func = functools.partial(context.run, fn, *args, **kwargs)
+        future = self.try_submit(func)
+        if future is None:
+            if self.rejection_policy == CALLER_RUNS:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(None, func)
+            raise ExecutorRejectedError(f'Executor `{self.name}` is full')
+        return await asyncio.wrap_future(future)
+
+    def occupancy(self):
+        with self._counter_lock:
+            return {
+                'name': self.name,
+                'max_workers': self._max_workers,
+                'max_queue': self.max_queue,
+                'active': self._active,
+                'queued': self._pending - self._active,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+
+def configure_executor(name, **options) -> BoundedExecutor:
+    """Create or replace named executor
+
+    The replaced executor is not shutdown, it may be still used by a server.
+    """
+    executor = BoundedExecutor(name, **options)
+    with _lock:
+        EXECUTORS[name] = executor
+    return executor
+
+
+def configure_executors(executors: Optional[Dict[str, dict]]):
+    for name, options in (executors or {}).items():
+        configure_executor(name, **options)
+
+
+def get_executor(name) -> BoundedExecutor:
+    """Get named executor, created with default options if not configured"""
+    executor = EXECUTORS.get(name)
+    if executor is not None:
+        return executor
+
+    with _lock:
+        if name not in EXECUTORS:
+            EXECUTORS[name] = BoundedExecutor(name)
+        return EXECUTORS[name]
+
+
+def occupancy():
+    """Occupancy of all named executors
+
+        ```python
+        @app.get('/executors')
+        def executors():
+            return occupancy()
+        ```
+    """
+    return [executor.occupancy() for executor in list(EXECUTORS.values())]
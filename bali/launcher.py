@@ -0,0 +1,208 @@
+"""
+Application launcher
+
+Development mode runs a single uvicorn process with reloader,
+production mode runs multiple workers without file watching.
+
+Combined mode serves HTTP and gRPC (`grpc.aio`) on the same event loop
+in a single process, so both share DB pools and cache clients.
+
+Production options can be provided by `Bali(**kwargs)` or settings:
+
+    ```python
+    app = Bali(
+        http_workers=8,
+        http_loop='uvloop',
+        http_protocol='httptools',
+        http_keep_alive=5,
+        http_backlog=2048,
+        http_limit_concurrency=1000,
+        http_access_log=False,
+        http_reuse_port=True,
+    )
+    ```
+"""
+import asyncio
+import importlib.util
+import inspect
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+
+import uvicorn
+
+from ._utils import get_setting
+from .servicer import make_grpc_aio_server
+
+logger = logging.getLogger('bali')
+
+# uvicorn application import string, must be a string to enable
+# reload and workers
+HTTP_APP = 'main:app'
+
+
+def _installed(module):
+    return importlib.util.find_spec(module) is not None
+
+
+def get_http_options(app, production=False, workers=None):
+    """Build uvicorn options
+
+    :param app: Bali application
+    :param production: production mode, disabled reload and file watcher
+    :param workers: worker processes count, CLI `--workers` has
+                    higher priority than settings
+    """
+    options = {
+        'host': app.http_host,  # fix for docker port mapping
+        'port': app.http_port,
+    }
+
+    if not production:
+        options.update(
+            reload=True,
+            access_log=True,
+            reload_excludes=['*.log'],
+        )
+        return options
+
+    default_loop = 'uvloop' if _installed('uvloop') else 'auto'
+    default_protocol = 'httptools' if _installed('httptools') else 'auto'
+    workers = workers or get_setting(app, 'http_workers')
+
+    options.update(
+        workers=workers or os.cpu_count() or 1,
+        loop=get_setting(app, 'http_loop', default_loop),
+        http=get_setting(app, 'http_protocol', default_protocol),
+        access_log=get_setting(app, 'http_access_log', False),
+        timeout_keep_alive=get_setting(app, 'http_keep_alive', 5),
+        backlog=get_setting(app, 'http_backlog', 2048),
+        limit_concurrency=get_setting(app, 'http_limit_concurrency'),
+    )
+    return options
+
+
+def bind_reuse_port(host, port):
+    """Bind a socket with `SO_REUSEPORT`
+
+    Each worker binds its own socket, the kernel balances incoming
+    connections across workers instead of waking all of them.
+    """
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host.strip('[]'), port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve_worker(options):
+    config = uvicorn.Config(HTTP_APP, **options)
+    sock = bind_reuse_port(config.host, config.port)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve_reuse_port(options):
+    """Prefork workers, each one listens on a `SO_REUSEPORT` socket"""
+    options = dict(options)
+    workers = options.pop('workers')
+
+    context = multiprocessing.get_context('spawn')
+    processes = []
+    for _ in range(workers):
+        process = context.Process(target=_serve_worker, args=(options, ))
+        process.start()
+        processes.append(process)
+
+    logger.info(
+        'HTTP Service started %s workers on %s:%s (SO_REUSEPORT)',
+        workers, options['host'], options['port']
+    )
+
+    def shutdown(*_):
+        for p in processes:
+            p.terminate()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    for process in processes:
+        process.join()
+
+
+def run_http(app, production=False, workers=None, reuse_port=False):
+    options = get_http_options(app, production=production, workers=workers)
+
+    reuse_port = reuse_port or get_setting(app, 'http_reuse_port', False)
+    if production and reuse_port and hasattr(socket, 'SO_REUSEPORT'):
+        serve_reuse_port(options)
+    else:
+        uvicorn.run(HTTP_APP, **options)
+
+
+# noinspection PyProtectedMember
+async def serve_combined(app, http_server):
+    """Serve HTTP and gRPC in the running event loop
+
+    uvicorn handles the shutdown signals, after HTTP server exited,
+    gRPC server is stopped with `rpc_shutdown_grace` seconds grace.
+    """
+    rpc_server, rpc_task = None, None
+
+    service = app.kwargs.get('rpc_service')
+    serve = getattr(service, 'serve', None)
+    if serve:
+        if not inspect.iscoroutinefunction(serve):
+            raise Exception(
+                'Combined mode requires `rpc_service.serve` '
+                'to be a coroutine function'
+            )
+        rpc_task = asyncio.ensure_future(serve())
+    elif app._rpc_servicer:
+        rpc_server = make_grpc_aio_server(app)
+        await rpc_server.start()
+        logger.info(
+            "RPC Service started on %s:%s (combined)",
+            app.rpc_host, app.rpc_port
+        )
+
+    try:
+        await http_server.serve()
+    finally:
+        if rpc_server:
+            await rpc_server.stop(get_setting(app, 'rpc_shutdown_grace', 5))
+        if rpc_task:
+            rpc_task.cancel()
+
+
+def run_combined(app, production=False, workers=None, reuse_port=False):
+    """Launch HTTP and RPC in one process, reload and workers are disabled
+
+    `workers` and `reuse_port` (arguments or settings) are ignored
+    with a warning.
+    """
+    if production:
+        workers = workers or get_setting(app, 'http_workers')
+    reuse_port = reuse_port or get_setting(app, 'http_reuse_port', False)
+    ignored = [
+        name for name, value in (
+            ('workers', workers and workers > 1),
+            ('reuse_port', reuse_port),
+        ) if value
+    ]
+    if ignored:
+        logger.warning(
+            'Combined mode serves in a single process, %s ignored',
+            ', '.join(ignored)
+        )
+
+    options = get_http_options(app, production=production)
+    for option in ('workers', 'reload', 'reload_excludes'):
+        options.pop(option, None)
+
+    config = uvicorn.Config(app, **options)
+    config.setup_event_loop()
+    asyncio.run(serve_combined(app, uvicorn.Server(config)))
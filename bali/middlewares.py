@@ -1,7 +1,22 @@
 """
 FastAPI middleware
 """
+import hashlib
+import zlib
+from collections import OrderedDict
+
 from fastapi import Request
+from starlette.datastructures import Headers, MutableHeaders
+
+# Already compressed content types are not compressed again
+DEFAULT_EXCLUDE_CONTENT_TYPES = (
+    'image/',
+    'video/',
+    'audio/',
+    'application/zip',
+    'application/gzip',
+    'application/x-gzip',
+)
 
 
 async def process_middleware(request: Request, call_next):
@@ -20,3 +35,156 @@ async def process_middleware(request: Request, call_next):
             db.s.remove()
         except Exception:
             pass
+
+
+class CompressionMiddleware:
+    """GZip response compression
+
+    Compared with Starlette `GZipMiddleware`:
+        - content types can be excluded
+        - complete responses' compressed bytes are cached (LRU, bounded by
+          `cache_max_bytes` of compressed bytes) keyed by body digest,
+          responses that repeat are compressed only once
+        - streaming responses are flushed (`Z_SYNC_FLUSH`) per chunk,
+          chunks are not buffered by the compressor
+    """
+    def __init__(
+        self,
+        app,
+        minimum_size=500,
+        compresslevel=6,
+        exclude_content_types=DEFAULT_EXCLUDE_CONTENT_TYPES,
+        cache_max_bytes=4 * 1024 * 1024,
+        cache_max_body_size=1024 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.exclude_content_types = tuple(exclude_content_types)
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_max_body_size = cache_max_body_size
+
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            headers = Headers(scope=scope)
+            if 'gzip' in headers.get('Accept-Encoding', ''):
+                responder = CompressionResponder(self, send)
+                await self.app(scope, receive, responder)
+                return
+
+        await self.app(scope, receive, send)
+
+    def is_excluded(self, content_type):
+        return content_type.startswith(self.exclude_content_types)
+
+    def _compress(self, body):
+        compressor = zlib.compressobj(
+            self.compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+        return compressor.compress(body) + compressor.flush()
+
+    def compress(self, body):
+        """Compress complete body, cached by body digest"""
+        if not self.cache_max_bytes or len(body) > self.cache_max_body_size:
+            return self._compress(body)
+
+        key = hashlib.blake2b(body, digest_size=16).digest()
+        compressed = self._cache.get(key)
+        if compressed is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(key)
+            return compressed
+
+        self.cache_misses += 1
+        compressed = self._compress(body)
+        if len(compressed) > self.cache_max_bytes:
+            return compressed
+
+        self._cache[key] = compressed
+        self._cache_bytes += len(compressed)
+        while self._cache_bytes > self.cache_max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+        return compressed
+
+
+class CompressionResponder:
+    def __init__(self, middleware, send):
+        self.middleware = middleware
+        self.send = send
+        self.initial_message = None
+        self.started = False
+        self.passthrough = False
+        self.compressor = None
+
+    async def __call__(self, message):
+        message_type = message['type']
+        if message_type == 'http.response.start':
+            self.initial_message = message
+            headers = Headers(raw=message['headers'])
+            self.passthrough = (
+                'content-encoding' in headers or
+                self.middleware.is_excluded(headers.get('content-type', ''))
+            )
+            return
+
+        if message_type != 'http.response.body' or self.passthrough:
+            await self.start()
+            await self.send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self.compressor:
+            # streaming response
+            await self.send({
+                'type': 'http.response.body',
+                'body': self.compress_chunk(body, more_body),
+                'more_body': more_body,
+            })
+            return
+
+        if not more_body:
+            # complete response
+            if len(body) >= self.middleware.minimum_size:
+                body = self.middleware.compress(body)
+                headers = self.compressed_headers()
+                headers['Content-Length'] = str(len(body))
+            await self.start()
+            await self.send({'type': 'http.response.body', 'body': body})
+            return
+
+        # first chunk of streaming response
+        self.compressor = zlib.compressobj(
+            self.middleware.compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+        headers = self.compressed_headers()
+        del headers['Content-Length']
+        await self.start()
+        await self.send({
+            'type': 'http.response.body',
+            'body': self.compress_chunk(body, True),
+            'more_body': True,
+        })
+
+    def compress_chunk(self, body, more_body):
+        """Compress chunk of streaming response, flushed to be sent now"""
+        mode = zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH
+        return self.compressor.compress(body) + self.compressor.flush(mode)
+
+    def compressed_headers(self):
+        headers = MutableHeaders(raw=self.initial_message['headers'])
+        headers['Content-Encoding'] = 'gzip'
+        headers.add_vary_header('Accept-Encoding')
+        return headers
+
+    async def start(self):
+        if not self.started:
+            self.started = True
+            await self.send(self.initial_message)
@@ -1,28 +1,498 @@
+"""
+Bali paginate
+
+List results are paginated by limit/offset, SQLAlchemy queries also
+support keyset (cursor) pagination, keyed on the query's ordering
+columns and the primary key:
+
+    - HTTP: `GET /items?limit=20`, response's `next_cursor` is passed
+      to the next request, `GET /items?limit=20&cursor=<next_cursor>`
+    - gRPC: `ListRequest.page_token` and `ListResponse.next_page_token`
+
+Cursor pages skip `OFFSET` scans and the total count query.
+
+Total count of query is counted by count policy:
+
+    - `exact`: `COUNT(*)` of the filtered query, the default
+    - `none`: skipped, the page only tells `has_more`
+    - `estimated`: rows estimated by query planner (PostgreSQL and MySQL),
+      other dialects fall back to exact count
+    - `cached`: exact count cached in `bali.cache`, keyed by the filters
+
+`Select` statements of async resources are paginated by `async_paginate`
+on `db.async_session`, with the same cursor and count policies.
+"""
+import base64
+import contextlib
+import datetime
+import decimal
+import hashlib
+import json
+import logging
+import uuid
+from itertools import islice
+from typing import Any, Dict, Generic, Optional, TypeVar
+
 from pydantic import BaseModel
+from fastapi_pagination import (
+    LimitOffsetPage,
+    create_page,
+    resolve_params,
+    set_page,
+)
 from fastapi_pagination import paginate as default_paginate
 from fastapi_pagination.ext.sqlalchemy import paginate as sqlalchemy_paginate
+from sqlalchemy import and_, func, inspect, or_, select
+from sqlalchemy.exc import NoInspectionAvailable
+from sqlalchemy.sql import Select, operators
+from sqlalchemy.sql.elements import UnaryExpression
+from sqlalchemy.sql.schema import Column
 
 from ._utils import parse_dict
-from .exceptions import ReturnTypeError
+from .exceptions import InvalidCursorError, ReturnTypeError
 
+T = TypeVar('T')
 
-def paginate(sequence, params=None, is_rpc=False, model_schema=None):
-    if isinstance(sequence, BaseModel):
-        raise ReturnTypeError('Paginate should return a sequence')
+logger = logging.getLogger('bali')
+
+# Count policies of query total
+COUNT_EXACT = 'exact'
+COUNT_NONE = 'none'  # skipped, `has_more` only
+COUNT_ESTIMATED = 'estimated'  # query planner statistics
+COUNT_CACHED = 'cached'  # exact count cached by filters
+COUNT_POLICIES = (COUNT_EXACT, COUNT_NONE, COUNT_ESTIMATED, COUNT_CACHED)
+
+COUNT_CACHE_TIMEOUT = 60
+
+# Dialects ordering NULLs as greater than any value, others order them least
+NULLS_GREATEST_DIALECTS = ('postgresql', 'oracle')
+
+
+class CursorLimitOffsetPage(LimitOffsetPage[T], Generic[T]):
+    """Limit/offset page with the next page's cursor"""
+    next_cursor: Optional[str] = None
+    has_more: Optional[bool] = None
+
+
+# Page of sparse fieldset items
+SparseLimitOffsetPage = CursorLimitOffsetPage[Dict[str, Any]]
+
+
+class RawLimitOffsetPage(CursorLimitOffsetPage[Any]):
+    """Page of serialized items, created without validation"""
+    @classmethod
+    def create(cls, items, params, *, total=None, **kwargs):
+        raw_params = params.to_raw_params().as_limit_offset()
+        return cls.construct(
+            total=total,
+            items=items,
+            limit=raw_params.limit,
+            offset=raw_params.offset,
+            **kwargs,
+        )
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+def _decode_value(column, value):
+    if value is None:
+        return value
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+
+    if python_type is datetime.datetime:
+        return datetime.datetime.fromisoformat(value)
+    if python_type is datetime.date:
+        return datetime.date.fromisoformat(value)
+    if python_type is datetime.time:
+        return datetime.time.fromisoformat(value)
+    if python_type is decimal.Decimal:
+        return decimal.Decimal(value)
+    if python_type is uuid.UUID:
+        return uuid.UUID(value)
+    return value
+
+
+def encode_cursor(values) -> str:
+    data = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str, keys) -> list:
+    """Decode cursor to values of keyset columns
+
+    :param token: cursor from `encode_cursor`
+    :param keys: keyset `(column, descending)` pairs of the query
+    """
+    try:
+        padding = '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(token + padding))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError('keyset columns mismatch')
+        return [_decode_value(c, v) for (c, _), v in zip(keys, values)]
+    except (ValueError, TypeError) as ex:
+        raise InvalidCursorError(f'Invalid cursor `{token}`') from ex
+
+
+def _column_key(column):
+    return column.table.name, column.name
+
+
+def get_keyset(query):
+    """Keyset columns of query or `Select`, `None` when cursor is not supported
+
+    Keyset is the query's ordering columns appended with primary key,
+    the query without ordering is ordered by primary key. The ordering is
+    kept as is, NULLs of nullable columns are in the dialect's native order
+    (see `keyset_filter`).
+
+    :returns: `(query, keys)`, keys are `(column, descending)` pairs
+    """
+    entities = query.column_descriptions
+    if len(entities) != 1:
+        return query, None
+    try:
+        mapper = inspect(entities[0]['entity'])
+    except NoInspectionAvailable:
+        return query, None
+    if not getattr(mapper, 'is_mapper', False):
+        return query, None
+
+    keys = []
+    for clause in query._order_by_clauses:
+        descending = False
+        if isinstance(clause, UnaryExpression):
+            if clause.modifier not in (operators.asc_op, operators.desc_op):
+                return query, None  # nulls first / last
+            descending = clause.modifier is operators.desc_op
+            clause = clause.element
+        if not isinstance(clause, Column):
+            return query, None
+        keys.append((clause, descending))
 
-    # determine paginator type
-    if isinstance(sequence, list):
-        paginator_func = default_paginate
+    ordered = {_column_key(c) for c, _ in keys}
+    tie_breakers = [
+        c for c in mapper.primary_key if _column_key(c) not in ordered
+    ]
+    if tie_breakers:
+        query = query.order_by(*tie_breakers)
+        keys.extend((c, False) for c in tie_breakers)
 
+    return query, keys
+
+
+def _get_attribute_getter(query, keys):
+    mapper = inspect(query.column_descriptions[0]['entity'])
+    attributes = {}
+    for prop in mapper.column_attrs:
+        for column in prop.columns:
+            if isinstance(column, Column):
+                attributes[_column_key(column)] = prop.key
+
+    names = [attributes.get(_column_key(c), c.key) for c, _ in keys]
+    return lambda item: [getattr(item, name) for name in names]
+
+
+def _equals(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def keyset_filter(keys, values, dialect=None):
+    """Rows after the cursor, eg: `a > x OR (a = x AND b > y)`
+
+    NULLs of nullable columns follow the dialect's native ordering, greatest
+    on `NULLS_GREATEST_DIALECTS` and least on the others (SQLite, MySQL).
+    """
+    nulls_greatest = getattr(dialect, 'name', None) in NULLS_GREATEST_DIALECTS
+    clauses = []
+    for i, (column, descending) in enumerate(keys):
+        value = values[i]
+        nulls_after = nulls_greatest != descending
+        if value is None:
+            if nulls_after:
+                continue  # no rows after NULL
+            after = column.isnot(None)
+        else:
+            after = column < value if descending else column > value
+            if column.nullable and nulls_after:
+                after = or_(after, column.is_(None))
+        equals = [_equals(c, v) for (c, _), v in zip(keys[:i], values[:i])]
+        clauses.append(and_(*equals, after))
+    return or_(*clauses)
+
+
+def _exact_count(query):
+    return query.order_by(None).count()
+
+
+def estimate_count(query) -> Optional[int]:
+    """Estimated rows count from query planner statistics
+
+    Supports PostgreSQL and MySQL, returns `None` for other dialects.
+    """
+    return _estimate_statement_count(
+        query.session, query.order_by(None).statement
+    )
+
+
+def _estimate_statement_count(session, statement) -> Optional[int]:
+    dialect = session.get_bind().dialect
+    compiled = statement.compile(dialect=dialect)
+    if compiled.positiontup:
+        params = tuple(compiled.params[k] for k in compiled.positiontup)
     else:
-        paginator_func = sqlalchemy_paginate
+        params = compiled.params
+
+    connection = session.connection()
+    if dialect.name == 'postgresql':
+        plan = connection.exec_driver_sql(
+            f'EXPLAIN (FORMAT JSON) {compiled}', params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    if dialect.name == 'mysql':
+        row = connection.exec_driver_sql(f'EXPLAIN {compiled}', params).first()
+        return int(row._mapping['rows'] or 0)
+
+    return None
+
+
+def get_count_cache_key(query) -> str:
+    """Cache key of query count, keyed by the filtered statement"""
+    return _get_statement_cache_key(
+        query.order_by(None).statement, query.session.get_bind().dialect
+    )
+
+
+def _get_statement_cache_key(statement, dialect) -> str:
+    compiled = statement.compile(dialect=dialect)
+    filters = f'{compiled}:{sorted(compiled.params.items())!r}'
+    digest = hashlib.md5(filters.encode('utf-8')).hexdigest()
+    return f'paginate_count:{digest}'
+
+
+def cached_count(query, timeout=COUNT_CACHE_TIMEOUT):
+    from .core import cache
+
+    if not cache.configured:
+        logger.warning('Count policy `cached` without cache, use exact count')
+        return _exact_count(query)
+
+    key = get_count_cache_key(query)
+    total = cache.get(key)
+    if total is None:
+        total = _exact_count(query)
+        cache.set(key, total, timeout)
+    return total
+
+
+def get_count(query, count_policy, count_timeout=COUNT_CACHE_TIMEOUT):
+    """Total count by count policy, `None` when count is skipped"""
+    if count_policy == COUNT_NONE:
+        return None
+    if count_policy == COUNT_ESTIMATED:
+        total = estimate_count(query)
+        return _exact_count(query) if total is None else total
+    if count_policy == COUNT_CACHED:
+        return cached_count(query, count_timeout)
+    return _exact_count(query)
+
+
+def get_page_total(
+    query,
+    page_token='',
+    count_policy=COUNT_EXACT,
+    count_timeout=COUNT_CACHE_TIMEOUT,
+):
+    """Total of the page as paginated by `paginate`, cursor pages skip
+    exact count
+    """
+    if page_token and count_policy == COUNT_EXACT:
+        return None
+    return get_count(query, count_policy, count_timeout)
+
+
+def get_page_key(
+    query,
+    params=None,
+    page_token='',
+    count_policy=COUNT_EXACT,
+    total=None,
+) -> tuple:
+    """Parameters of the page besides its rows, validators of the page
+    (eg: ETag) vary by them: ordering, limit, offset or cursor, count policy
+    and total
+    """
+    raw_params = resolve_params(params).to_raw_params().as_limit_offset()
+    ordering = tuple(str(clause) for clause in query._order_by_clauses)
+    offset = None if page_token else raw_params.offset
+    return ordering, raw_params.limit, offset, page_token, count_policy, total
+
 
-    if params:
-        paginator = paginator_func(sequence, params)
+def page_rows(query, params=None, page_token=''):
+    """Rows of the page as paginated by `paginate`, without counting"""
+    query, keys = get_keyset(query)
+    params = resolve_params(params)
+    raw_params = params.to_raw_params().as_limit_offset()
+    if page_token:
+        if keys is None:
+            raise InvalidCursorError('List result does not support cursor')
+        values = decode_cursor(page_token, keys)
+        dialect = query.session.get_bind().dialect
+        query = query.filter(keyset_filter(keys, values, dialect))
     else:
-        paginator = paginator_func(sequence)
+        query = query.offset(raw_params.offset)
+    return query.limit(raw_params.limit).all()
 
+
+def _paginate_query(
+    query,
+    params,
+    page_token,
+    count_policy,
+    count_timeout,
+    transformer,
+    on_page_rows,
+):
+    query, keys = get_keyset(query)
+    if keys is None and page_token:
+        raise InvalidCursorError('List result does not support cursor')
+
+    params = resolve_params(params)
+    raw_params = params.to_raw_params().as_limit_offset()
+    if count_policy == COUNT_EXACT and not page_token:
+        rows = []
+
+        def capture(items):
+            rows.extend(items)
+            return transformer(items) if transformer else items
+
+        page = sqlalchemy_paginate(query, params, transformer=capture)
+        has_more = (raw_params.offset or 0) + len(rows) < (page.total or 0)
+    else:
+        # Fetch one more row to know whether there is a next page,
+        # cursor pages skip exact count
+        if page_token:
+            values = decode_cursor(page_token, keys)
+            dialect = query.session.get_bind().dialect
+            rows_query = query.filter(keyset_filter(keys, values, dialect))
+        else:
+            rows_query = query.offset(raw_params.offset)
+        total = get_page_total(query, page_token, count_policy, count_timeout)
+
+        rows = rows_query.limit(raw_params.limit + 1).all()
+        has_more = len(rows) > raw_params.limit
+        rows = rows[:raw_params.limit]
+        items = transformer(rows) if transformer else rows
+        page = create_page(items, total=total, params=params)
+
+    if on_page_rows is not None:
+        on_page_rows(rows)
+
+    return page, _get_next_cursor(query, keys, rows, has_more), has_more
+
+
+def _get_next_cursor(query, keys, rows, has_more):
+    if not (keys and has_more and rows):
+        return None
+    get_values = _get_attribute_getter(query, keys)
+    return encode_cursor(get_values(rows[-1]))
+
+
+def paginate(
+    sequence,
+    params=None,
+    is_rpc=False,
+    model_schema=None,
+    page_token='',
+    count_policy=COUNT_EXACT,
+    count_timeout=COUNT_CACHE_TIMEOUT,
+    fields=None,
+    on_page_rows=None,
+    serializer=None,
+):
+    """Paginate list result
+
+    :param page_token: cursor of the page, from previous page's `next_cursor`
+    :param count_policy: how query total is counted, one of `COUNT_POLICIES`
+    :param count_timeout: cache timeout (seconds) of `cached` count policy
+    :param fields: sparse fieldset, items are paginated as dicts of the fields
+    :param on_page_rows: called with page's query rows before serialized
+    :param serializer: items are paginated as `serializer(item)`,
+                       the page is not validated
+    """
+    _validate_paginate(sequence, count_policy)
+    transformer, page_context = _get_transformer(fields, serializer)
+    next_cursor = None
+    with page_context:
+        if isinstance(sequence, list):
+            if page_token:
+                raise InvalidCursorError('List result does not support cursor')
+            params = resolve_params(params)
+            offset = params.to_raw_params().as_limit_offset().offset or 0
+            paginator = default_paginate(
+                sequence, params, transformer=transformer
+            )
+            has_more = offset + len(paginator.items) < len(sequence)
+        else:
+            paginator, next_cursor, has_more = _paginate_query(
+                sequence,
+                params,
+                page_token,
+                count_policy,
+                count_timeout,
+                transformer,
+                on_page_rows,
+            )
+
+    return _to_response(paginator, next_cursor, has_more, is_rpc, model_schema)
+
+
+def _validate_paginate(sequence, count_policy):
+    if isinstance(sequence, BaseModel):
+        raise ReturnTypeError('Paginate should return a sequence')
+    if count_policy not in COUNT_POLICIES:
+        raise ValueError(
+            f'Count policy must be one of {COUNT_POLICIES}, got `{count_policy}`'
+        )
+
+
+def _get_transformer(fields, serializer=None):
+    """Items transformer and page class context of sparse fieldset
+    or items serializer
+    """
+    if serializer is not None:
+        def serialize(items):
+            return [serializer(item) for item in items]
+
+        return serialize, set_page(RawLimitOffsetPage)
+
+    if not fields:
+        return None, contextlib.nullcontext()
+
+    # items out of fields are not accessed, and not validated by the schema
+    def transformer(items):
+        return [parse_dict(item, fields=fields) for item in items]
+
+    return transformer, set_page(SparseLimitOffsetPage)
+
+
+def _to_response(paginator, next_cursor, has_more, is_rpc, model_schema):
     if not is_rpc:
+        if 'next_cursor' in paginator.__fields__:
+            paginator.next_cursor = next_cursor
+        if 'has_more' in paginator.__fields__:
+            paginator.has_more = has_more
         return paginator
 
     response_data = paginator.dict()
@@ -35,6 +505,241 @@ def paginate(sequence, params=None, is_rpc=False, model_schema=None):
         count=response_data.get('total'),
         items=items,
         data=items,
+        next_page_token=next_cursor or '',
+        has_more=has_more,
     )
 
     return response_data
+
+
+# --- Async pagination of `Select` statements ---
+async def _async_exact_count(session, statement):
+    count_statement = select(func.count()).select_from(
+        statement.order_by(None).subquery()
+    )
+    return (await session.execute(count_statement)).scalar()
+
+
+async def _async_cached_count(session, statement, timeout):
+    from starlette.concurrency import run_in_threadpool
+
+    from .core import cache
+
+    if not cache.configured:
+        logger.warning('Count policy `cached` without cache, use exact count')
+        return await _async_exact_count(session, statement)
+
+    key = _get_statement_cache_key(
+        statement.order_by(None), session.bind.dialect
+    )
+    total = await run_in_threadpool(cache.get, key)
+    if total is None:
+        total = await _async_exact_count(session, statement)
+        await run_in_threadpool(cache.set, key, total, timeout)
+    return total
+
+
+async def async_get_count(
+    session,
+    statement,
+    count_policy,
+    count_timeout=COUNT_CACHE_TIMEOUT,
+):
+    """Total count of `Select` by count policy, `None` when count is skipped"""
+    if count_policy == COUNT_NONE:
+        return None
+    if count_policy == COUNT_ESTIMATED:
+        total = await session.run_sync(
+            _estimate_statement_count, statement.order_by(None)
+        )
+        if total is not None:
+            return total
+    elif count_policy == COUNT_CACHED:
+        return await _async_cached_count(session, statement, count_timeout)
+    return await _async_exact_count(session, statement)
+
+
+def _get_async_session(statement):
+    """New async session of the statement's model, eg: `db.async_session()`"""
+    try:
+        model = inspect(statement.column_descriptions[0]['entity']).class_
+        return model._db.async_session()
+    except (AttributeError, IndexError, NoInspectionAvailable):
+        raise ValueError('Async session is required to paginate the statement')
+
+
+async def _fetch_page_rows(
+    session,
+    statement,
+    keys,
+    raw_params,
+    page_token,
+    count_policy,
+    count_timeout,
+):
+    # Fetch one more row to know whether there is a next page,
+    # cursor pages skip exact count
+    if page_token:
+        values = decode_cursor(page_token, keys)
+        rows_statement = statement.filter(
+            keyset_filter(keys, values, session.bind.dialect)
+        )
+        total = None
+        if count_policy != COUNT_EXACT:
+            total = await async_get_count(
+                session, statement, count_policy, count_timeout
+            )
+    else:
+        rows_statement = statement.offset(raw_params.offset)
+        total = await async_get_count(
+            session, statement, count_policy, count_timeout
+        )
+
+    result = await session.execute(rows_statement.limit(raw_params.limit + 1))
+    return result.scalars().all(), total
+
+
+async def async_paginate(
+    statement,
+    params=None,
+    is_rpc=False,
+    model_schema=None,
+    page_token='',
+    count_policy=COUNT_EXACT,
+    count_timeout=COUNT_CACHE_TIMEOUT,
+    fields=None,
+    on_page_rows=None,
+    serializer=None,
+    session=None,
+):
+    """Paginate `Select` statement on async session, the event loop is
+    not blocked by the count and rows queries
+
+    Arguments are the same as `paginate`, `session` defaults to
+    a new `async_session()` of the statement's model.
+    """
+    _validate_paginate(statement, count_policy)
+    if not isinstance(statement, Select):
+        return paginate(
+            statement,
+            params,
+            is_rpc=is_rpc,
+            model_schema=model_schema,
+            page_token=page_token,
+            count_policy=count_policy,
+            count_timeout=count_timeout,
+            fields=fields,
+            on_page_rows=on_page_rows,
+            serializer=serializer,
+        )
+
+    statement, keys = get_keyset(statement)
+    if keys is None and page_token:
+        raise InvalidCursorError('List result does not support cursor')
+
+    params = resolve_params(params)
+    raw_params = params.to_raw_params().as_limit_offset()
+    args = (statement, keys, raw_params, page_token, count_policy, count_timeout)
+    if session is None:
+        async with _get_async_session(statement) as session:
+            rows, total = await _fetch_page_rows(session, *args)
+    else:
+        rows, total = await _fetch_page_rows(session, *args)
+
+    has_more = len(rows) > raw_params.limit
+    rows = rows[:raw_params.limit]
+    if on_page_rows is not None:
+        on_page_rows(rows)
+
+    transformer, page_context = _get_transformer(fields, serializer)
+    with page_context:
+        items = transformer(rows) if transformer else rows
+        paginator = create_page(items, total=total, params=params)
+
+    next_cursor = _get_next_cursor(statement, keys, rows, has_more)
+    return _to_response(paginator, next_cursor, has_more, is_rpc, model_schema)
+
+
+STREAM_CHUNK_SIZE = 500
+
+
+def iter_chunks(
+    sequence,
+    offset=0,
+    limit=0,
+    model_schema=None,
+    chunk_size=STREAM_CHUNK_SIZE,
+    fields=None,
+):
+    """Iterate list result by chunks of dicts
+
+    SQLAlchemy query is fetched by `yield_per`,
+    only one chunk of rows is in memory at a time.
+    """
+    if isinstance(sequence, BaseModel):
+        raise ReturnTypeError('Stream list should return a sequence')
+
+    if hasattr(sequence, 'yield_per'):
+        if offset:
+            sequence = sequence.offset(offset)
+        if limit:
+            sequence = sequence.limit(limit)
+        rows = sequence.yield_per(chunk_size)
+    else:
+        rows = islice(sequence, offset or 0, (offset + limit) if limit else None)
+
+    chunk = []
+    for row in rows:
+        chunk.append(parse_dict(row, schema=model_schema, fields=fields))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+async def async_iter_chunks(
+    sequence,
+    offset=0,
+    limit=0,
+    model_schema=None,
+    chunk_size=STREAM_CHUNK_SIZE,
+    fields=None,
+    session=None,
+):
+    """Iterate list result of async action by chunks of dicts
+
+    `Select` statement is streamed on async session by `yield_per`,
+    the other results are iterated by `iter_chunks`.
+    """
+    if not isinstance(sequence, Select):
+        for chunk in iter_chunks(
+            sequence, offset, limit, model_schema, chunk_size, fields
+        ):
+            yield chunk
+        return
+
+    statement = sequence
+    if offset:
+        statement = statement.offset(offset)
+    if limit:
+        statement = statement.limit(limit)
+    statement = statement.execution_options(yield_per=chunk_size)
+
+    async def stream(session):
+        result = await session.stream(statement)
+        async for rows in result.scalars().partitions(chunk_size):
+            yield [
+                parse_dict(row, schema=model_schema, fields=fields)
+                for row in rows
+            ]
+
+    if session is not None:
+        async for chunk in stream(session):
+            yield chunk
+        return
+
+    async with _get_async_session(sequence) as session:
+        async for chunk in stream(session):
+            yield chunk
@@ -1,17 +1,136 @@
-from pydantic import BaseModel
+"""Permissions
+
+Permission classes are checked before HTTP actions, in declared order.
+`process_auth` resolves the request's principal to `resource.auth`,
+`has_permission` decides whether the request is allowed.
+
+Both methods can be `async`, the auth is resolved once per request and shared
+by permission classes inherited the same `process_auth`:
+
+    ```python
+    class TokenAuth(BasePermission):
+        # decoded principals are cached by token for 60 seconds
+        auth_cache_timeout = 60
+
+        async def process_auth(self):
+            self.resource.auth = await decode_token(self.get_token())
+
+
+    class IsAuthenticated(TokenAuth):
+        def has_permission(self):
+            return self.resource.auth.user_id is not None
+
+
+    class IsAdmin(TokenAuth):
+        def has_permission(self):
+            return self.resource.auth.is_admin
+    ```
+"""
+import copy
+import hashlib
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+__all__ = ['AuthCache', 'BasePermission', 'auth_cache']
+
+
+class AuthCache:
+    """In-process TTL cache of resolved principals
+
+    :param maxsize: entries limit, the least recently used are evicted
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+auth_cache = AuthCache()
 
 
 class BasePermission:
     """
     A base class from which all permission classes should inherit.
     """
+
+    # Cache `resource.auth` resolved by `process_auth` in process for seconds,
+    # keyed by request's token, `None` disables the cache
+    auth_cache_timeout = None
+
     def __init__(self, resource):
         self.resource = resource
 
     def check(self):
-        self.process_auth()
+        if self._should_process_auth():
+            key = self._get_auth_cache_key()
+            if not self._load_cached_auth(key):
+                if inspect.iscoroutinefunction(self.process_auth):
+                    raise TypeError(
+                        f'{type(self).__name__}.process_auth is async, '
+                        f'use `async_check()`'
+                    )
+                self.process_auth()
+                self._store_auth(key)
         return self.has_permission()
 
+    async def async_check(self):
+        """Check permission, async `process_auth` and `has_permission`
+        are awaited on the event loop
+
+        Sync methods run in thread pool (sync pair in one hop), the thread's
+        scoped database session is removed after they returned.
+        """
+        from starlette.concurrency import run_in_threadpool
+
+        from .routing import APIRoute
+
+        def in_thread(func):
+            return run_in_threadpool(APIRoute._inject_scoped_session_clear(func))
+
+        async_auth = inspect.iscoroutinefunction(self.process_auth)
+        async_permission = inspect.iscoroutinefunction(self.has_permission)
+        if not (async_auth or async_permission):
+            return await in_thread(self.check)
+
+        if self._should_process_auth():
+            key = self._get_auth_cache_key()
+            if not self._load_cached_auth(key):
+                if async_auth:
+                    await self.process_auth()
+                else:
+                    await in_thread(self.process_auth)
+                self._store_auth(key)
+
+        if async_permission:
+            return await self.has_permission()
+        return await in_thread(self.has_permission)
+
     def has_permission(self):
         """
         Return `True` if permission is granted, `False` otherwise.
@@ -21,3 +140,51 @@ class BasePermission:
     def process_auth(self):
         # self.resource.auth = BaseModel()
         pass
+
+    def get_token(self) -> Optional[str]:
+        """Request's token, `Authorization` header or gRPC metadata"""
+        if self.resource._is_rpc:
+            if self.resource._context is None:
+                return None
+            metadata = dict(self.resource._context.invocation_metadata())
+            return metadata.get('authorization')
+
+        request = self.resource._request
+        if request is None:
+            return None
+        return request.headers.get('authorization')
+
+    def _should_process_auth(self) -> bool:
+        """Auth of the same `process_auth` is resolved once per request"""
+        resolved = getattr(self.resource, '_resolved_auth', None)
+        if resolved is None:
+            return True
+        process_auth = type(self).process_auth
+        if process_auth in resolved:
+            return False
+        resolved.add(process_auth)
+        return True
+
+    def _get_auth_cache_key(self) -> Optional[str]:
+        if not self.auth_cache_timeout:
+            return None
+        token = self.get_token()
+        if not token:
+            return None
+        process_auth = type(self).process_auth
+        digest = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        return f'{process_auth.__module__}.{process_auth.__qualname__}:{digest}'
+
+    def _load_cached_auth(self, key) -> bool:
+        auth = auth_cache.get(key) if key else None
+        if auth is None:
+            return False
+        # requests don't share the principal instance
+        self.resource.auth = copy.copy(auth)
+        return True
+
+    def _store_auth(self, key):
+        if key and self.resource.auth is not None:
+            auth_cache.set(
+                key, copy.copy(self.resource.auth), self.auth_cache_timeout
+            )
@@ -0,0 +1,111 @@
+"""
+Startup profiling
+
+Report import time breakdown of application module,
+using Python's `-X importtime` in a fresh interpreter,
+and the time spent generating schemas (`bali.schemas.schema_registry`).
+
+    ```bash
+    python main.py --profile-startup
+    # or Bali 4.0 style
+    bali run --profile-startup
+    ```
+"""
+import json
+import subprocess
+import sys
+from collections import defaultdict
+from typing import List, NamedTuple
+
+IMPORT_TIME_PREFIX = 'import time:'
+
+# Print schema registry stats when bali schemas imported by the module
+SCHEMA_STATS_CODE = (
+    "import sys\n"
+    "registry = sys.modules.get('bali.schemas.registry')\n"
+    "if registry is not None:\n"
+    "    import json\n"
+    "    print(json.dumps(registry.schema_registry.stats()))\n"
+)
+
+
+class ImportRecord(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(output: str) -> List[ImportRecord]:
+    """Parse `-X importtime` output, header line is skipped"""
+    records = []
+    for line in output.splitlines():
+        if not line.startswith(IMPORT_TIME_PREFIX):
+            continue
+        try:
+            self_us, cumulative_us, module = line[len(IMPORT_TIME_PREFIX):].split('|')
+            records.append(
+                ImportRecord(module.strip(), int(self_us), int(cumulative_us))
+            )
+        except ValueError:
+            continue  # header line
+    return records
+
+
+def group_by_package(records: List[ImportRecord]):
+    """Sum self import time by top-level package"""
+    packages = defaultdict(int)
+    for record in records:
+        packages[record.module.split('.')[0]] += record.self_us
+    return sorted(packages.items(), key=lambda x: x[1], reverse=True)
+
+
+def parse_schema_stats(output: str):
+    """Schema registry stats printed by `SCHEMA_STATS_CODE`, `None` if missing"""
+    for line in reversed(output.splitlines()):
+        try:
+            stats = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(stats, dict) and 'build_time' in stats:
+            return stats
+    return None
+
+
+def profile_startup(module='main', limit=20, echo=print):
+    """Import `module` in a fresh interpreter and report import time"""
+    result = subprocess.run(
+        [
+            sys.executable,
+            '-X',
+            'importtime',
+            '-c',
+            f'import {module}\n{SCHEMA_STATS_CODE}',
+        ],
+        capture_output=True,
+        text=True,
+    )
+    records = parse_importtime(result.stderr)
+    if result.returncode != 0 or not records:
+        echo(result.stderr)
+        return records
+
+    total = max(r.cumulative_us for r in records)
+    echo(f'Import `{module}` took {total / 1000:.1f} ms')
+
+    stats = parse_schema_stats(result.stdout)
+    if stats:
+        echo(
+            f'Generated {stats["schemas"]} schemas in '
+            f'{stats["build_time"] * 1000:.1f} ms, reused {stats["hits"]} times'
+        )
+
+    echo(f'\nTop {limit} packages (self time):')
+    for package, self_us in group_by_package(records)[:limit]:
+        echo(f'{self_us / 1000:>10.1f} ms  {package}')
+
+    echo(f'\nTop {limit} modules (cumulative time):')
+    records = sorted(records, key=lambda x: x.cumulative_us, reverse=True)
+    for record in records[:limit]:
+        echo(f'{record.cumulative_us / 1000:>10.1f} ms  {record.module}')
+
+    return records
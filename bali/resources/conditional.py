@@ -0,0 +1,84 @@
+"""Conditional requests
+
+Weak `ETag` and `Last-Modified` of get/list responses, requests with
+`If-None-Match` or `If-Modified-Since` respond `304 Not Modified`
+when the representation is unchanged.
+
+Versioned resources (`ModelResource` with `updated_time`) build ETags from
+primary key and version column, the other results are hashed by content.
+"""
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+
+from fastapi import Response, status
+from fastapi.encoders import jsonable_encoder
+
+# (etag, last_modified)
+Version = Tuple[str, Optional[datetime]]
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return f'W/"{digest}"'
+
+
+def content_version(content) -> Version:
+    """Version of serialized content, without `Last-Modified`"""
+    data = json.dumps(jsonable_encoder(content), sort_keys=True, default=str)
+    return make_etag(data), None
+
+
+def _to_utc(value: datetime) -> datetime:
+    # naive datetime is UTC, eg: `updated_time` default `datetime.utcnow`
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def version_headers(etag, last_modified=None) -> dict:
+    headers = {'ETag': etag}
+    if last_modified is not None:
+        headers['Last-Modified'] = format_datetime(
+            _to_utc(last_modified), usegmt=True
+        )
+    return headers
+
+
+def has_conditions(request) -> bool:
+    headers = request.headers
+    return 'if-none-match' in headers or 'if-modified-since' in headers
+
+
+def _opaque_tag(etag: str) -> str:
+    # weak comparison, `W/"x"` matches `"x"`
+    return etag.strip().replace('W/', '', 1)
+
+
+def is_not_modified(request, etag, last_modified=None) -> bool:
+    """Evaluate conditional headers, `If-None-Match` takes precedence"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = {_opaque_tag(tag) for tag in if_none_match.split(',')}
+        return '*' in tags or _opaque_tag(etag) in tags
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return _to_utc(last_modified).replace(microsecond=0) <= since
+
+    return False
+
+
+def not_modified_response(etag, last_modified=None) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=version_headers(etag, last_modified),
+    )
@@ -0,0 +1,139 @@
+"""Fast JSON response
+
+Opt-in response mode of Resource HTTP actions (list/get/create/update),
+results are serialized by an encoder compiled once per schema and rendered
+by `orjson` (when installed, the standard `json` otherwise). Route's
+`response_model` validation and `jsonable_encoder` are skipped:
+
+    ```python
+    class ItemResource(ModelResource):
+        model = Item
+        schema = ItemSchema
+        fast_response = True
+    ```
+
+Model instances are serialized by the schema's compiled serializer
+(`bali.db.serializers.SchemaSerializer`), the same dicts as
+`schema.from_orm(item).dict(by_alias=True)`: attributes are read by field
+alias, values not trusted by column type are validated, schemas with nested
+schemas or root validators fall back to `from_orm`. Dicts are responded as
+they are.
+"""
+import datetime
+import decimal
+import enum
+import functools
+import json
+import uuid
+from typing import Callable, Tuple
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+from .._utils import parse_dict
+from ..db.serializers import get_schema_serializer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+__all__ = ['FastJSONResponse', 'compile_encoder', 'dumps', 'page_content']
+
+
+def _default(value):
+    """Values not supported by the JSON encoder, same as `jsonable_encoder`"""
+    if isinstance(value, BaseModel):
+        return value.dict(by_alias=True)
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode()
+    raise TypeError(f'Type is not JSON serializable: {type(value).__name__}')
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            content, default=_default, option=orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(',', ':'),
+    ).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by `dumps`, content is not encoded
+    by `jsonable_encoder`
+    """
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+# Compiled encoders cached, sparse fieldsets are combinations of requests
+ENCODER_CACHE_SIZE = 256
+
+
+def _normalize_fields(schema, fields) -> Tuple[str, ...]:
+    """Sparse fieldset in schema's order, unknown and duplicated fields
+    are dropped, so encoders are not cached per client's ordering
+    """
+    schema_fields = getattr(schema, '__fields__', None)
+    if not schema_fields:
+        return tuple(sorted(set(fields)))
+    requested = set(fields)
+    known = dict.fromkeys(
+        name for key, field in schema_fields.items()
+        for name in (key, field.alias)
+    )  # yapf: disable
+    return tuple(name for name in known if name in requested)
+
+
+def compile_encoder(schema, fields: Tuple[str, ...] = ()) -> Callable:
+    """Compile the encoder of results to dicts of schema's fields
+
+    :param schema: resource's schema, keys are the fields' aliases
+    :param fields: sparse fieldset, keys are the field names
+    """
+    return _compile_encoder(schema, _normalize_fields(schema, fields or ()))
+
+
+@functools.lru_cache(maxsize=ENCODER_CACHE_SIZE)
+def _compile_encoder(schema, fields: Tuple[str, ...]) -> Callable:
+    serializers = {}
+
+    def encode(item) -> dict:
+        if fields:
+            return parse_dict(item, fields=fields)
+        if isinstance(item, dict):
+            return item
+        if isinstance(item, BaseModel):
+            return item.dict(by_alias=True)
+
+        model = type(item)
+        serializer = serializers.get(model)
+        if serializer is None:
+            serializer = get_schema_serializer(model, schema)
+            serializers[model] = serializer
+        return serializer.to_dict(item, by_alias=True)
+
+    return encode
+
+
+def page_content(page) -> dict:
+    """Content of page created from encoded items"""
+    return {name: getattr(page, name) for name in page.__fields__}
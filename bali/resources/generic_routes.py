@@ -7,15 +7,58 @@ Used by `resource.RouterGenerator`
 
 """
 
+import asyncio
+import contextvars
+import functools
 import inspect
+import json
 import logging
+import threading
+import time
 import typing
-from typing import Callable
-
-from fastapi import Request
-
-from ..paginate import paginate
-from ..schemas import ListRequest
+from concurrent import futures
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from .conditional import (
+    content_version,
+    has_conditions,
+    is_not_modified,
+    not_modified_response,
+    version_headers,
+)
+from .fast_response import FastJSONResponse, compile_encoder, page_content
+from .._utils import parse_dict
+from ..db.operators import OPERATOR_SPLITTER
+from ..exceptions import InvalidCursorError
+from ..executors import CALLER_RUNS, ExecutorRejectedError, get_executor
+from ..paginate import (
+    async_iter_chunks,
+    async_paginate,
+    get_page_key,
+    iter_chunks,
+    paginate,
+)
+from ..routing import APIRoute
+from ..schemas import BatchDeleteRequest, ListRequest
+
+# Operators accept a sequence value
+MULTI_VALUED_OPERATORS = ('in', 'notin', 'between')
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+# Named executor of sync stream routes, unless the resource assigns one
+STREAM_EXECUTOR = 'stream'
+# Chunks produced ahead of the response
+STREAM_BUFFER_SIZE = 2
+# Seconds a produced chunk waits to be consumed, the stream is stopped after
+STREAM_PUT_TIMEOUT = 60
+STREAM_POLL_INTERVAL = 0.5
 
 
 # --- Utilities functions for route handler ---
@@ -24,75 +67,113 @@ def pick_route(func, async_route, route):
     return async_route if inspect.iscoroutinefunction(func) else route
 
 
-# noinspection PyUnresolvedReferences,PyProtectedMember
-def list_(router_generator) -> Callable:
-    """
-    list action default using fastapi-pagination to process paginate
-    """
-    resource = router_generator.cls()
-    action_func = getattr(resource, 'list')
+def sparse_response(content, headers=None):
+    """Response of sparse fieldset, not validated by route's response model"""
+    return JSONResponse(jsonable_encoder(content), headers=headers)
 
-    # noinspection PyProtectedMember,PyShadowingNames,PyUnresolvedReferences
-    def route(request: Request = None):
-        resource._request = request
-        router_generator.check_permissions(resource)
-        params = request.query_params._dict
 
-        # parse filters
-        filters = {}
-        for k, v in params.items():
-            if k not in router_generator._ordered_filters:
-                continue
-            # noinspection PyBroadException
-            try:
-                # Convert param and retrieve param
-                params_converter = router_generator._ordered_filters.get(k)
-                if isinstance(params_converter, typing._GenericAlias):
-                    params_converter = params_converter.__args__[0]
-                filters[k] = params_converter(v)
-            except Exception as ex:
-                logging.warning(
-                    'Query params `%s`(value: %s) type convert failed, '
-                    'exception: %s', k, v, ex
-                )
-                continue
+def get_encoder(router_generator, fields=None):
+    """Compiled encoder of fast response resource, `None` when disabled"""
+    resource_cls = router_generator.cls
+    if not (resource_cls.fast_response and resource_cls.schema):
+        return None
+    return compile_encoder(resource_cls.schema, tuple(fields or ()))
 
-        schema_in = ListRequest(**params, filters=filters)
 
-        result = action_func(schema_in)
-        return paginate(result)
+def is_versioned(resource_cls):
+    """Resource responds ETag and conditional requests"""
+    return bool(getattr(resource_cls, 'etag', False)) and hasattr(
+        resource_cls, 'get_version'
+    )
 
-    # noinspection PyProtectedMember,PyShadowingNames,PyUnresolvedReferences
-    async def async_route(request: Request = None):
-        resource._request = request
-        router_generator.check_permissions(resource)
-        params = request.query_params._dict
 
-        # parse filters
+def to_bool(value):
+    return value.lower() in TRUE_VALUES
+
+
+def _get_int_param(query_params, name):
+    value = query_params.get(name)
+    if not value:
+        return 0
+    try:
+        return int(value)
+    except ValueError:
+        logging.warning('Query params `%s`(value: %s) is not integer', name, value)
+        return 0
+
+
+def _get_converter(annotation):
+    """Unwrap `Optional[T]` / `List[T]` annotation to `(converter, many)`"""
+    many = False
+    if typing.get_origin(annotation) is typing.Union:
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        annotation = args[0] if args else str
+    if typing.get_origin(annotation) in (list, tuple, set):
+        many = True
+        args = typing.get_args(annotation)
+        annotation = args[0] if args else str
+    if annotation is bool:
+        return to_bool, many
+    if annotation is typing.Any or not callable(annotation):
+        return str, many
+    return annotation, many
+
+
+def compile_list_params(filters) -> Callable:
+    """Compile query params parser of list action
+
+    Converters are resolved once per resource, the parser returns
+    `ListRequest` directly without validation.
+
+    Multi-valued filters (`__in`, `__notin`, `__between` or `List[T]`
+    annotation) accept repeated params and comma separated values,
+    eg: `?id__in=1&id__in=2` or `?id__in=1,2`.
+    """
+    converters = []
+    for name, annotation in filters.items():
+        converter, many = _get_converter(annotation)
+        op_name = name.rsplit(OPERATOR_SPLITTER, 1)[-1]
+        many = many or op_name in MULTI_VALUED_OPERATORS
+        converters.append((name, converter, many))
+
+    def parse(query_params) -> ListRequest:
         filters = {}
-        for k, v in params.items():
-            if k not in router_generator._ordered_filters:
+        for name, converter, many in converters:
+            if name not in query_params:
                 continue
-            # noinspection PyBroadException
             try:
-                # Convert param and retrieve param
-                params_converter = router_generator._ordered_filters.get(k)
-                if isinstance(params_converter, typing._GenericAlias):
-                    params_converter = params_converter.__args__[0]
-                filters[k] = params_converter(v)
+                if many:
+                    filters[name] = [
+                        converter(v)
+                        for value in query_params.getlist(name)
+                        for v in value.split(',') if v
+                    ]
+                else:
+                    filters[name] = converter(query_params[name])
             except Exception as ex:
                 logging.warning(
                     'Query params `%s`(value: %s) type convert failed, '
-                    'exception: %s', k, v, ex
+                    'exception: %s', name, query_params.getlist(name), ex
                 )
-                continue
 
-        schema_in = ListRequest(**params, filters=filters)
+        ordering = [
+            v for value in query_params.getlist('ordering')
+            for v in value.split(',') if v
+        ]  # yapf: disable
+
+        return ListRequest.construct(
+            filters=filters,
+            offset=_get_int_param(query_params, 'offset'),
+            limit=_get_int_param(query_params, 'limit'),
+            ordering=ordering,
+            page_token=query_params.get('cursor', ''),
+        )
+
+    return parse
 
-        result = await action_func(schema_in)
-        return paginate(result)
 
-    # update route's signatures
+def set_list_signature(router_generator, route, paginated=True):
+    """Update list route's signature with filters, used by OpenAPI"""
     parameters = []
     for k, v in router_generator._ordered_filters.items():
         default = inspect.Parameter.empty
@@ -106,78 +187,485 @@ def list_(router_generator) -> Callable:
                 annotation=v,
             )
         )
-    sig = inspect.signature(route)
-    parameters.extend(sig.parameters.values())
-    route.__signature__ = sig.replace(parameters=parameters)
+    parameters.append(
+        inspect.Parameter(
+            name='fields',
+            kind=inspect.Parameter.POSITIONAL_OR_KEYWORD,
+            default=None,
+            annotation=Optional[str],
+        )
+    )
+    if router_generator.cls.ordering_fields:
+        parameters.append(
+            inspect.Parameter(
+                name='ordering',
+                kind=inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                default=None,
+                annotation=Optional[str],
+            )
+        )
+    if paginated:
+        parameters.append(
+            inspect.Parameter(
+                name='cursor',
+                kind=inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                default=None,
+                annotation=Optional[str],
+            )
+        )
+    parameters.append(
+        inspect.Parameter(
+            name='request',
+            kind=inspect.Parameter.POSITIONAL_OR_KEYWORD,
+            default=None,
+            annotation=Request,
+        )
+    )
+    if paginated:
+        parameters.append(
+            inspect.Parameter(
+                name='response',
+                kind=inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                default=None,
+                annotation=Response,
+            )
+        )
+    route.__signature__ = inspect.signature(route).replace(parameters=parameters)
 
-    return pick_route(action_func, async_route, route)
 
+# noinspection PyUnresolvedReferences,PyProtectedMember
+def list_(router_generator) -> Callable:
+    """
+    list action default using fastapi-pagination to process paginate
+    """
+    action_func = getattr(router_generator.cls, 'list')
+    parse_params = router_generator._list_params_parser
+
+    versioned = is_versioned(router_generator.cls)
+
+    def get_paginate_options(resource, schema_in, versions):
+        def on_page_rows(rows):
+            versions.append(rows)
+
+        fields = resource.get_fields()
+        return dict(
+            page_token=schema_in.page_token,
+            count_policy=router_generator.cls.count_policy,
+            count_timeout=router_generator.cls.count_cache_timeout,
+            fields=fields,
+            on_page_rows=on_page_rows if versioned else None,
+            serializer=get_encoder(router_generator, fields),
+        )
 
-def get_(router_generator) -> Callable:
-    resource = router_generator.cls()
-    action_func = getattr(resource, 'get')
+    def paginate_result(resource, result, schema_in, request, response):
+        versions = []
+        try:
+            page = paginate(
+                result, **get_paginate_options(resource, schema_in, versions)
+            )
+        except InvalidCursorError as ex:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(ex)
+            )
+        return page_response(
+            resource, result, page, schema_in, versions, request, response
+        )
 
-    def route(id: int, request: Request = None):
-        resource._request = request
-        router_generator.check_permissions(resource)
-        return action_func(pk=id)
+    async def async_paginate_result(
+        resource, result, schema_in, request, response
+    ):
+        versions = []
+        try:
+            page = await async_paginate(
+                result, **get_paginate_options(resource, schema_in, versions)
+            )
+        except InvalidCursorError as ex:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(ex)
+            )
+        return page_response(
+            resource, result, page, schema_in, versions, request, response
+        )
+
+    def get_page_version(resource, result, page, schema_in, versions):
+        """Version of page rows, varies by the page's parameters and total"""
+        if not versions:
+            return None
+        page_key = get_page_key(
+            result,
+            page_token=schema_in.page_token,
+            count_policy=router_generator.cls.count_policy,
+            total=page.total,
+        )
+        return resource.get_version(versions[0], page_key)
+
+    def page_response(
+        resource, result, page, schema_in, versions, request, response
+    ):
+        fields = resource.get_fields()
+        headers = {}
+        if versioned:
+            version = get_page_version(
+                resource, result, page, schema_in, versions
+            ) or content_version(page)
+            if is_not_modified(request, *version):
+                return not_modified_response(*version)
+            headers = version_headers(*version)
+
+        if get_encoder(router_generator):
+            return FastJSONResponse(page_content(page), headers=headers)
+        if fields:
+            return sparse_response(page, headers)
+        response.headers.update(headers)
+        return page
+
+    # Filters are parsed by `parse_params`, the values FastAPI parsed
+    # from route's signature are ignored
+    # noinspection PyProtectedMember,PyShadowingNames,PyUnresolvedReferences
+    def route(request: Request = None, response: Response = None, **_):
+        resource = router_generator.get_resource(request)
+        schema_in = parse_params(request.query_params)
+        result = resource.list(schema_in)
+
+        # conditional request is responded before the page's rows are loaded
+        if versioned and has_conditions(request):
+            try:
+                version = resource.get_page_version(result, schema_in.page_token)
+            except InvalidCursorError as ex:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail=str(ex)
+                )
+            if version and is_not_modified(request, *version):
+                return not_modified_response(*version)
+
+        return paginate_result(resource, result, schema_in, request, response)
+
+    # noinspection PyProtectedMember,PyShadowingNames,PyUnresolvedReferences
+    async def async_route(request: Request = None, response: Response = None, **_):
+        resource = router_generator.get_resource(request)
+        schema_in = parse_params(request.query_params)
+        result = await resource.list(schema_in)
+        # `Select` statement of async resources is paginated on async session
+        return await async_paginate_result(
+            resource, result, schema_in, request, response
+        )
+
+    route = pick_route(action_func, async_route, route)
+    set_list_signature(router_generator, route)
+
+    return route
+
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
 
-    async def async_route(id: int, request: Request = None):
-        resource._request = request
-        router_generator.check_permissions(resource)
-        return await action_func(pk=id)
+
+def to_ndjson(chunk) -> str:
+    return ''.join(
+        json.dumps(item, default=_json_default) + '\n' for item in chunk
+    )
+
+
+def iterate_in_thread(make_iterator, executor_name=STREAM_EXECUTOR):
+    """Iterate sync iterator in a worker of the named bulkhead executor
+
+    Database session and connection are thread bound, the iterator is
+    created, consumed and closed by one task in the same worker thread,
+    chunks and errors are passed through a bounded queue, the scoped session
+    is removed when finished. The stream occupies the worker until finished,
+    stopped by the consumer or not consumed in `STREAM_PUT_TIMEOUT` seconds.
+
+    :raises ExecutorRejectedError: the executor is full
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=STREAM_BUFFER_SIZE)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        """Wait for the queue's room, `False` when the consumer is gone"""
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        deadline = time.monotonic() + STREAM_PUT_TIMEOUT
+        while not stopped.is_set() and time.monotonic() < deadline:
+            try:
+                future.result(timeout=STREAM_POLL_INTERVAL)
+                return True
+            except futures.TimeoutError:
+                continue
+        future.cancel()
+        stopped.set()
+        return False
+
+    def produce():
+        iterator = None
+        try:
+            iterator = iter(make_iterator())
+            for chunk in iterator:
+                if not put((chunk, None)):
+                    return
+            put(None)
+        except Exception as ex:
+            put((None, ex))
+        finally:
+            if hasattr(iterator, 'close'):
+                iterator.close()
+
+    executor = get_executor(executor_name)
+    func = functools.partial(
+        contextvars.copy_context().run,
+        APIRoute._inject_scoped_session_clear(produce),
+    )
+    if executor.try_submit(func) is None:
+        if executor.rejection_policy != CALLER_RUNS:
+            raise ExecutorRejectedError(f'Executor `{executor_name}` is full')
+        loop.run_in_executor(None, func)
+
+    async def consume():
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                chunk, error = item
+                if error is not None:
+                    raise error
+                yield chunk
+        finally:
+            # unblock the producer waiting for a full queue
+            stopped.set()
+            while not queue.empty():
+                queue.get_nowait()
+
+    return consume()
+
+
+async def prefetch(chunks):
+    """Fetch the first chunk before the response starts,
+    errors of the action are responded as errors instead of a broken stream
+    """
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        return chunks
+
+    async def iterate():
+        try:
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    return iterate()
+
+
+# noinspection PyUnresolvedReferences,PyProtectedMember
+def stream_list_(router_generator) -> Callable:
+    """
+    Stream list action as NDJSON, the result is not paginated,
+    `offset` and `limit` are applied when provided
+    """
+    action_func = getattr(router_generator.cls, 'list')
+    parse_params = router_generator._list_params_parser
+    schema = router_generator.cls.schema
+
+    async def route(request: Request = None, **_):
+        resource = router_generator.get_resource(request)
+        schema_in = parse_params(request.query_params)
+        fields = resource.get_fields()
+
+        def iter_ndjson(result):
+            for chunk in iter_chunks(
+                result,
+                schema_in.offset,
+                schema_in.limit,
+                model_schema=schema,
+                fields=fields,
+            ):
+                yield to_ndjson(chunk)
+
+        async def aiter_ndjson(result):
+            async for chunk in async_iter_chunks(
+                result,
+                schema_in.offset,
+                schema_in.limit,
+                model_schema=schema,
+                fields=fields,
+            ):
+                yield to_ndjson(chunk)
+
+        if inspect.iscoroutinefunction(action_func):
+            # `Select` statement of async resources is streamed on async session
+            content = aiter_ndjson(await resource.list(schema_in))
+        else:
+            try:
+                content = iterate_in_thread(
+                    lambda: iter_ndjson(resource.list(schema_in)),
+                    router_generator.get_executor_name('list') or STREAM_EXECUTOR,
+                )
+            except ExecutorRejectedError:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail='Service Unavailable',
+                )
+        content = await prefetch(content)
+        return StreamingResponse(content, media_type=NDJSON_MEDIA_TYPE)
+
+    set_list_signature(router_generator, route, paginated=False)
+    return route
+
+
+def get_(router_generator) -> Callable:
+    action_func = getattr(router_generator.cls, 'get')
+    schema = router_generator.cls.schema
+    versioned = is_versioned(router_generator.cls)
+
+    def get_result(resource, result, request, response):
+        fields = resource.get_fields()
+        headers = {}
+        if versioned and result is not None:
+            version = resource.get_version(result) or content_version(
+                parse_dict(result, schema=schema, fields=fields)
+            )
+            if is_not_modified(request, *version):
+                return not_modified_response(*version)
+            headers = version_headers(*version)
+
+        encode = get_encoder(router_generator, fields)
+        if encode and result is not None:
+            return FastJSONResponse(encode(result), headers=headers)
+        if fields and result is not None:
+            return sparse_response(parse_dict(result, fields=fields), headers)
+        response.headers.update(headers)
+        return result
+
+    def route(
+        id: int,
+        fields: Optional[str] = None,
+        request: Request = None,
+        response: Response = None,
+    ):
+        resource = router_generator.get_resource(request)
+        # conditional request is responded before the row is loaded
+        if versioned and has_conditions(request):
+            version = resource.get_version_by_pk(id)
+            if version and is_not_modified(request, *version):
+                return not_modified_response(*version)
+        return get_result(resource, resource.get(pk=id), request, response)
+
+    async def async_route(
+        id: int,
+        fields: Optional[str] = None,
+        request: Request = None,
+        response: Response = None,
+    ):
+        resource = router_generator.get_resource(request)
+        result = await resource.get(pk=id)
+        return get_result(resource, result, request, response)
 
     return pick_route(action_func, async_route, route)
 
 
+def encode_result(router_generator, result, status_code=status.HTTP_200_OK):
+    """Encode result of fast response resource, returned as is when disabled"""
+    encode = get_encoder(router_generator)
+    if encode is None or result is None:
+        return result
+    return FastJSONResponse(encode(result), status_code=status_code)
+
+
 def create_(router_generator) -> Callable:
-    resource = router_generator.cls()
-    action_func = getattr(resource, 'create')
+    action_func = getattr(router_generator.cls, 'create')
+    schema = router_generator.cls.schema
+    status_code = status.HTTP_201_CREATED
 
-    def route(schema_in: resource.schema, request: Request = None):
-        resource._request = request
-        router_generator.check_permissions(resource)
-        return action_func(schema_in)
+    def route(schema_in: schema, request: Request = None):
+        resource = router_generator.get_resource(request)
+        result = resource.create(schema_in)
+        return encode_result(router_generator, result, status_code)
 
-    async def async_route(schema_in: resource.schema, request: Request = None):
-        resource._request = request
-        router_generator.check_permissions(resource)
-        return await action_func(schema_in)
+    async def async_route(schema_in: schema, request: Request = None):
+        resource = router_generator.get_resource(request)
+        result = await resource.create(schema_in)
+        return encode_result(router_generator, result, status_code)
 
     return pick_route(action_func, async_route, route)
 
 
 def update_(router_generator) -> Callable:
-    resource = router_generator.cls()
-    action_func = getattr(resource, 'update')
+    action_func = getattr(router_generator.cls, 'update')
+    schema = router_generator.cls.schema
 
-    def route(schema_in: resource.schema, id: int, request: Request = None):
-        resource._request = request
-        router_generator.check_permissions(resource)
-        return action_func(schema_in, pk=id)
+    def route(schema_in: schema, id: int, request: Request = None):
+        resource = router_generator.get_resource(request)
+        return encode_result(router_generator, resource.update(schema_in, pk=id))
 
     async def async_route(
-        schema_in: resource.schema, id: int, request: Request = None
+        schema_in: schema, id: int, request: Request = None
     ):
-        resource._request = request
-        router_generator.check_permissions(resource)
-        return await action_func(schema_in, pk=id)
+        resource = router_generator.get_resource(request)
+        result = await resource.update(schema_in, pk=id)
+        return encode_result(router_generator, result)
 
     return pick_route(action_func, async_route, route)
 
 
 def delete_(router_generator) -> Callable:
-    resource = router_generator.cls()
-    action_func = getattr(resource, 'delete')
+    action_func = getattr(router_generator.cls, 'delete')
 
     def route(id: int, request: Request = None):
-        resource._request = request
-        router_generator.check_permissions(resource)
-        return action_func(pk=id)
+        resource = router_generator.get_resource(request)
+        return resource.delete(pk=id)
 
     async def async_route(id: int, request: Request = None):
-        resource._request = request
-        router_generator.check_permissions(resource)
-        return await action_func(pk=id)
+        resource = router_generator.get_resource(request)
+        return await resource.delete(pk=id)
 
     return pick_route(action_func, async_route, route)
+
+
+# --- Batch routes, generated by `ModelResource.batch_actions` ---
+def _check_batch_ids(schemas_in):
+    if any(getattr(schema_in, 'id', None) is None for schema_in in schemas_in):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail='Batch update items must provide `id`',
+        )
+
+
+def batch_get_(router_generator) -> Callable:
+    def route(ids: List[int] = Query(...), request: Request = None):
+        resource = router_generator.get_resource(request)
+        return resource.batch_get(ids)
+
+    return route
+
+
+def batch_create_(router_generator) -> Callable:
+    schema = router_generator.cls.schema
+
+    def route(schemas_in: List[schema], request: Request = None):
+        resource = router_generator.get_resource(request)
+        return resource.batch_create(schemas_in)
+
+    return route
+
+
+def batch_update_(router_generator) -> Callable:
+    schema = router_generator.cls.schema
+
+    def route(schemas_in: List[schema], request: Request = None):
+        resource = router_generator.get_resource(request)
+        _check_batch_ids(schemas_in)
+        return resource.batch_update(schemas_in)
+
+    return route
+
+
+def batch_delete_(router_generator) -> Callable:
+    def route(schema_in: BatchDeleteRequest, request: Request = None):
+        resource = router_generator.get_resource(request)
+        return resource.batch_delete(schema_in.ids)
+
+    return route
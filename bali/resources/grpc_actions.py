@@ -1,55 +1,32 @@
-from fastapi_pagination import LimitOffsetParams, set_page, Page
+from fastapi_pagination import LimitOffsetPage, LimitOffsetParams, set_page
 from pydantic import BaseModel
 
 from .._utils import parse_dict
-from ..exceptions import ReturnTypeError
-from ..paginate import paginate
-from ..schemas import get_schema_in, UpdateRequest, CreateRequest
+from ..exceptions import DBSetupException, ReturnTypeError
+from ..paginate import async_iter_chunks, async_paginate, iter_chunks, paginate
+from ..schemas import get_schema_in, ListRequest, UpdateRequest, CreateRequest
 from ..utils import MessageToDict, ParseDict
 
 
-# noinspection PyProtectedMember
-def process_rpc(resource, func):
-    """Process rpc actions
-
-    :param resource: Resource instance
-    :param func: Resource action process function
-    :return:
-    """
-    request_data = MessageToDict(
+def _get_request_data(resource):
+    return MessageToDict(
         resource._request,
         including_default_value_fields=True,
         preserving_proto_field_name=True,
     )
 
-    if func.__name__ == 'get':
-        pk = resource._request.id
-        result = func(resource, pk)
-        result = parse_dict(result, schema=resource.schema)
-        response_data = {'data': result}
 
-    elif func.__name__ == 'list':
+# noinspection PyProtectedMember
+def _get_action_args(resource, func, request_data):
+    """Arguments of the action from rpc request, `(args, kwargs)`"""
+    if func.__name__ in ['get', 'delete']:
+        return (resource._request.id, ), {}
+
+    if func.__name__ == 'list':
         schema_in = get_schema_in(func, default_by_action=True)
-        result = func(resource, schema_in(**request_data))
-        # Paginated the result queryset or iterable object
-        if isinstance(result, BaseModel):
-            raise ReturnTypeError(
-                'Generic actions `list` should return a sequence'
-            )
-        else:
-            set_page(Page)
-            params = LimitOffsetParams(
-                limit=request_data.get('limit') or 10,
-                offset=request_data.get('offset'),
-            )
-            response_data = paginate(
-                result,
-                params=params,
-                is_rpc=True,
-                model_schema=resource.schema,
-            )
+        return (schema_in(**request_data), ), {}
 
-    elif func.__name__ in ['create', 'update']:
+    if func.__name__ in ['create', 'update']:
         schema_in = get_schema_in(func, default_by_action=True)
 
         # if schema_in is not generic schema and has `data` key
@@ -61,35 +38,78 @@ def process_rpc(resource, func):
         schema = schema_in(**request_data)
 
         if isinstance(schema, CreateRequest):
-            result = func(
-                resource,
-                resource.schema(**schema.data),
-            )
-        elif isinstance(schema, UpdateRequest):
-            result = func(
-                resource,
-                resource.schema(**schema.data),
-                pk=schema.id,
-            )
-        else:
-            # Not generic `create` or `update` or been override
-            result = func(resource, schema)
+            return (resource.schema(**schema.data), ), {}
+        if isinstance(schema, UpdateRequest):
+            return (resource.schema(**schema.data), ), {'pk': schema.id}
+        # Not generic `create` or `update` or been override
+        return (schema, ), {}
+
+    # custom action
+    schema_in = get_schema_in(func)
+    return (schema_in(**request_data), ), {}
+
+
+def _get_paginate_options(resource, request_data, result):
+    # Paginated the result queryset or iterable object
+    if isinstance(result, BaseModel):
+        raise ReturnTypeError('Generic actions `list` should return a sequence')
+
+    set_page(LimitOffsetPage)
+    params = LimitOffsetParams(
+        limit=request_data.get('limit') or 10,
+        offset=request_data.get('offset') or 0,
+    )
+    return dict(
+        params=params,
+        is_rpc=True,
+        model_schema=resource.schema,
+        page_token=request_data.get('page_token') or '',
+        count_policy=resource.count_policy,
+        count_timeout=resource.count_cache_timeout,
+        fields=resource.get_fields(),
+    )
+
+
+def _get_response_data(resource, func, result):
+    if func.__name__ == 'get':
+        result = parse_dict(
+            result, schema=resource.schema, fields=resource.get_fields()
+        )
+        return {'data': result}
+
+    if func.__name__ in ['create', 'update']:
+        return {'data': parse_dict(result, schema=resource.schema)}
+
+    if func.__name__ == 'delete':
+        # ModelResource responds `{'id': pk, 'result': bool}`
+        if isinstance(result, dict) and 'result' in result:
+            result = result['result']
+        return {'result': bool(result)}
 
-        result = parse_dict(result, schema=resource.schema)
-        response_data = {'data': result}
+    # custom action
+    if not isinstance(result, dict):
+        result = result.dict()
+    return result
 
-    elif func.__name__ == 'delete':
-        pk = resource._request.id
-        result = func(resource, pk)
-        response_data = {'result': bool(result)}
 
+# noinspection PyProtectedMember
+def process_rpc(resource, func):
+    """Process rpc actions
+
+    :param resource: Resource instance
+    :param func: Resource action process function
+    :return:
+    """
+    request_data = _get_request_data(resource)
+    args, kwargs = _get_action_args(resource, func, request_data)
+    result = func(resource, *args, **kwargs)
+
+    if func.__name__ == 'list':
+        response_data = paginate(
+            result, **_get_paginate_options(resource, request_data, result)
+        )
     else:
-        # custom action
-        schema_in = get_schema_in(func)
-        result = func(resource, schema_in(**request_data))
-        if not isinstance(result, dict):
-            result = result.dict()
-        response_data = result
+        response_data = _get_response_data(resource, func, result)
 
     # Convert response data to gRPC response
     return ParseDict(
@@ -97,3 +117,138 @@ def process_rpc(resource, func):
         resource._response_message(),
         ignore_unknown_fields=True
     )
+
+
+# noinspection PyProtectedMember
+async def process_async_rpc(resource, func):
+    """Process rpc async actions, served by `grpc.aio` server
+
+    `Select` statement of list action is paginated on async session.
+    """
+    request_data = _get_request_data(resource)
+    args, kwargs = _get_action_args(resource, func, request_data)
+    result = await func(resource, *args, **kwargs)
+
+    if func.__name__ == 'list':
+        response_data = await async_paginate(
+            result, **_get_paginate_options(resource, request_data, result)
+        )
+    else:
+        response_data = _get_response_data(resource, func, result)
+
+    return ParseDict(
+        response_data,
+        resource._response_message(),
+        ignore_unknown_fields=True
+    )
+
+
+# noinspection PyProtectedMember
+def process_batch_rpc(resource, action):
+    """Process rpc batch actions
+
+    Batch get/delete request provides `ids`,
+    batch create/update request provides `data` list
+
+    :param resource: ModelResource instance
+    :param action: generic action name, eg: `get`
+    :return:
+    """
+    request_data = MessageToDict(
+        resource._request,
+        including_default_value_fields=True,
+        preserving_proto_field_name=True,
+    )
+
+    if action in ['get', 'delete']:
+        ids = [int(pk) for pk in request_data.get('ids', [])]
+        if action == 'delete':
+            return ParseDict(
+                resource.batch_delete(ids),
+                resource._response_message(),
+                ignore_unknown_fields=True
+            )
+        result = resource.batch_get(ids)
+
+    else:
+        schemas_in = [
+            resource.schema(**item) for item in request_data.get('data', [])
+        ]
+        if action == 'create':
+            result = resource.batch_create(schemas_in)
+        else:
+            if any(getattr(i, 'id', None) is None for i in schemas_in):
+                raise ValueError('Batch update items must provide `id`')
+            result = resource.batch_update(schemas_in)
+
+    items = [parse_dict(item, schema=resource.schema) for item in result]
+    return ParseDict(
+        {'data': items, 'count': len(items)},
+        resource._response_message(),
+        ignore_unknown_fields=True
+    )
+
+
+def _get_stream_request(resource):
+    request_data = MessageToDict(
+        resource._request,
+        including_default_value_fields=True,
+        preserving_proto_field_name=True,
+    )
+    return ListRequest(**request_data)
+
+
+def _chunk_response(resource, chunk):
+    return ParseDict(
+        {'data': chunk, 'count': len(chunk)},
+        resource._response_message(),
+        ignore_unknown_fields=True
+    )
+
+
+# noinspection PyProtectedMember
+def process_stream_rpc(resource):
+    """Process rpc server-streaming list
+
+    The list action is called without pagination, the result is
+    responded by chunks of `ListResponse`, `offset` and `limit`
+    are applied when provided.
+    """
+    from ..core import db
+
+    schema_in = _get_stream_request(resource)
+    # call the original action, rpc request is not processed by `process_rpc`
+    func = type(resource).list.__wrapped__
+    try:
+        result = func(resource, schema_in)
+        for chunk in iter_chunks(
+            result,
+            schema_in.offset,
+            schema_in.limit,
+            model_schema=resource.schema,
+            fields=resource.get_fields(),
+        ):
+            yield _chunk_response(resource, chunk)
+    finally:
+        # stream is consumed after interceptor's teardown
+        try:
+            db.s.remove()
+        except DBSetupException:
+            pass
+
+
+# noinspection PyProtectedMember
+async def process_stream_rpc_async(resource):
+    """Process rpc server-streaming list of async list action"""
+    schema_in = _get_stream_request(resource)
+    func = type(resource).list.__wrapped__
+    result = await func(resource, schema_in)
+    # `Select` statement of async resources is streamed on async session
+    async for chunk in async_iter_chunks(
+        result,
+        schema_in.offset,
+        schema_in.limit,
+        model_schema=resource.schema,
+        fields=resource.get_fields(),
+    ):
+        yield _chunk_response(resource, chunk)
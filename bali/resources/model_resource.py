@@ -1,13 +1,42 @@
 """
 Bali ModelResource
 """
+import logging
 
+from sqlalchemy import PrimaryKeyConstraint, UniqueConstraint, inspect, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import load_only
+
+from .conditional import make_etag
 from .resource import Resource
-from ..db.operators import get_filters_expr
+from ..db.models import context_auto_commit
+from ..db.operators import dj_ordering_to_sqla, get_filters_expr
 from ..decorators import action
+from ..paginate import get_page_key, get_page_total, page_rows
 from ..schemas import ListRequest
 
-__all__ = ['ModelResource']
+__all__ = ['AsyncModelResource', 'ModelResource']
+
+logger = logging.getLogger('bali')
+
+
+def get_indexed_columns(model):
+    """Columns can be ordered by an index of model's table
+
+    Columns leading a primary key, index or unique constraint, foreign key
+    and check constraints are not indexes.
+    """
+    table = inspect(model).local_table
+    constraints = [
+        c for c in table.constraints
+        if isinstance(c, (PrimaryKeyConstraint, UniqueConstraint))
+    ]
+    columns = set()
+    for index in [*table.indexes, *constraints]:
+        index_columns = list(index.columns)
+        if index_columns:
+            columns.add(index_columns[0])
+    return columns
 
 
 class ModelResource(Resource):
@@ -18,15 +47,198 @@ class ModelResource(Resource):
     model = None
     schema = None
 
-    @action()
-    def list(self, schema_in: ListRequest = None):
-        return self.model.io.query().filter(
+    # Opt-in generated batch actions by generic action names,
+    # eg: `batch_actions = ['get', 'create', 'update', 'delete']`
+    batch_actions = []
+
+    # Weak ETag and Last-Modified of HTTP get/list responses,
+    # `If-None-Match` and `If-Modified-Since` are responded 304 when unchanged
+    etag = True
+    # Column changes on every update, ETag of model without it is content hash
+    version_column = 'updated_time'
+
+    # Update and delete by primary key in a single statement:
+    # `UPDATE ... RETURNING` (or `UPDATE` then `SELECT` on dialects without
+    # RETURNING) and `DELETE ... WHERE`. Models with ORM delete cascades
+    # are deleted by instance.
+    single_statement_writes = True
+
+    # `ordering_fields` must be indexed, unindexed fields raise `ValueError`
+    # when router or servicer generated, `True` only logs a warning
+    allow_unindexed_ordering = False
+
+    @classmethod
+    def check_ordering_fields(cls):
+        if cls.model is None or not cls.ordering_fields:
+            return
+
+        mapper = inspect(cls.model)
+        indexed_columns = get_indexed_columns(cls.model)
+        unindexed = []
+        for name in cls.ordering_fields:
+            if name not in mapper.column_attrs:
+                raise ValueError(
+                    f'{cls.__name__} ordering field `{name}` is not '
+                    f'a column of {cls.model.__name__}'
+                )
+            if not set(mapper.column_attrs[name].columns) & indexed_columns:
+                unindexed.append(name)
+
+        if not unindexed:
+            return
+        message = (
+            f'{cls.__name__} ordering fields {unindexed} are not indexed, '
+            f'ordering by them sorts the whole filtered table'
+        )
+        if not cls.allow_unindexed_ordering:
+            raise ValueError(message)
+        logger.warning(message)
+
+    # --- Versions of conditional requests ---
+    def _get_version_column(self):
+        if not self.version_column:
+            return None
+        return getattr(self.model, self.version_column, None)
+
+    def get_version(self, items, page_key=None):
+        """ETag and Last-Modified of model instance or page rows
+
+        Returns `None` when model is not versioned,
+        ETag varies by primary key, version and sparse fieldset,
+        ETag of page rows also varies by `page_key` (see `get_page_key`).
+        Page rows have no Last-Modified, deleted rows don't advance
+        the max version, the page is validated by ETag only.
+        """
+        if self._get_version_column() is None:
+            return None
+
+        many = isinstance(items, list)
+        items = items if many else [items]
+        if not all(isinstance(item, self.model) for item in items):
+            return None
+
+        mapper = inspect(self.model)
+        versions = [
+            (mapper.primary_key_from_instance(item),
+             getattr(item, self.version_column))
+            for item in items
+        ]  # yapf: disable
+        modified = [v for _, v in versions if v is not None]
+        etag = make_etag(
+            self.model.__tablename__, many, versions, self.get_fields(), page_key
+        )
+        if many or not modified:
+            return etag, None
+        return etag, max(modified)
+
+    def get_version_by_pk(self, pk):
+        """Version of the row, the row's body is not loaded
+
+        `None` if `get` action is overridden, which may not load by pk.
+        """
+        column = self._get_version_column()
+        if column is None or type(self).get is not ModelResource.get:
+            return None
+        item = self.model.io.query().options(load_only(column)).filter_by(
+            id=pk
+        ).first()
+        return None if item is None else self.get_version(item)
+
+    def get_page_version(self, query, page_token='', params=None):
+        """Version of list page, only primary keys and versions are loaded,
+        total is counted by resource's count policy
+        """
+        column = self._get_version_column()
+        if column is None or not hasattr(query, 'options'):
+            return None
+        rows = page_rows(query.options(load_only(column)), params, page_token)
+        total = get_page_total(
+            query, page_token, self.count_policy, self.count_cache_timeout
+        )
+        page_key = get_page_key(
+            query, params, page_token, self.count_policy, total
+        )
+        return self.get_version(rows, page_key)
+
+    def _load_only(self, query):
+        """Load only columns of the request's sparse fieldset"""
+        fields = self.get_fields()
+        if not fields:
+            return query
+
+        column_attrs = inspect(self.model).column_attrs
+        columns = [getattr(self.model, f) for f in fields if f in column_attrs]
+        if not columns:
+            return query
+
+        # ETag is built from version column
+        version_column = self._get_version_column()
+        if self.etag and version_column is not None:
+            columns.append(version_column)
+        return query.options(load_only(*columns))
+
+    def _filter(self, query, schema_in: ListRequest):
+        """Apply sparse fieldset, filters and ordering to query or `Select`"""
+        query = self._load_only(query).filter(
             *get_filters_expr(self.model, **schema_in.filters)
         )
+        ordering = self.get_ordering(schema_in)
+        if ordering:
+            query = query.order_by(
+                *[dj_ordering_to_sqla(o, self.model) for o in ordering]
+            )
+        return query
+
+    def _get_update_values(self, schema_in) -> dict:
+        # noinspection PyUnresolvedReferences
+        return {k: v for k, v in schema_in.dict().items() if v is not None}
+
+    def _is_statement_update(self, values) -> bool:
+        mapper = inspect(self.model)
+        return bool(
+            self.single_statement_writes and values
+            and all(k in mapper.column_attrs for k in values)
+        )
+
+    def _is_statement_delete(self) -> bool:
+        mapper = inspect(self.model)
+        return bool(
+            self.single_statement_writes
+            and not any(r.cascade.delete for r in mapper.relationships)
+        )
+
+    def _get_update_statement(self, pk, values, returning=False):
+        """`UPDATE` by primary key, other values (eg: `updated_time`)
+        are set by columns' `onupdate`
+
+        Returning statement is selected as model instances.
+        """
+        mapper = inspect(self.model)
+        table = mapper.local_table
+        statement = table.update().where(self.model.id == pk).values({
+            mapper.column_attrs[k].columns[0]: v for k, v in values.items()
+        })  # yapf: disable
+        if not returning:
+            return statement
+
+        # instance in session is refreshed by the returned row
+        return (
+            select(self.model)
+            .from_statement(statement.returning(*table.columns))
+            .execution_options(populate_existing=True)
+        )
+
+    def _get_delete_statement(self, pk):
+        table = inspect(self.model).local_table
+        return table.delete().where(self.model.id == pk)
+
+    @action()
+    def list(self, schema_in: ListRequest = None):
+        return self._filter(self.model.io.query(), schema_in)
 
     @action()
     def get(self, pk=None):
-        return self.model.io.first(id=pk)
+        return self._load_only(self.model.io.query()).filter_by(id=pk).first()
 
     @action()
     def create(self, schema_in: schema = None):
@@ -35,16 +247,180 @@ class ModelResource(Resource):
 
     @action()
     def update(self, schema_in: schema = None, pk=None):
+        values = self._get_update_values(schema_in)
+        if self._is_statement_update(values):
+            return self._update_by_statement(pk, values)
+
         item = self.model.io.first(id=pk)
-        # noinspection PyUnresolvedReferences
-        for k, v in schema_in.dict().items():
-            if v is None:
-                continue
+        for k, v in values.items():
             setattr(item, k, v)
         return item.save()
 
     @action()
     def delete(self, pk=None):
+        if self._is_statement_delete():
+            session = self.model._db.s
+            try:
+                count = session.execute(self._get_delete_statement(pk)).rowcount
+            except SQLAlchemyError:
+                session.rollback()
+                raise
+            self._commit()
+            return {'id': pk, 'result': bool(count)}
+
         item = self.model.io.first(id=pk)
         item.delete()
         return {'id': pk, 'result': True}
+
+    def _update_by_statement(self, pk, values):
+        """Update row by primary key, returns the updated instance"""
+        session = self.model._db.s
+        try:
+            if session.get_bind().dialect.full_returning:
+                item = session.execute(
+                    self._get_update_statement(pk, values, returning=True)
+                ).scalars().first()
+            else:
+                session.execute(self._get_update_statement(pk, values))
+                item = session.get(self.model, pk, populate_existing=True)
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+        self._commit()
+        return item
+
+    # --- Batch actions, generated when enabled in `batch_actions` ---
+    def _commit(self):
+        """Commit writes in one transaction, flush in `db.transaction()`"""
+        session = self.model._db.s
+        try:
+            session.commit() if context_auto_commit.get() else session.flush()
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    def batch_get(self, ids):
+        items = self.model.io.query().filter(self.model.id.in_(ids)).all()
+        items = {item.id: item for item in items}
+        return [items[pk] for pk in ids if pk in items]
+
+    def batch_create(self, schemas_in):
+        items = [self.model(**schema_in.dict()) for schema_in in schemas_in]
+        self.model._db.s.add_all(items)
+        self._commit()
+        return items
+
+    def batch_update(self, schemas_in):
+        schemas_in = {schema_in.id: schema_in for schema_in in schemas_in}
+        items = self.batch_get(list(schemas_in))
+        for item in items:
+            # noinspection PyUnresolvedReferences
+            for k, v in schemas_in[item.id].dict().items():
+                if v is None:
+                    continue
+                setattr(item, k, v)
+        self._commit()
+        return items
+
+    def batch_delete(self, ids):
+        """Delete resources of ids, `result` is false when any id is missing
+
+        Rows are deleted by one `DELETE ... WHERE id IN` statement, models
+        with ORM delete cascades (or `single_statement_writes` disabled)
+        are deleted by instance, so cascades and ORM events apply.
+
+        :returns: `{'result': bool, 'missing': [ids not found]}`
+        """
+        ids = list(dict.fromkeys(ids))
+        session = self.model._db.s
+        query = self.model.io.query().filter(self.model.id.in_(ids))
+        try:
+            if self._is_statement_delete():
+                found = {pk for pk, in query.with_entities(self.model.id)}
+                if found:
+                    self.model.io.query().filter(
+                        self.model.id.in_(found)
+                    ).delete()
+            else:
+                items = query.all()
+                found = {item.id for item in items}
+                for item in items:
+                    session.delete(item)
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+        self._commit()
+        missing = [pk for pk in ids if pk not in found]
+        return {'result': bool(ids) and not missing, 'missing': missing}
+
+
+class AsyncModelResource(ModelResource):
+    """
+    `ModelResource` with async generic actions on `db.async_session`,
+    database waits don't block the event loop in HTTP and `grpc.aio` servers
+
+    `list` returns a `Select` statement, paginated by `async_paginate`
+    with the same filters, ordering, cursor and count policies.
+    """
+    model = None
+    schema = None
+
+    def _async_session(self):
+        return self.model._db.async_session()
+
+    @action()
+    async def list(self, schema_in: ListRequest = None):
+        return self._filter(select(self.model), schema_in)
+
+    @action()
+    async def get(self, pk=None):
+        statement = self._load_only(select(self.model)).filter_by(id=pk)
+        async with self._async_session() as session:
+            result = await session.execute(statement)
+            return result.scalars().first()
+
+    @action()
+    async def create(self, schema_in: schema = None):
+        # noinspection PyUnresolvedReferences
+        item = self.model(**schema_in.dict())
+        async with self._async_session() as session:
+            session.add(item)
+            await session.commit()
+        return item
+
+    @action()
+    async def update(self, schema_in: schema = None, pk=None):
+        values = self._get_update_values(schema_in)
+        if not self._is_statement_update(values):
+            item = await self.model.aio.first(id=pk)
+            for k, v in values.items():
+                setattr(item, k, v)
+            return await item.save()
+
+        async with self._async_session() as session:
+            if session.bind.dialect.full_returning:
+                result = await session.execute(
+                    self._get_update_statement(pk, values, returning=True)
+                )
+                item = result.scalars().first()
+            else:
+                await session.execute(self._get_update_statement(pk, values))
+                item = await session.get(self.model, pk)
+            await session.commit()
+        return item
+
+    @action()
+    async def delete(self, pk=None):
+        async with self._async_session() as session:
+            if self._is_statement_delete():
+                result = await session.execute(self._get_delete_statement(pk))
+                deleted = bool(result.rowcount)
+            else:
+                item = await session.get(self.model, pk)
+                deleted = item is not None
+                if deleted:
+                    await session.delete(item)
+            await session.commit()
+        return {'id': pk, 'result': deleted}
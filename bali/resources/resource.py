@@ -6,22 +6,47 @@ Resource's method input is Pydantic schema
 
 """
 
+import functools
+import inspect
 from collections import OrderedDict
-from typing import Optional
+from typing import List, Optional
 
 import humps
 from fastapi import HTTPException, status
-from fastapi_pagination import LimitOffsetPage
-from google.protobuf import message
+from google.protobuf import field_mask_pb2, message
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
 from .generic_routes import *
+from .response_cache import (
+    WRITE_ACTIONS,
+    ResponseCache,
+    invalidate,
+    invalidating,
+)
 from .._utils import pluralize
-from ..routing import APIRouter
-from ..schemas import ResultResponse, model_to_schema
+from ..application import GzipRequest
+from ..db.operators import REVERSER
+from ..exceptions import InvalidCursorError
+from ..executors import ExecutorRejectedError, get_executor
+from ..paginate import CursorLimitOffsetPage
+from ..routing import APIRoute, APIRouter
+from ..schemas import ListRequest, ResultResponse, model_to_schema
 
 __all__ = ['GENERIC_ACTIONS', 'Resource', 'pre_process']
 
+# Request scope key of the request scoped resource
+RESOURCE_SCOPE_KEY = 'bali.resource'
+DEFERRED_PERMISSIONS_SCOPE_KEY = 'bali.deferred_permissions'
+
+
+def is_sync_permission(permission_class) -> bool:
+    """Permission class without async `process_auth` and `has_permission`"""
+    return not (
+        inspect.iscoroutinefunction(permission_class.process_auth) or
+        inspect.iscoroutinefunction(permission_class.has_permission)
+    )
+
 GENERIC_ACTIONS = [
     'list',
     'get',
@@ -74,8 +99,45 @@ class Resource(metaclass=ResourceMeta):
     filters = []
     permission_classes = []
 
+    # Fields allowed in list's `ordering`, eg: `['id', 'created_time']`,
+    # the other requested fields are ignored
+    ordering_fields = []
+
+    # Named executor runs sync actions, `None` is the shared thread pool
+    executor = None
+
+    # Generate streaming list, NDJSON `GET /items/stream`
+    # and server-streaming RPC `StreamItems`
+    stream_list = False
+
+    # Total count policy of list action: `exact`, `none` (`has_more` only),
+    # `estimated` (query planner statistics) or `cached` (in `bali.cache`)
+    count_policy = 'exact'
+    count_cache_timeout = 60
+
+    # HTTP response cache of GET actions, eg: `{'get': 300, 'list': 60}`,
+    # invalidated by the resource's write actions
+    cache = None
+
+    # Serialize list/get/create/update results by the schema's compiled
+    # encoder, the route's `response_model` validation is skipped
+    fast_response = False
+
     _actions = OrderedDict()
 
+    # Resource is instantiated per request,
+    # slots keep the per request state cheap to create and access,
+    # subclasses without `__slots__` have `__dict__` for their own attributes
+    __slots__ = (
+        '_request',
+        '_context',
+        '_response_message',
+        '_is_rpc',
+        '_is_http',
+        'auth',
+        '_resolved_auth',
+    )
+
     def __init__(self, request=None, context=None, response_message=None):
         self._request = request
         self._context = context
@@ -85,6 +147,52 @@ class Resource(metaclass=ResourceMeta):
         self._is_http = not self._is_rpc
 
         self.auth = BaseModel()
+        # `process_auth` functions resolved in the request
+        self._resolved_auth = set()
+
+    def get_fields(self) -> List[str]:
+        """Sparse fieldset of the request, restricted to schema's fields
+
+        HTTP: `?fields=id,name`, gRPC: `fields` (`google.protobuf.FieldMask`)
+        of request message. Empty list means all fields.
+        """
+        if self._is_rpc:
+            mask = getattr(self._request, 'fields', None)
+            if not isinstance(mask, field_mask_pb2.FieldMask):
+                return []
+            fields = list(mask.paths)
+        else:
+            query_params = getattr(self._request, 'query_params', None)
+            if not query_params:
+                return []
+            fields = [
+                v for value in query_params.getlist('fields')
+                for v in value.split(',') if v
+            ]  # yapf: disable
+
+        schema_fields = getattr(self.schema, '__fields__', None)
+        if schema_fields:
+            fields = [f for f in fields if f in schema_fields]
+        return list(dict.fromkeys(fields))
+
+    def get_ordering(self, schema_in: ListRequest) -> List[str]:
+        """List's ordering restricted to `ordering_fields`, eg: `['-age']`"""
+        ordering = []
+        for expression in schema_in.ordering:
+            name = expression.lstrip(REVERSER)
+            if name in self.ordering_fields:
+                ordering.append(expression)
+        return ordering
+
+    @classmethod
+    def check_ordering_fields(cls):
+        """Validate `ordering_fields` when router or servicer generated"""
+        pass
+
+    @classmethod
+    def invalidate_cache(cls):
+        """Invalidate cached responses, eg: after written by custom actions"""
+        invalidate(cls)
 
     # noinspection PyMethodFirstArgAssignment
     @classmethod
@@ -112,6 +220,33 @@ def pre_process(resource_cls):
     return resource_cls
 
 
+class ResourceRoute(APIRoute):
+    """Route checks resource's permissions before the endpoint
+
+    Async permission classes are awaited in the event loop, sync permission
+    classes of sync endpoints are checked by the endpoint in its thread.
+    The request scoped resource is reused by the endpoint.
+    """
+    router_generator = None
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        router_generator = self.router_generator
+        sync_endpoint = not inspect.iscoroutinefunction(
+            inspect.unwrap(self.endpoint)
+        )
+
+        async def route_handler(request):
+            # the resource keeps the request the endpoint receives
+            request = GzipRequest.from_request(request)
+            await router_generator.async_get_resource(
+                request, defer_sync_permissions=sync_endpoint
+            )
+            return await handler(request)
+
+        return route_handler
+
+
 # noinspection PyUnresolvedReferences
 class Generator:
     @property
@@ -122,6 +257,11 @@ class Generator:
     def primary_key(self):
         return 'id'
 
+    def get_executor_name(self, action):
+        """Action's named executor, default is Resource's `executor`"""
+        method = getattr(self.cls, action)
+        return getattr(method, '_executor', None) or self.cls.executor
+
 
 # noinspection PyShadowingBuiltins,PyUnresolvedReferences,PyProtectedMember
 # noinspection PyShadowingNames,DuplicatedCode
@@ -131,11 +271,27 @@ class RouterGenerator(Generator):
     """
     def __init__(self, cls):
         self.cls = cls
+        self.cls.check_ordering_fields()
         self.router = APIRouter()
         self._ordered_filters = self._get_ordered_filters()
+        self._list_params_parser = compile_list_params(self._ordered_filters)
 
     def __call__(self):
 
+        # Batch routes must be above generic get action `/item/{id}`
+        for action in getattr(self.cls, 'batch_actions', []):
+            self.add_batch_route(action)
+
+        if self.cls.stream_list and hasattr(self.cls, 'list'):
+            self.router.add_api_route(
+                '/stream',
+                stream_list_(self),
+                methods=['GET'],
+                response_class=StreamingResponse,
+                summary=f'Stream {self.resource_name}',
+                route_class_override=self.get_route_class('stream'),
+            )
+
         # To fixed generic get action `/item/{id}` conflict with
         # custom action `/item/hello`,
         # must make sure get action `/item/{id}` is below custom action
@@ -151,8 +307,111 @@ class RouterGenerator(Generator):
             self.add_route(action, extra)
         return self.router
 
-    def check_permissions(self, resource):
-        for permission_class in self.cls.permission_classes:
+    def add_api_route(self, action, path, endpoint, **kwargs):
+        """Add action's route
+
+        Endpoint runs in action's bulkhead executor, GET responses are
+        cached by resource's `cache`, write actions invalidate the cache.
+        """
+        endpoint = self.bulkhead(action, endpoint)
+        if self.cls.cache and action in WRITE_ACTIONS:
+            endpoint = invalidating(self.cls, endpoint)
+
+        methods = [m.upper() for m in kwargs.get('methods') or []]
+        kwargs['route_class_override'] = self.get_route_class(action, methods)
+        self.router.add_api_route(path, endpoint, **kwargs)
+
+    def get_route_class(self, action, methods=None):
+        """Route class checks permissions before the endpoint and
+        serves cached responses
+        """
+        route_class = APIRoute
+        if self.cls.permission_classes:
+            route_class = type(
+                'ResourceRoute', (ResourceRoute, ), {'router_generator': self}
+            )
+
+        response_cache = ResponseCache.from_resource(self, action)
+        if response_cache and 'GET' in (methods or []):
+            route_class = response_cache.route_class(route_class)
+        return route_class
+
+    def bulkhead(self, action, endpoint):
+        """Run sync endpoint in action's named executor"""
+        name = self.get_executor_name(action)
+        if not name or inspect.iscoroutinefunction(endpoint):
+            return endpoint
+
+        endpoint_func = APIRoute._inject_scoped_session_clear(endpoint)
+
+        @functools.wraps(endpoint)
+        async def bulkhead_endpoint(*args, **kwargs):
+            try:
+                return await get_executor(name).run(
+                    endpoint_func, *args, **kwargs
+                )
+            except ExecutorRejectedError:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail='Service Unavailable',
+                )
+
+        return bulkhead_endpoint
+
+    def get_resource(self, request):
+        """Create a request scoped resource and check permissions
+
+        Each request has its own resource instance, so concurrent
+        requests never share `_request` or `auth`. The instance is kept
+        in request's scope, permissions are checked once per request.
+        """
+        if request is not None:
+            resource = request.scope.get(RESOURCE_SCOPE_KEY)
+            if type(resource) is self.cls:
+                # sync permissions deferred to the endpoint's thread
+                deferred = request.scope.pop(DEFERRED_PERMISSIONS_SCOPE_KEY, ())
+                self.check_permissions(resource, deferred)
+                return resource
+
+        resource = self.cls(request)
+        self.check_permissions(resource)
+        if request is not None:
+            request.scope[RESOURCE_SCOPE_KEY] = resource
+        return resource
+
+    async def async_get_resource(self, request, defer_sync_permissions=False):
+        """Create a request scoped resource, async permissions are awaited
+
+        Sync permission classes are checked together in one thread pool
+        hop, or by `get_resource` in the endpoint's thread when deferred.
+        """
+        resource = request.scope.get(RESOURCE_SCOPE_KEY)
+        if type(resource) is self.cls:
+            return resource
+
+        resource = self.cls(request)
+        sync_classes = [
+            c for c in self.cls.permission_classes if is_sync_permission(c)
+        ]
+        await self.async_check_permissions(
+            resource,
+            [c for c in self.cls.permission_classes if c not in sync_classes],
+        )
+        if sync_classes and defer_sync_permissions:
+            request.scope[DEFERRED_PERMISSIONS_SCOPE_KEY] = sync_classes
+        elif sync_classes:
+            await run_in_threadpool(
+                APIRoute._inject_scoped_session_clear(self.check_permissions),
+                resource,
+                sync_classes,
+            )
+        request.scope[RESOURCE_SCOPE_KEY] = resource
+        return resource
+
+    def check_permissions(self, resource, permission_classes=None):
+        if permission_classes is None:
+            permission_classes = self.cls.permission_classes
+        for permission_class in permission_classes:
             permission = permission_class(resource)
             if not permission.check():
                 raise HTTPException(
@@ -160,6 +419,17 @@ class RouterGenerator(Generator):
                     detail='Permission Denied',
                 )
 
+    async def async_check_permissions(self, resource, permission_classes=None):
+        if permission_classes is None:
+            permission_classes = self.cls.permission_classes
+        for permission_class in permission_classes:
+            permission = permission_class(resource)
+            if not await permission.async_check():
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail='Permission Denied',
+                )
+
     def _get_ordered_filters(self):
         filters = OrderedDict()
         for item in self.cls.filters:
@@ -172,46 +442,39 @@ class RouterGenerator(Generator):
         self, action, detail=False, methods=list, schema_in_annotation=None
     ):
         """Convert Resource instance method to FastAPI endpoint"""
-        resource = self.cls()
-        action_func = getattr(resource, action)
+        action_func = getattr(self.cls, action)
 
         def endpoint(request: Request = None):
-            resource._request = request
-            self.check_permissions(resource)
-            return action_func()
+            resource = self.get_resource(request)
+            return getattr(resource, action)()
 
         async def async_endpoint(request: Request = None):
-            resource._request = request
-            self.check_permissions(resource)
-            return await action_func()
+            resource = self.get_resource(request)
+            return await getattr(resource, action)()
 
         def endpoint_detail(pk: int, request: Request = None):
-            resource._request = request
-            self.check_permissions(resource)
-            return action_func(pk)
+            resource = self.get_resource(request)
+            return getattr(resource, action)(pk)
 
         async def async_endpoint_detail(pk: int, request: Request = None):
-            resource._request = request
-            self.check_permissions(resource)
-            return await action_func(pk)
+            resource = self.get_resource(request)
+            return await getattr(resource, action)(pk)
 
         def endpoint_schema(
             schema_in: BaseModel = None, request: Request = None, **kwargs
         ):
-            resource._request = request
-            self.check_permissions(resource)
+            resource = self.get_resource(request)
             if 'get' in methods and schema_in_annotation:
                 schema_in = schema_in_annotation(**kwargs)
-            return action_func(schema_in)
+            return getattr(resource, action)(schema_in)
 
         async def async_endpoint_schema(
             schema_in: BaseModel = None, request: Request = None, **kwargs
         ):
-            resource._request = request
-            self.check_permissions(resource)
+            resource = self.get_resource(request)
             if 'get' in methods and schema_in_annotation:
                 schema_in = schema_in_annotation(**kwargs)
-            return await action_func(schema_in)
+            return await getattr(resource, action)(schema_in)
 
         sig = inspect.signature(getattr(self.cls, action))
 
@@ -254,17 +517,42 @@ class RouterGenerator(Generator):
 
         return route
 
+    def add_batch_route(self, action):
+        """Add batch route, eg: `POST /items/batch-create`"""
+        batch_action = f'batch_{action}'
+        batch_route = {
+            'get': batch_get_,
+            'create': batch_create_,
+            'update': batch_update_,
+            'delete': batch_delete_,
+        }[action]
+
+        response_model = List[self.cls.schema]
+        if action == 'delete':
+            response_model = ResultResponse
+
+        self.add_api_route(
+            batch_action,
+            f'/batch-{action}',
+            batch_route(self),
+            methods=['GET' if action == 'get' else 'POST'],
+            response_model=response_model,
+            summary=f'Batch {action} {self.resource_name}',
+        )
+
     def add_route(self, action, extra):
         if action == 'list':
-            self.router.add_api_route(
+            self.add_api_route(
+                'list',
                 '',
                 list_(self),
                 methods=['GET'],
-                response_model=LimitOffsetPage[self.cls.schema],
+                response_model=CursorLimitOffsetPage[self.cls.schema],
                 summary=f'List {self.resource_name}'
             )
         elif action == 'create':
-            self.router.add_api_route(
+            self.add_api_route(
+                'create',
                 '',
                 create_(self),
                 methods=['POST'],
@@ -273,7 +561,8 @@ class RouterGenerator(Generator):
                 status_code=status.HTTP_201_CREATED,
             )
         elif action == 'get':
-            self.router.add_api_route(
+            self.add_api_route(
+                'get',
                 '/{%s}' % self.primary_key,
                 get_(self),
                 methods=['GET'],
@@ -281,7 +570,8 @@ class RouterGenerator(Generator):
                 summary=f'Get {self.resource_name}',
             )
         elif action == 'update':
-            self.router.add_api_route(
+            self.add_api_route(
+                'update',
                 '/{%s}' % self.primary_key,
                 update_(self),
                 methods=['PATCH'],
@@ -289,7 +579,8 @@ class RouterGenerator(Generator):
                 summary=f'Update {self.resource_name}'
             )
         elif action == 'delete':
-            self.router.add_api_route(
+            self.add_api_route(
+                'delete',
                 '/{%s}' % self.primary_key,
                 delete_(self),
                 methods=['DELETE'],
@@ -301,7 +592,8 @@ class RouterGenerator(Generator):
             methods = extra.get('methods')
             schema_in_annotation = extra.get('schema_in_annotation')
             path = '/{%s}' % self.primary_key if detail else ''
-            self.router.add_api_route(
+            self.add_api_route(
+                action,
                 f"{path}/{action.replace('_', '-')}",
                 self.get_endpoint(
                     action,
@@ -321,6 +613,7 @@ class ServicerGenerator(Generator):
     """
     def __init__(self, cls):
         self.cls = cls
+        self.cls.check_ordering_fields()
 
     def __call__(self, app):
         self.app = app
@@ -335,6 +628,74 @@ class ServicerGenerator(Generator):
                 continue
             self.add_servicer(action, extra)
 
+        for action in getattr(self.cls, 'batch_actions', []):
+            self.add_batch_servicer(action)
+
+        if self.cls.stream_list and hasattr(self.cls, 'list'):
+            self.add_stream_servicer()
+
+    def bulkhead(self, action, servicer):
+        """Run sync servicer in action's named executor"""
+        name = self.get_executor_name(action)
+        if not name:
+            return servicer
+
+        import grpc
+        servicer_func = APIRoute._inject_scoped_session_clear(servicer)
+
+        def bulkhead_servicer(_, request, context):
+            try:
+                return get_executor(name).call(
+                    servicer_func, _, request, context
+                )
+            except ExecutorRejectedError as ex:
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(ex))
+
+        return bulkhead_servicer
+
+    def add_stream_servicer(self):
+        """Add server-streaming list servicer, eg: `StreamItems`"""
+        from .grpc_actions import process_stream_rpc, process_stream_rpc_async
+
+        method = f"Stream{self.cls._get_rpc_object('list')}"
+        response_pb = self.app.pb2.ListResponse
+
+        def servicer(_, request, context):
+            resource = self.cls(request, context, response_pb)
+            yield from process_stream_rpc(resource)
+
+        async def async_servicer(_, request, context):
+            resource = self.cls(request, context, response_pb)
+            async for response in process_stream_rpc_async(resource):
+                yield response
+
+        if inspect.iscoroutinefunction(getattr(self.cls, 'list')):
+            servicer = async_servicer
+
+        setattr(self.app._rpc_servicer, method, servicer)
+
+    def add_batch_servicer(self, action):
+        """Add batch servicer, eg: `BatchCreateItems`"""
+        from .grpc_actions import process_batch_rpc
+
+        method = f"Batch{action.capitalize()}{self.cls._get_rpc_object('list')}"
+        response_pb = self.app.pb2.ListResponse
+        if action == 'delete':
+            response_pb = self.app.pb2.ResultResponse
+
+        def servicer(_, request, context):
+            resource = self.cls(request, context, response_pb)
+            try:
+                return process_batch_rpc(resource, action)
+            except ValueError as ex:
+                import grpc
+                context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(ex))
+
+        servicer = self.bulkhead(f'batch_{action}', servicer)
+        if self.cls.cache and action != 'get':
+            servicer = invalidating(self.cls, servicer)
+        setattr(self.app._rpc_servicer, method, servicer)
+
     def add_servicer(self, action, extra):
 
         response_pb = None
@@ -351,12 +712,38 @@ class ServicerGenerator(Generator):
         elif action == 'delete':
             response_pb = self.app.pb2.ResultResponse
 
+        import grpc
+
         def servicer(_, request, context):
             resource = self.cls(
                 request,
                 context,
                 response_pb,
             )
-            return getattr(resource, action)()
+            try:
+                return getattr(resource, action)()
+            except InvalidCursorError as ex:
+                context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(ex))
+
+        # async actions only served by `grpc.aio` server
+        async def async_servicer(_, request, context):
+            resource = self.cls(
+                request,
+                context,
+                response_pb,
+            )
+            try:
+                return await getattr(resource, action)()
+            except InvalidCursorError as ex:
+                await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(ex))
+
+        if inspect.iscoroutinefunction(getattr(self.cls, action)):
+            servicer = async_servicer
+        else:
+            servicer = self.bulkhead(action, servicer)
+
+        # HTTP cached responses are invalidated by RPC writes
+        if self.cls.cache and action in WRITE_ACTIONS:
+            servicer = invalidating(self.cls, servicer)
 
         setattr(self.app._rpc_servicer, method, servicer)
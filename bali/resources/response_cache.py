@@ -0,0 +1,234 @@
+"""Response cache
+
+Declarative HTTP response caching of Resource GET actions, serialized
+responses are stored in `bali.cache`:
+
+    ```python
+    class ItemResource(ModelResource):
+        model = Item
+        schema = ItemSchema
+        cache = {
+            'get': 300,  # timeout in seconds
+            'list': {'timeout': 60, 'vary_by': ['status', 'limit', 'offset']},
+            'recents': {'timeout': 10, 'vary_by': ['auth']},
+        }
+    ```
+
+Cache key varies by action, path and query params (all params, or the
+params named in `vary_by`), `auth` in `vary_by` varies by the principal
+resolved by permission classes (default when `permission_classes` declared).
+
+Write actions (`create`, `update`, `delete` and batch writes) of the resource
+invalidate all its cached responses, by increasing the resource's cache
+generation. Permissions are always checked before a cached response is served.
+"""
+import functools
+import hashlib
+import inspect
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Response, status
+from starlette.concurrency import run_in_threadpool
+
+from .conditional import is_not_modified
+from ..application import GzipRequest
+from ..cache import DEFAULT_TIMEOUT
+from ..routing import APIRoute
+
+__all__ = ['ResponseCache', 'invalidate', 'invalidating']
+
+WRITE_ACTIONS = (
+    'create',
+    'update',
+    'delete',
+    'batch_create',
+    'batch_update',
+    'batch_delete',
+)
+
+VARY_BY_AUTH = 'auth'
+
+# Headers are not served from cache
+UNCACHED_HEADERS = ('content-length', 'date', 'server')
+
+
+def _get_cache():
+    from ..core import cache
+    return cache
+
+
+def _get_resource_key(resource_cls):
+    return f'{resource_cls.__module__}.{resource_cls.__qualname__}'
+
+
+def _get_generation_key(resource_cls):
+    return f'response_cache:{_get_resource_key(resource_cls)}:generation'
+
+
+def invalidate(resource_cls):
+    """Invalidate all cached responses of the resource"""
+    cache = _get_cache()
+    if not resource_cls.cache or not cache.configured:
+        return
+    # INCR creates the key when missing, increased atomically
+    cache._client.incr(cache.make_key(_get_generation_key(resource_cls)))
+
+
+def invalidating(resource_cls, func):
+    """Invalidate resource's cached responses after `func` succeeded"""
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            result = await func(*args, **kwargs)
+            await run_in_threadpool(invalidate, resource_cls)
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        invalidate(resource_cls)
+        return result
+
+    return wrapper
+
+
+class ResponseCache:
+    """Cache of an action's GET responses
+
+    :param router_generator: `RouterGenerator` of the resource
+    :param action: action name
+    :param timeout: cache timeout in seconds
+    :param vary_by: query param names and `auth`
+    """
+    def __init__(self, router_generator, action, timeout, vary_by):
+        self.router_generator = router_generator
+        self.action = action
+        self.timeout = timeout
+        self.vary_by_auth = VARY_BY_AUTH in vary_by
+        self.query_params = [v for v in vary_by if v != VARY_BY_AUTH]
+
+    @classmethod
+    def from_resource(cls, router_generator, action) -> Optional['ResponseCache']:
+        """Response cache of action declared by resource's `cache`"""
+        resource_cls = router_generator.cls
+        options = (resource_cls.cache or {}).get(action)
+        if options is None:
+            return None
+        if isinstance(options, int):
+            options = {'timeout': options}
+
+        vary_by = options.get('vary_by')
+        if vary_by is None:
+            vary_by = [VARY_BY_AUTH] if resource_cls.permission_classes else []
+        return cls(
+            router_generator,
+            action,
+            timeout=options.get('timeout', DEFAULT_TIMEOUT),
+            vary_by=vary_by,
+        )
+
+    def make_key(self, request, resource, generation):
+        query_params = request.query_params.multi_items()
+        if self.query_params:
+            query_params = [
+                (k, v) for k, v in query_params if k in self.query_params
+            ]
+        parts = [self.action, request.url.path, sorted(query_params)]
+        if self.vary_by_auth:
+            parts.append(resource.auth.dict())
+
+        digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+        resource_key = _get_resource_key(self.router_generator.cls)
+        return f'response_cache:{resource_key}:{generation}:{digest}'
+
+    def lookup(self, request, resource):
+        """Get cached response of the request"""
+        cache = _get_cache()
+        resource_cls = self.router_generator.cls
+        generation = cache.get(_get_generation_key(resource_cls)) or 0
+        key = self.make_key(request, resource, generation)
+        return key, cache.get(key)
+
+    def store(self, key, response):
+        headers = {
+            k: v for k, v in response.headers.items()
+            if k not in UNCACHED_HEADERS
+        }  # yapf: disable
+        _get_cache().set(
+            key,
+            {
+                'status_code': response.status_code,
+                'headers': headers,
+                'body': response.body,
+            },
+            self.timeout,
+        )
+
+    @staticmethod
+    def is_cacheable(response):
+        return (
+            response.status_code == status.HTTP_200_OK
+            and hasattr(response, 'body')
+            and 'set-cookie' not in response.headers
+        )
+
+    @staticmethod
+    def to_response(request, cached):
+        headers = cached['headers']
+        etag = headers.get('etag')
+        last_modified = headers.get('last-modified')
+        if etag and is_not_modified(
+            request,
+            etag,
+            last_modified and parsedate_to_datetime(last_modified),
+        ):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={
+                    k: v for k, v in headers.items()
+                    if k in ('etag', 'last-modified')
+                },
+            )
+        return Response(
+            content=cached['body'],
+            status_code=cached['status_code'],
+            headers=headers,
+        )
+
+    async def __call__(self, request, handler):
+        if not _get_cache().configured:
+            return await handler(request)
+
+        # permissions are checked before served from cache,
+        # the resource is reused by the endpoint in the same request
+        resource = await self.router_generator.async_get_resource(request)
+        # cache client is sync
+        key, cached = await run_in_threadpool(self.lookup, request, resource)
+        if cached is not None:
+            return self.to_response(request, cached)
+
+        response = await handler(request)
+        if self.is_cacheable(response):
+            await run_in_threadpool(self.store, key, response)
+        return response
+
+    def route_class(self, base=APIRoute):
+        """Route class serves the action from cache"""
+        response_cache = self
+
+        class ResponseCacheRoute(base):
+            def get_route_handler(self):
+                handler = super().get_route_handler()
+
+                async def cached_route_handler(request):
+                    # the resource keeps the request the endpoint receives
+                    request = GzipRequest.from_request(request)
+                    return await response_cache(request, handler)
+
+                return cached_route_handler
+
+        return ResponseCacheRoute
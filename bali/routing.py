@@ -21,10 +21,6 @@ class APIRoute(GzipRoute):
         @functools.wraps(endpoint)
         def injected_endpoint(*args, **kwargs):
             try:
-                # hack Resource list action endpoint
-                # ignored all query params in `kwargs`
-                if endpoint.__qualname__ == 'RouterGenerator._list.<locals>.route':
-                    return endpoint(*args, **{'request': kwargs.get('request')})
                 return endpoint(*args, **kwargs)
             finally:
                 try:
@@ -37,7 +33,10 @@ class APIRoute(GzipRoute):
 
 class APIRouter(FastAPIRouter):
     def add_api_route(self, *args, **kwargs):
-        kwargs.update(route_class_override=APIRoute)
+        # keep `APIRoute` subclasses, eg: response cache routes
+        route_class = kwargs.get('route_class_override')
+        if not (inspect.isclass(route_class) and issubclass(route_class, APIRoute)):
+            kwargs.update(route_class_override=APIRoute)
         return super().add_api_route(*args, **kwargs)
 
     def get(self, path, *args, **kwargs):
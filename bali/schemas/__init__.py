@@ -6,6 +6,7 @@ from sqlalchemy.inspection import inspect
 from sqlalchemy.orm.properties import ColumnProperty
 
 from .generic import *
+from .registry import SchemaRegistry, schema_registry
 
 
 class OrmConfig(BaseConfig):
@@ -18,8 +19,27 @@ def model_to_schema(
     *,
     config: Type = OrmConfig,
     exclude: Container[str] = [],
-    partial=False  # noqa
+    partial=False,  # noqa
+    cache=True,
 ) -> Type[BaseModel]:
+    """Generate schema of model's columns
+
+    Schemas are memoized in `schema_registry` by the arguments,
+    `cache=False` always generates a new schema.
+    """
+    if cache:
+        key = (db_model, tuple(sorted(exclude)), partial, config)
+        return schema_registry.get_or_create(
+            key,
+            lambda: model_to_schema(
+                db_model,
+                config=config,
+                exclude=exclude,
+                partial=partial,
+                cache=False,
+            ),
+        )
+
     mapper = inspect(db_model)
     fields = {}
     for attr in mapper.attrs:
@@ -13,6 +13,8 @@ __all__ = [
     'CreateRequest',
     'UpdateRequest',
     'DeleteRequest',
+    'BatchGetRequest',
+    'BatchDeleteRequest',
     'ItemResponse',
     'ListResponse',
     'ResultResponse',
@@ -28,6 +30,8 @@ class ListRequest(BaseModel):
     offset: int = Field(default_factory=int)
     limit: int = Field(default_factory=int)
     ordering: List[str] = Field(default_factory=list)
+    # cursor from previous response's `next_page_token`
+    page_token: str = Field(default_factory=str)
 
 
 class CreateRequest(BaseModel):
@@ -43,6 +47,14 @@ class DeleteRequest(BaseModel):
     id: int = Field(default_factory=int)
 
 
+class BatchGetRequest(BaseModel):
+    ids: List[int] = Field(default_factory=list)
+
+
+class BatchDeleteRequest(BaseModel):
+    ids: List[int] = Field(default_factory=list)
+
+
 class ItemResponse(BaseModel):
     data: List[Dict[str, Any]] = Field(default_factory=list)
 
@@ -50,6 +62,8 @@ class ItemResponse(BaseModel):
 class ListResponse(BaseModel):
     data: List[Dict[str, Any]] = Field(default_factory=list)
     count: int = Field(default_factory=int)
+    next_page_token: str = Field(default_factory=str)
+    has_more: bool = Field(default_factory=bool)
 
 
 class ResultResponse(BaseModel):
@@ -2,13 +2,40 @@
 gRPC servicer
 """
 import logging
-from concurrent import futures
 
 import grpc
 
+from ._utils import get_setting
+from .executors import configure_executor
+
 logger = logging.getLogger('bali')
 
 
+# Bali options map to gRPC channel arguments
+# ref: https://github.com/grpc/grpc/blob/master/include/grpc/impl/grpc_types.h
+RPC_SERVER_OPTIONS = {
+    'rpc_max_send_message_length': 'grpc.max_send_message_length',
+    'rpc_max_receive_message_length': 'grpc.max_receive_message_length',
+    'rpc_max_concurrent_streams': 'grpc.max_concurrent_streams',
+    'rpc_keepalive_time_ms': 'grpc.keepalive_time_ms',
+    'rpc_keepalive_timeout_ms': 'grpc.keepalive_timeout_ms',
+    'rpc_keepalive_permit_without_calls': 'grpc.keepalive_permit_without_calls',
+    'rpc_http2_max_pings_without_data': 'grpc.http2.max_pings_without_data',
+    'rpc_http2_min_ping_interval_without_data_ms':
+        'grpc.http2.min_ping_interval_without_data_ms',
+    'rpc_http2_bdp_probe': 'grpc.http2.bdp_probe',
+    'rpc_http2_max_frame_size': 'grpc.http2.max_frame_size',
+    'rpc_http2_lookahead_bytes': 'grpc.http2.lookahead_bytes',
+}
+
+RPC_EXECUTOR = 'rpc'
+
+RPC_COMPRESSIONS = {
+    'gzip': grpc.Compression.Gzip,
+    'deflate': grpc.Compression.Deflate,
+}
+
+
 class ServicerNotFound(Exception):
     pass
 
@@ -38,22 +65,123 @@ def get_servicer(app):
 
 
 # noinspection PyProtectedMember
-def make_grpc_serve(app):
-    from .interceptors import ProcessInterceptor
-
+def get_servicer_method(app):
     servicer_method = f'add_{app.title.capitalize()}ServiceServicer_to_server'
     if not hasattr(app._pb2_grpc, servicer_method):
         servicer_method = f'add_{app.title.capitalize()}Servicer_to_server'
         if not hasattr(app._pb2_grpc, servicer_method):
             raise ServicerMethodNotFound()
+    return servicer_method
+
+
+def get_grpc_server_options(app):
+    """gRPC server tuning options, applied to both sync and aio servers
+
+    Options can be provided by `Bali(**kwargs)` or upper case settings:
+
+        ```python
+        app = Bali(
+            rpc_max_workers=32,
+            rpc_maximum_concurrent_rpcs=1000,
+            rpc_max_receive_message_length=16 * 1024 * 1024,
+            rpc_keepalive_time_ms=30000,
+            rpc_compression='gzip',
+            # extra gRPC channel arguments
+            rpc_options=[('grpc.so_reuseport', 0)],
+        )
+        ```
+    """
+    options = []
+    for name, channel_argument in RPC_SERVER_OPTIONS.items():
+        value = get_setting(app, name)
+        if value is not None:
+            options.append((channel_argument, value))
+    options.extend(get_setting(app, 'rpc_options', None) or [])
+
+    compression = get_setting(app, 'rpc_compression')
+    if isinstance(compression, str):
+        compression = RPC_COMPRESSIONS[compression.lower()]
+
+    return {
+        'options': options,
+        'maximum_concurrent_rpcs': get_setting(
+            app, 'rpc_maximum_concurrent_rpcs'
+        ),
+        'compression': compression,
+    }
+
+
+def make_thread_pool(app):
+    """gRPC server thread pool, registered as `rpc` executor
+
+    Server's queue is unbounded, concurrent RPCs are limited by
+    `rpc_maximum_concurrent_rpcs`.
+    """
+    return configure_executor(
+        RPC_EXECUTOR,
+        max_workers=get_setting(app, 'rpc_max_workers', 10),
+        max_queue=None,
+    )
+
+
+# noinspection PyProtectedMember
+def make_grpc_aio_server(app):
+    """Construct a `grpc.aio` server bind to `rpc_host:rpc_port`
+
+    Must be called in a running event loop, the server is not started.
+    Sync servicer methods are executed in the migration thread pool.
+    """
+    from .aio.interceptors import ProcessInterceptor
+
+    servicer_method = get_servicer_method(app)
+    server = grpc.aio.server(
+        migration_thread_pool=make_thread_pool(app),
+        interceptors=[ProcessInterceptor()],
+        **get_grpc_server_options(app),
+    )
+
+    servicer = getattr(app._pb2_grpc, servicer_method)
+    servicer(app._rpc_servicer(), server)
+    server.add_insecure_port(f'{app.rpc_host}:{app.rpc_port}')
+    return server
+
+
+# noinspection PyProtectedMember
+def make_grpc_serve(app, aio=None):
+    """Make gRPC serve function
+
+    :param app: Bali application
+    :param aio: `True` returns a coroutine serve function using `grpc.aio`,
+                default is `rpc_aio` option (`Bali(rpc_aio=True)`
+                or settings `RPC_AIO`)
+    """
+    from .interceptors import ProcessInterceptor
+
+    servicer_method = get_servicer_method(app)
+
+    if aio is None:
+        aio = get_setting(app, 'rpc_aio', False)
+
+    async def aio_serve():
+        server = make_grpc_aio_server(app)
+        await server.start()
+        logger.info(
+            "RPC Service started on port: %s (env: %s, aio)",
+            app.rpc_port, 'default'
+        )
+        await server.wait_for_termination()
+
+    if aio:
+        return aio_serve
 
     # noinspection PyProtectedMember
     def serve():
         host = app.rpc_host
         port = app.rpc_port
         server = grpc.server(
-            futures.ThreadPoolExecutor(max_workers=10),
+            make_thread_pool(app),
             interceptors=[ProcessInterceptor()],
+            **get_grpc_server_options(app),
         )
 
         servicer = getattr(app._pb2_grpc, servicer_method)
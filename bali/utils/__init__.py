@@ -2,14 +2,21 @@ import asyncio
 from datetime import datetime, date
 from decimal import Decimal
 from enum import Enum
+from importlib import import_module
 
 import pytz
 from google.protobuf import json_format
 
-from .dateparse import *
 from .timezone import StrTzInfoType, make_aware, is_aware
 
 
+def __getattr__(name):
+    # `dateparser` is slow to import, only imported when accessed
+    if name == 'dateparser':
+        return import_module('dateparser')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 class ProtobufParser(json_format._Parser):  # noqa
     def _ConvertValueMessage(self, value, message, path=''):
         """Convert a JSON representation into Value message."""
@@ -0,0 +1,116 @@
+"""
+Fast JSON response benchmark
+
+Compare serializing a list page of model instances through route's
+`response_model` (page validated from instances, re-validated by the
+response model and encoded by `jsonable_encoder`) with the fast response
+mode (`Resource.fast_response`, compiled encoder and `orjson` if installed).
+
+Usage (run in project root directory):
+
+    ```bash
+    python benchmarks/fast_response.py --rows 100 1000 --number 200
+    ```
+"""
+import argparse
+import datetime
+import os
+import sys
+import timeit
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi_pagination import LimitOffsetParams, set_page  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+from sqlalchemy import Column, DateTime, Integer, String  # noqa: E402
+from sqlalchemy.orm import declarative_base  # noqa: E402
+
+from bali.paginate import CursorLimitOffsetPage, paginate  # noqa: E402
+from bali.resources import fast_response  # noqa: E402
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = 'items'
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50))
+    description = Column(String(200))
+    quantity = Column(Integer)
+    created_time = Column(DateTime)
+
+
+class ItemSchema(BaseModel):
+    id: int
+    name: str
+    description: Optional[str]
+    quantity: int
+    created_time: datetime.datetime
+
+    class Config:
+        orm_mode = True
+
+
+ItemPage = CursorLimitOffsetPage[ItemSchema]
+
+
+def make_rows(count):
+    now = datetime.datetime.utcnow()
+    return [
+        Item(
+            id=i,
+            name=f'item-{i}',
+            description='benchmark item',
+            quantity=i % 10,
+            created_time=now,
+        ) for i in range(count)
+    ]
+
+
+def validated_response(rows, params):
+    """Page validated from instances, serialized as FastAPI does"""
+    set_page(ItemPage)
+    page = paginate(rows, params)
+    content = ItemPage.parse_obj(page.dict(by_alias=True))
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast_json_response(rows, params):
+    page = paginate(
+        rows, params, serializer=fast_response.compile_encoder(ItemSchema)
+    )
+    return fast_response.FastJSONResponse(
+        fast_response.page_content(page)
+    ).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args()
+
+    encoder = 'orjson' if fast_response.orjson is not None else 'json'
+    print(f'fast response encoder: {encoder}')
+    for count in args.rows:
+        rows = make_rows(count)
+        # page size is out of the params' limit
+        params = LimitOffsetParams.construct(limit=count, offset=0)
+        for name, serialize in [
+            ('validated', validated_response),
+            ('fast', fast_json_response),
+        ]:
+            elapsed = timeit.timeit(
+                lambda: serialize(rows, params), number=args.number
+            )
+            print(
+                f'{count:>5} rows  {name:<10} '
+                f'{elapsed / args.number * 1e3:>8.3f} ms/page'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+gRPC server benchmark
+
+Compare thread pool server (`make_grpc_serve`) with `grpc.aio` server
+(`make_grpc_serve(app, aio=True)`), each RPC simulates an I/O wait.
+
+Usage (run in project root directory):
+
+    ```bash
+    python benchmarks/grpc_server.py --requests 2000 --concurrency 200
+    ```
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+import types
+
+import grpc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.test_services.protos import helloworld_pb2 as pb2  # noqa: E402
+from tests.test_services.protos import helloworld_pb2_grpc as pb2_grpc  # noqa: E402
+
+IO_WAIT = 0.01  # seconds
+
+
+class ThreadPoolServicer(pb2_grpc.HelloworldServicer):
+    def SayHello(self, request, context):
+        time.sleep(IO_WAIT)
+        return pb2.HelloReply(message=request.name)
+
+
+class AioServicer(pb2_grpc.HelloworldServicer):
+    async def SayHello(self, request, context):
+        await asyncio.sleep(IO_WAIT)
+        return pb2.HelloReply(message=request.name)
+
+
+def serve(port, aio):
+    from bali import Bali
+    from bali.utils import sync_exec
+    from bali.servicer import make_grpc_serve
+
+    servicer = AioServicer if aio else ThreadPoolServicer
+    app = Bali(
+        title='helloworld',
+        rpc_service=types.SimpleNamespace(HelloworldServicer=servicer),
+        rpc_host='127.0.0.1',
+        rpc_port=port,
+    )
+    serve_func = make_grpc_serve(app, aio=aio)
+    if aio:
+        sync_exec(serve_func())
+    else:
+        serve_func()
+
+
+async def run_client(port, requests, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with grpc.aio.insecure_channel(f'127.0.0.1:{port}') as channel:
+        stub = pb2_grpc.HelloworldStub(channel)
+        await stub.SayHello(pb2.HelloRequest(name='warmup'), wait_for_ready=True)
+
+        async def call(i):
+            async with semaphore:
+                started = time.perf_counter()
+                await stub.SayHello(pb2.HelloRequest(name=str(i)))
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[call(i) for i in range(requests)])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'throughput': requests / elapsed,
+        'p50': statistics.median(latencies) * 1000,
+        'p99': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def benchmark(name, port, aio, requests, concurrency):
+    context = multiprocessing.get_context('spawn')
+    process = context.Process(target=serve, args=(port, aio), daemon=True)
+    process.start()
+    try:
+        result = asyncio.run(run_client(port, requests, concurrency))
+    finally:
+        process.terminate()
+        process.join()
+
+    print(
+        f"{name:<12} {result['throughput']:>10.1f} req/s  "
+        f"p50 {result['p50']:>8.2f} ms  p99 {result['p99']:>8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--port', type=int, default=50061)
+    args = parser.parse_args()
+
+    print(
+        f'{args.requests} requests, concurrency {args.concurrency}, '
+        f'I/O wait {IO_WAIT * 1000:.0f} ms'
+    )
+    benchmark('thread-pool', args.port, False, args.requests, args.concurrency)
+    benchmark('grpc.aio', args.port + 1, True, args.requests, args.concurrency)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+List query params parser benchmark
+
+Compare the per request parser of list action (re-inspect annotations on
+every call) with the parser compiled once per resource
+(`compile_list_params`).
+
+Usage (run in project root directory):
+
+    ```bash
+    python benchmarks/list_params.py --number 100000
+    ```
+"""
+import argparse
+import logging
+import os
+import sys
+import timeit
+import typing
+from collections import OrderedDict
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.datastructures import QueryParams  # noqa: E402
+
+from bali.resources.generic_routes import compile_list_params  # noqa: E402
+from bali.schemas import ListRequest  # noqa: E402
+
+FILTERS = OrderedDict([
+    ('username', str),
+    ('age', Optional[int]),
+    ('age__gte', Optional[int]),
+    ('id__in', List[int]),
+    ('created_time__gte', Optional[str]),
+])
+
+QUERY_STRING = (
+    'username=bali&age=18&age__gte=10&id__in=1&id__in=2&id__in=3'
+    '&offset=20&limit=10'
+)
+
+
+def legacy_parse(query_params):
+    """Parser of list action before compiled"""
+    params = query_params._dict
+
+    filters = {}
+    for k, v in params.items():
+        if k not in FILTERS:
+            continue
+        # noinspection PyBroadException
+        try:
+            params_converter = FILTERS.get(k)
+            if isinstance(params_converter, typing._GenericAlias):
+                params_converter = params_converter.__args__[0]
+            filters[k] = params_converter(v)
+        except Exception as ex:
+            logging.warning(
+                'Query params `%s`(value: %s) type convert failed, '
+                'exception: %s', k, v, ex
+            )
+            continue
+
+    return ListRequest(**params, filters=filters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--number', type=int, default=100000)
+    args = parser.parse_args()
+
+    query_params = QueryParams(QUERY_STRING)
+    compiled_parse = compile_list_params(FILTERS)
+
+    print(f'?{QUERY_STRING}')
+    for name, parse in [('legacy', legacy_parse), ('compiled', compiled_parse)]:
+        elapsed = timeit.timeit(lambda: parse(query_params), number=args.number)
+        print(
+            f'{name:<10} {elapsed / args.number * 1e6:>8.2f} us/call  '
+            f'{parse(query_params).filters}'
+        )
+
+
+if __name__ == '__main__':
+    main()
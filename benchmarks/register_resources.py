@@ -0,0 +1,89 @@
+"""
+Resource registration benchmark
+
+Compare registering resources one by one (`app.register(resource)`) with
+batched registration (`app.batch_register()`), measures registration
+and application startup (lifespan) time.
+
+Usage (run in project root directory):
+
+    ```bash
+    python benchmarks/register_resources.py --resources 50 100 200
+    ```
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from bali import Bali, Resource, Schema  # noqa: E402
+from bali.decorators import action  # noqa: E402
+
+
+class ItemSchema(Schema):
+    id: int
+    content: str
+
+
+def make_resources(count):
+    resources = []
+    for i in range(count):
+
+        class ItemResource(Resource):
+            schema = ItemSchema
+            http_endpoint = f'/items-{i}'
+
+            @action()
+            def list(self, schema_in=None):
+                return []
+
+            @action()
+            def get(self, pk=None):
+                return {'id': pk, 'content': 'item'}
+
+        resources.append(ItemResource)
+    return resources
+
+
+def benchmark(name, count, batch):
+    Bali.__clear__()
+    app = Bali()
+    resources = make_resources(count)
+
+    started = time.perf_counter()
+    if batch:
+        with app.batch_register():
+            for resource in resources:
+                app.register(resource)
+    else:
+        for resource in resources:
+            app.register(resource)
+    registered = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with TestClient(app):
+        pass
+    startup = time.perf_counter() - started
+
+    print(
+        f'{name:<12} {count:>5} resources  '
+        f'register {registered * 1000:>9.1f} ms  startup {startup * 1000:>9.1f} ms'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--resources', type=int, nargs='+', default=[50, 100, 200])
+    args = parser.parse_args()
+
+    for count in args.resources:
+        benchmark('one-by-one', count, batch=False)
+        benchmark('batched', count, batch=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Model serializers benchmark
+
+Compare serializing model instances by `schema.from_orm(item).dict()` and
+walking ORM descriptors (`BaseModel._asdict` before compiled) with the
+serializers compiled once per model (`bali.db.serializers`).
+
+Usage (run in project root directory):
+
+    ```bash
+    python benchmarks/serializers.py --rows 1000 --number 100
+    ```
+"""
+import argparse
+import datetime
+import os
+import sys
+import timeit
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import BaseModel  # noqa: E402
+from sqlalchemy import Column, DateTime, Integer, String  # noqa: E402
+from sqlalchemy.inspection import inspect  # noqa: E402
+from sqlalchemy.orm import declarative_base  # noqa: E402
+from sqlalchemy.orm.attributes import InstrumentedAttribute  # noqa: E402
+
+from bali.db.serializers import to_dicts  # noqa: E402
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = 'items'
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50))
+    description = Column(String(200))
+    quantity = Column(Integer)
+    created_time = Column(DateTime)
+
+
+class ItemSchema(BaseModel):
+    id: int
+    name: str
+    description: Optional[str]
+    quantity: int
+    created_time: datetime.datetime
+
+    class Config:
+        orm_mode = True
+
+
+def make_rows(count):
+    now = datetime.datetime.utcnow()
+    return [
+        Item(
+            id=i,
+            name=f'item-{i}',
+            description='benchmark item',
+            quantity=i % 10,
+            created_time=now,
+        ) for i in range(count)
+    ]
+
+
+def legacy_asdict(item):
+    """`BaseModel._asdict` before compiled"""
+    output_fields = [
+        i.key for i in inspect(type(item)).all_orm_descriptors
+        if isinstance(i, InstrumentedAttribute)
+    ]
+    return {i: getattr(item, i, None) for i in output_fields}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--number', type=int, default=100)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    cases = [
+        ('from_orm', lambda: [ItemSchema.from_orm(i).dict() for i in rows]),
+        ('schema', lambda: to_dicts(rows, schema=ItemSchema)),
+        ('asdict', lambda: [legacy_asdict(i) for i in rows]),
+        ('model', lambda: to_dicts(rows)),
+    ]
+    for name, serialize in cases:
+        elapsed = timeit.timeit(serialize, number=args.number)
+        print(
+            f'{args.rows:>5} rows  {name:<10} '
+            f'{elapsed / args.number * 1e3:>8.3f} ms'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -34,3 +34,27 @@ class TestBaliApp:
 
         assert len(app._app.routes) == init_routes_count + 1
 
+    def test_batch_register(self):
+        class BatchSchema(Schema):
+            content: str
+
+        class BatchResource(Resource):
+            schema = BatchSchema
+
+            @action()
+            def get(self, pk=None):
+                return {'content': f'hello, ID is {pk}'}
+
+        app = Bali()
+        lifespan_context = app._app.router.lifespan_context
+        init_routes_count = len(app._app.routes)
+
+        with app.batch_register():
+            app.register(BatchResource)
+            # pagination is finalized when exit batch
+            assert app._pagination_pending
+
+        assert not app._pagination_pending
+        assert len(app._app.routes) == init_routes_count + 1
+        # lifespan is not wrapped by every registration
+        assert app._app.router.lifespan_context is lifespan_context
@@ -0,0 +1,131 @@
+import zlib
+
+import pytest
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from bali import Bali, APIRouter
+from bali.middlewares import CompressionMiddleware, CompressionResponder
+
+router = APIRouter()
+
+PAYLOAD = 'bali' * 1000
+
+
+@router.get('/text')
+def text():
+    return PlainTextResponse(PAYLOAD)
+
+
+@router.get('/small')
+def small():
+    return PlainTextResponse('bali')
+
+
+@router.get('/image')
+def image():
+    return PlainTextResponse(PAYLOAD, media_type='image/svg+xml')
+
+
+@router.get('/stream')
+def stream():
+    return StreamingResponse(iter([PAYLOAD, PAYLOAD]), media_type='text/plain')
+
+
+def get_compression_middleware(app):
+    for middleware in app.user_middleware:
+        if middleware.cls is CompressionMiddleware:
+            return middleware
+    return None
+
+
+class TestCompressionMiddleware:
+    def setup_method(self):
+        Bali.__clear__()
+
+    def teardown_method(self):
+        Bali.__clear__()
+
+    def test_disabled_by_default(self):
+        app = Bali(routers=[{'router': router}])
+        assert get_compression_middleware(app._app) is None
+
+    def test_compression(self):
+        app = Bali(routers=[{'router': router}], http_compression=True)
+        client = TestClient(app)
+
+        response = client.get('/text')
+        assert response.headers['content-encoding'] == 'gzip'
+        assert response.text == PAYLOAD
+
+        response = client.get('/small')
+        assert 'content-encoding' not in response.headers
+
+        response = client.get('/image')
+        assert 'content-encoding' not in response.headers
+
+        response = client.get('/stream')
+        assert response.headers['content-encoding'] == 'gzip'
+        assert response.text == PAYLOAD * 2
+
+    def test_minimum_size_and_excluded_content_types(self):
+        app = Bali(
+            routers=[{'router': router}],
+            http_compression=True,
+            http_compression_minimum_size=10,
+            http_compression_exclude_content_types=['text/'],
+        )
+        client = TestClient(app)
+
+        response = client.get('/text')
+        assert 'content-encoding' not in response.headers
+
+        response = client.get('/image')
+        assert response.headers['content-encoding'] == 'gzip'
+
+
+def test_compressed_bytes_cache():
+    middleware = CompressionMiddleware(None)
+    body = PAYLOAD.encode()
+
+    compressed = middleware.compress(body)
+    assert middleware.compress(body) is compressed
+    assert middleware.cache_hits == 1
+    assert middleware.cache_misses == 1
+
+    # bounded by compressed bytes, least recently used are evicted
+    middleware = CompressionMiddleware(None, cache_max_bytes=2 * len(compressed))
+    compressed = middleware.compress(body)
+    middleware.compress(b'1' * len(body))
+    middleware.compress(b'2' * len(body))
+    assert middleware.compress(body) is not compressed
+    assert middleware._cache_bytes <= middleware.cache_max_bytes
+    assert middleware._cache_bytes == sum(map(len, middleware._cache.values()))
+
+
+@pytest.mark.asyncio
+async def test_streaming_chunks_flushed():
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    responder = CompressionResponder(CompressionMiddleware(None), send)
+    await responder({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/plain')],
+    })
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in [PAYLOAD, PAYLOAD]:
+        await responder({
+            'type': 'http.response.body',
+            'body': chunk.encode(),
+            'more_body': True,
+        })
+        # each chunk is decompressed as soon as it is sent
+        assert decompressor.decompress(messages[-1]['body']) == chunk.encode()
+
+    await responder({'type': 'http.response.body', 'body': b''})
+    decompressor.decompress(messages[-1]['body'])
+    assert decompressor.eof
@@ -46,6 +46,8 @@ class TestDeclarativeBasicUsage:
             "limit": 50,
             "offset": 0,
             "total": 2,
+            "next_cursor": None,
+            "has_more": False,
         }
 
         response = client.get(f"{endpoint}/1")
@@ -65,6 +67,8 @@ class TestDeclarativeBasicUsage:
             "limit": 50,
             "offset": 0,
             "total": 0,
+            "next_cursor": None,
+            "has_more": False,
         }
 
         GreeterInMemorySchema.push(id=1, content='test')
@@ -0,0 +1,157 @@
+import asyncio
+import threading
+
+import grpc
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from bali.decorators import action
+from bali.executors import (
+    BoundedExecutor,
+    ExecutorRejectedError,
+    configure_executor,
+    get_executor,
+    occupancy,
+)
+from bali.resources import Resource
+from bali.resources.resource import ServicerGenerator
+
+
+def test_bounded_executor_rejects_when_full():
+    executor = BoundedExecutor('test-full', max_workers=1, max_queue=1)
+    event = threading.Event()
+
+    running = executor.submit(event.wait)
+    queued = executor.submit(event.wait)
+    with pytest.raises(ExecutorRejectedError):
+        executor.submit(event.wait)
+
+    assert executor.occupancy()['queued'] + executor.occupancy()['active'] == 2
+    assert executor.occupancy()['rejected'] == 1
+
+    event.set()
+    running.result(), queued.result()
+    executor.shutdown()
+    assert executor.occupancy()['active'] == 0
+    assert executor.occupancy()['queued'] == 0
+    assert executor.occupancy()['completed'] == 2
+
+
+def test_bounded_executor_caller_runs():
+    executor = BoundedExecutor(
+        'test-caller-runs',
+        max_workers=1,
+        max_queue=0,
+        rejection_policy='caller_runs',
+    )
+    event = threading.Event()
+    executor.submit(event.wait)
+
+    # executor is full, runs in current thread
+    assert executor.call(threading.current_thread) is threading.current_thread()
+
+    event.set()
+    executor.shutdown()
+
+
+def test_bounded_executor_invalid_policy():
+    with pytest.raises(ValueError):
+        BoundedExecutor('test-invalid', rejection_policy='drop')
+
+
+def test_get_executor_created_with_defaults():
+    executor = get_executor('test-default')
+    assert get_executor('test-default') is executor
+    assert 'test-default' in [item['name'] for item in occupancy()]
+
+
+class SlowResource(Resource):
+    executor = 'test-slow'
+    event = threading.Event()
+
+    @action(detail=False)
+    def wait(self):
+        self.event.wait(5)
+        return {'thread': threading.current_thread().name}
+
+
+class FastResource(Resource):
+    @action(detail=False)
+    def ping(self):
+        return {'thread': threading.current_thread().name}
+
+    @action(detail=False, executor='test-action')
+    def pong(self):
+        return {'thread': threading.current_thread().name}
+
+
+@pytest.mark.asyncio
+async def test_resource_bulkhead():
+    configure_executor('test-slow', max_workers=1, max_queue=0)
+
+    app = FastAPI()
+    app.include_router(SlowResource.as_router(), prefix='/slows')
+    app.include_router(FastResource.as_router(), prefix='/fasts')
+
+    async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+        waiting = asyncio.ensure_future(client.get('/slows/wait'))
+        while get_executor('test-slow').occupancy()['active'] == 0:
+            await asyncio.sleep(0.01)
+
+        # slow resource's executor is full
+        response = await client.get('/slows/wait')
+        assert response.status_code == 503
+
+        # other resources are not affected
+        response = await client.get('/fasts/ping')
+        assert response.status_code == 200
+        response = await client.get('/fasts/pong')
+        assert response.json()['thread'].startswith('test-action')
+
+        SlowResource.event.set()
+        response = await waiting
+        assert response.json()['thread'].startswith('test-slow')
+
+
+class AbortError(Exception):
+    pass
+
+
+class Context:
+    def abort(self, code, details):
+        raise AbortError(code)
+
+
+def test_servicer_bulkhead():
+    configure_executor('test-rpc', max_workers=1, max_queue=0)
+    event = threading.Event()
+
+    def servicer(_, request, context):
+        event.wait(5)
+        return threading.current_thread().name
+
+    class RpcResource(Resource):
+        executor = 'test-rpc'
+
+        @action()
+        def get(self, pk=None):
+            pass
+
+    bulkhead_servicer = ServicerGenerator(RpcResource).bulkhead('get', servicer)
+
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(bulkhead_servicer(None, None, Context()))
+    )
+    thread.start()
+    while get_executor('test-rpc').occupancy()['active'] == 0:
+        event.wait(0.01)
+
+    with pytest.raises(AbortError) as ex:
+        bulkhead_servicer(None, None, Context())
+    assert ex.value.args[0] == grpc.StatusCode.RESOURCE_EXHAUSTED
+
+    event.set()
+    thread.join()
+    assert results[0].startswith('test-rpc')
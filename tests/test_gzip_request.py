@@ -0,0 +1,80 @@
+import gzip
+import zlib
+
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+from bali import Bali, APIRouter
+
+router = APIRouter()
+
+
+@router.post('/echo')
+async def echo(request: Request):
+    return {'size': len(await request.body())}
+
+
+@router.post('/chunks')
+async def chunks(request: Request):
+    return {'chunks': len([c async for c in request.stream() if c])}
+
+
+class TestGzipRequest:
+    def setup_method(self):
+        Bali.__clear__()
+        app = Bali(
+            routers=[{'router': router}],
+            http_max_decompressed_size=1024 * 1024,
+        )
+        self.client = TestClient(app)
+
+    def teardown_method(self):
+        Bali.__clear__()
+
+    def post(self, path, content, encoding):
+        return self.client.post(
+            path, content=content, headers={'Content-Encoding': encoding}
+        )
+
+    def test_gzip_body(self):
+        response = self.post('/echo', gzip.compress(b'a' * 1000), 'gzip')
+        assert response.json() == {'size': 1000}
+
+    def test_deflate_body(self):
+        response = self.post('/echo', zlib.compress(b'a' * 1000), 'deflate')
+        assert response.json() == {'size': 1000}
+
+    def test_raw_deflate_body(self):
+        compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        body = compressor.compress(b'a' * 1000) + compressor.flush()
+        response = self.post('/echo', body, 'deflate')
+        assert response.json() == {'size': 1000}
+
+        response = self.post('/echo', body, 'gzip')
+        assert response.status_code == 400
+
+    def test_truncated_body(self):
+        body = gzip.compress(b'a' * 1000)
+        response = self.post('/echo', body[:-8], 'gzip')
+        assert response.status_code == 400
+
+        response = self.post('/echo', zlib.compress(b'a' * 1000)[:-4], 'deflate')
+        assert response.status_code == 400
+
+    def test_plain_body(self):
+        response = self.client.post('/echo', content=b'a' * 1000)
+        assert response.json() == {'size': 1000}
+
+    def test_stream_decompressed_chunks(self):
+        body = gzip.compress(b'a' * 512 * 1024)
+        response = self.post('/chunks', body, 'gzip')
+        assert response.json()['chunks'] > 1
+
+    def test_decompressed_size_exceeded(self):
+        body = gzip.compress(b'a' * (1024 * 1024 + 1))
+        response = self.post('/echo', body, 'gzip')
+        assert response.status_code == 413
+
+    def test_invalid_compressed_body(self):
+        response = self.post('/echo', b'not gzip', 'gzip')
+        assert response.status_code == 400
@@ -0,0 +1,55 @@
+import socket
+
+import pytest
+
+from bali import Bali, launcher
+from bali.launcher import bind_reuse_port, get_http_options
+
+
+class TestHttpLauncher:
+    def setup_method(self):
+        Bali.__clear__()
+
+    def test_development_options(self):
+        app = Bali()
+        options = get_http_options(app)
+        assert options['reload'] is True
+        assert 'workers' not in options
+
+    def test_production_options(self):
+        app = Bali(http_workers=4, http_access_log=True, http_backlog=128)
+        options = get_http_options(app, production=True)
+        assert 'reload' not in options
+        assert options['workers'] == 4
+        assert options['access_log'] is True
+        assert options['backlog'] == 128
+
+    def test_production_cli_workers_priority(self):
+        app = Bali(http_workers=4)
+        options = get_http_options(app, production=True, workers=2)
+        assert options['workers'] == 2
+
+    def test_combined_ignored_options(self, caplog, monkeypatch):
+        async def serve_combined(app, http_server):
+            pass
+
+        monkeypatch.setattr(launcher, 'serve_combined', serve_combined)
+        app = Bali(http_workers=4)
+        launcher.run_combined(app, production=True, reuse_port=True)
+        assert 'workers, reuse_port ignored' in caplog.text
+
+        caplog.clear()
+        launcher.run_combined(app)
+        assert 'ignored' not in caplog.text
+
+
+@pytest.mark.skipif(
+    not hasattr(socket, 'SO_REUSEPORT'), reason='SO_REUSEPORT not supported'
+)
+def test_bind_reuse_port():
+    first = bind_reuse_port('127.0.0.1', 0)
+    port = first.getsockname()[1]
+    second = bind_reuse_port('127.0.0.1', port)
+    assert second.getsockname()[1] == port
+    first.close()
+    second.close()
@@ -1,9 +1,22 @@
+from datetime import datetime
+from typing import Optional
+
 import pytest
+from pydantic import BaseModel, ValidationError, validator
 from sqlalchemy import Column, Integer, String
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.future import select
 from sqlalchemy.orm import declarative_base
 
+from bali._utils import parse_dict
 from bali.db import db
+from bali.db.models import AwareDateTime
+from bali.db.serializers import (
+    ModelSerializer,
+    get_schema_serializer,
+    get_serializer,
+    to_dicts,
+)
 
 DB_URI = 'sqlite:///:memory:'
 
@@ -144,3 +157,101 @@ class TestModelMethods:
 
         await user.delete()
         assert not await User.aio.exists(id=user.id)
+
+
+class Article(db.BaseModel):
+    __tablename__ = "serialized_articles"
+    id = Column(Integer, primary_key=True)
+    title = Column(String(50), default='')
+    views = Column(Integer)
+    published_time = Column(AwareDateTime)
+
+    @hybrid_property
+    def headline(self):
+        return self.title.upper()
+
+
+class ArticleSchema(BaseModel):
+    id: Optional[int]
+    title: Optional[str]
+    views: Optional[str]
+
+    class Config:
+        orm_mode = True
+
+
+class ValidatedArticleSchema(ArticleSchema):
+    @validator('title')
+    def strip_title(cls, value):
+        return value.strip()
+
+
+def make_article(**kwargs):
+    values = dict(id=1, title='Bali', views=10, published_time=datetime(2026, 1, 1))
+    return Article(**{**values, **kwargs})
+
+
+def test_serializer_cached():
+    assert get_serializer(Article) is get_serializer(Article)
+    assert get_serializer(Article, include_hybrid_properties=True) is not (
+        get_serializer(Article)
+    )
+    assert get_schema_serializer(Article, ArticleSchema) is get_schema_serializer(
+        Article, ArticleSchema
+    )
+
+
+def test_model_serializer():
+    article = make_article()
+    serializer = get_serializer(Article)
+    data = serializer.to_dict(article)
+    assert data == article._asdict()
+    assert data['title'] == 'Bali'
+    assert 'headline' not in data
+    # values are serialized as they are read
+    assert data['published_time'] == datetime(2026, 1, 1)
+
+    data = article._asdict(include_hybrid_properties=True)
+    assert data['headline'] == 'BALI'
+    # other keyword arguments are ignored
+    assert article._asdict(exclude={'title'}) == article._asdict()
+
+    # attributes raising `AttributeError` are `None`
+    data = make_article(title=None)._asdict(include_hybrid_properties=True)
+    assert data['headline'] is None
+    assert data['title'] is None
+
+    serializer = ModelSerializer(Article, fields=('id', 'title'))
+    assert serializer.to_tuple(article) == (1, 'Bali')
+    assert serializer.to_tuples([article]) == [(1, 'Bali')]
+    assert ModelSerializer(Article, fields=('id', )).to_dict(article) == {'id': 1}
+
+
+def test_schema_serializer():
+    articles = [make_article(), make_article()]
+    expected = [ArticleSchema.from_orm(i).dict() for i in articles]
+    # `views` is validated to schema's type
+    assert expected[0] == {'id': 1, 'title': 'Bali', 'views': '10'}
+    assert to_dicts(articles, schema=ArticleSchema) == expected
+    assert parse_dict(articles[0], schema=ArticleSchema) == expected[0]
+
+    serializer = get_schema_serializer(Article, ArticleSchema)
+    assert serializer.compiled
+    assert [f.name for f in serializer._validated_fields] == ['views']
+
+    article = make_article()
+    article.title = ' Bali '
+    assert to_dicts([article], schema=ValidatedArticleSchema)[0]['title'] == 'Bali'
+
+    # trusted column values are not validated
+    article.id = '1'
+    assert parse_dict(article, schema=ArticleSchema)['id'] == '1'
+    article.views = [10]
+    with pytest.raises(ValidationError):
+        parse_dict(article, schema=ArticleSchema)
+
+
+def test_to_dicts():
+    articles = [make_article(), make_article()]
+    assert to_dicts(articles) == [i._asdict() for i in articles]
+    assert to_dicts([]) == []
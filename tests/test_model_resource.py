@@ -1,13 +1,67 @@
+import datetime
+import json
+import uuid
+from decimal import Decimal
 from typing import Optional
 
-from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi_pagination import (
+    LimitOffsetPage,
+    LimitOffsetParams,
+    add_pagination,
+    set_page,
+)
+from fastapi.testclient import TestClient
+from google.protobuf import (
+    descriptor_pb2,
+    descriptor_pool,
+    field_mask_pb2,
+    message_factory,
+    struct_pb2,
+)
+from pydantic import BaseModel, Field
+from sqlalchemy import (
+    CheckConstraint,
+    Column,
+    Date,
+    ForeignKey,
+    Integer,
+    Numeric,
+    String,
+    event,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import declarative_base
+from starlette.requests import Request
 
+from bali.core import cache
 from bali.db import db
 from bali.db.operators import get_filters_expr
 from bali.decorators import action
-from bali.resources import ModelResource
+from bali.resources import AsyncModelResource, ModelResource
+from bali.resources.model_resource import get_indexed_columns
+from bali.resources.fast_response import compile_encoder, dumps
+from bali.exceptions import InvalidCursorError
+from bali.paginate import (
+    async_iter_chunks,
+    async_paginate,
+    decode_cursor,
+    encode_cursor,
+    estimate_count,
+    get_count_cache_key,
+    get_keyset,
+    get_page_key,
+    iter_chunks,
+    paginate,
+)
+from bali.resources.grpc_actions import (
+    process_batch_rpc,
+    process_stream_rpc_async,
+)
 from bali.schemas import ListRequest
+from bali.utils import MessageToDict
 from tests.main import IsAuthenticated
 
 DB_URI = 'sqlite:///:memory:'
@@ -74,3 +128,1000 @@ def test_model_resource_generic_actions():
 def test_model_resource_custom_actions():
     resource = UserResource()
     assert len(resource.recents()) > 0
+
+
+class Item(db.BaseModel):
+    __tablename__ = "batch_items"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50), default='')
+
+
+class ItemSchema(BaseModel):
+    id: Optional[int]
+    name: Optional[str]
+
+    class Config:
+        orm_mode = True
+
+
+class ItemResource(ModelResource):
+    model = Item
+    schema = ItemSchema
+    batch_actions = ['get', 'create', 'update', 'delete']
+
+
+class TestModelResourceBatchActions:
+    def setup_class(self):
+        # other test modules may reconnect db after imported
+        Item.__table__.create(bind=db.s.get_bind(), checkfirst=True)
+
+    def test_batch_create_and_get(self):
+        resource = ItemResource()
+        items = resource.batch_create(
+            [ItemSchema(name='apple'), ItemSchema(name='banana')]
+        )
+        ids = [item.id for item in items]
+        assert all(ids)
+
+        # keep the order of requested ids
+        items = resource.batch_get(ids[::-1] + [0])
+        assert [item.name for item in items] == ['banana', 'apple']
+
+    def test_batch_update(self):
+        resource = ItemResource()
+        items = resource.batch_create(
+            [ItemSchema(name='cherry'), ItemSchema(name='durian')]
+        )
+        resource.batch_update(
+            [ItemSchema(id=item.id, name=item.name.upper()) for item in items]
+        )
+        items = resource.batch_get([item.id for item in items])
+        assert [item.name for item in items] == ['CHERRY', 'DURIAN']
+
+    def test_batch_delete(self):
+        resource = ItemResource()
+        items = resource.batch_create([ItemSchema(name='fig')] * 3)
+        ids = [item.id for item in items]
+
+        assert resource.batch_delete(ids) == {'result': True, 'missing': []}
+        assert resource.batch_get(ids) == []
+        assert resource.batch_delete(ids) == {'result': False, 'missing': ids}
+
+        # missing ids are reported, the found are deleted
+        item = resource.batch_create([ItemSchema(name='fig')])[0]
+        assert resource.batch_delete([item.id, 0]) == {
+            'result': False, 'missing': [0]
+        }
+        assert resource.batch_get([item.id]) == []
+
+    def test_batch_routes(self):
+        router = ItemResource.as_router()
+        paths = [(route.path, list(route.methods)[0]) for route in router.routes]
+        assert ('/batch-get', 'GET') in paths
+        assert ('/batch-create', 'POST') in paths
+        assert ('/batch-update', 'POST') in paths
+        assert ('/batch-delete', 'POST') in paths
+        # batch routes are above generic get action
+        assert paths.index(('/batch-get', 'GET')) < paths.index(('/{id}', 'GET'))
+
+        # resource without batch actions
+        assert '/batch-get' not in [r.path for r in UserResource.as_router().routes]
+
+    def test_batch_update_requires_id(self):
+        app = FastAPI()
+        app.include_router(ItemResource.as_router(), prefix='/items')
+        response = TestClient(app).post(
+            '/items/batch-update', json=[{'name': 'grape'}]
+        )
+        assert response.status_code == 422
+
+    def test_batch_rpc(self):
+        def call(action, request_data):
+            request = struct_pb2.Struct()
+            request.update(request_data)
+            resource = ItemResource(request, None, struct_pb2.Struct)
+            return MessageToDict(process_batch_rpc(resource, action))
+
+        response = call('create', {'data': [{'name': 'kiwi'}, {'name': 'lime'}]})
+        assert response['count'] == 2
+        ids = [int(item['id']) for item in response['data']]
+
+        response = call('update', {'data': [{'id': ids[0], 'name': 'KIWI'}]})
+        assert response['data'][0]['name'] == 'KIWI'
+
+        response = call('get', {'ids': ids})
+        assert [item['name'] for item in response['data']] == ['KIWI', 'lime']
+
+        response = call('delete', {'ids': ids})
+        assert response == {'result': True, 'missing': []}
+
+    def test_stream_chunks(self):
+        resource = ItemResource()
+        resource.batch_create([ItemSchema(name='mango')] * 5)
+        query = Item.query().filter(Item.name == 'mango')
+
+        chunks = list(iter_chunks(query, model_schema=ItemSchema, chunk_size=2))
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert chunks[0][0]['name'] == 'mango'
+
+        chunks = list(
+            iter_chunks(query, 1, 3, model_schema=ItemSchema, chunk_size=2)
+        )
+        assert sum(len(chunk) for chunk in chunks) == 3
+
+
+class CursorItemResource(ItemResource):
+    @action()
+    async def list(self, schema_in: ListRequest = None):
+        return Item.query().filter(Item.name.like('cursor-%'))
+
+
+class TestModelResourceCursorPagination:
+    def setup_class(self):
+        Item.__table__.create(bind=db.s.get_bind(), checkfirst=True)
+        ItemResource().batch_create(
+            [ItemSchema(name=f'cursor-{i % 3}') for i in range(7)]
+        )
+        set_page(LimitOffsetPage)
+
+    def paginate_all(self, query, limit=3):
+        pages, page_token = [], ''
+        while True:
+            response = paginate(
+                query,
+                params=LimitOffsetParams(limit=limit, offset=0),
+                is_rpc=True,
+                model_schema=ItemSchema,
+                page_token=page_token,
+            )
+            pages.append(response)
+            page_token = response['next_page_token']
+            if not page_token:
+                return pages
+
+    def test_keyset_by_primary_key(self):
+        query = Item.query().filter(Item.name.like('cursor-%'))
+        pages = self.paginate_all(query)
+
+        assert [len(page['items']) for page in pages] == [3, 3, 1]
+        ids = [item['id'] for page in pages for item in page['items']]
+        assert ids == sorted(ids)
+        # only the first offset page counts total
+        assert [page['count'] for page in pages] == [7, None, None]
+
+    def test_keyset_by_ordering_columns(self):
+        query = (
+            Item.query()
+            .filter(Item.name.like('cursor-%'))
+            .order_by(Item.name.desc())
+        )
+        _, keys = get_keyset(query)
+        assert [(c.name, descending) for c, descending in keys] == [
+            ('name', True), ('id', False)
+        ]
+
+        items = [
+            (item['name'], item['id'])
+            for page in self.paginate_all(query, limit=2)
+            for item in page['items']
+        ]
+        assert items == sorted(items, key=lambda x: (-int(x[0][-1]), x[1]))
+        assert len(items) == 7
+
+    def test_keyset_nullable_ordering_column(self):
+        names = ['null-b', None, 'null-a', None, 'null-c', None]
+        items = ItemResource().batch_create([ItemSchema(name=n) for n in names])
+        ids = [item.id for item in items]
+        # column default fills the unset names
+        db.s.query(Item).filter(Item.id.in_(ids[1::2])).update({'name': None})
+        db.s.commit()
+        for descending in (False, True):
+            ordering = Item.name.desc() if descending else Item.name
+            query = Item.query().filter(Item.id.in_(ids)).order_by(ordering)
+            # ordering is kept, index scans on the column are not defeated
+            keyset_query, _ = get_keyset(query)
+            assert 'IS NULL' not in str(keyset_query)
+            rows = [
+                (item['name'], item['id'])
+                for page in self.paginate_all(query, limit=2)
+                for item in page['items']
+            ]
+            # rows with NULL keys are not dropped, SQLite orders NULLs least
+            assert sorted(i for _, i in rows) == ids
+            named = sorted(n for n in names if n)
+            assert [n for n, _ in rows] == (
+                named[::-1] + [None] * 3 if descending else [None] * 3 + named
+            )
+
+    def test_cursor_values_encoding(self):
+        keys = [
+            (Column('price', Numeric(10, 2)), False),
+            (Column('day', Date), False),
+            (Column('token', UUID(as_uuid=True)), False),
+            (Column('id', Integer), False),
+        ]
+        values = [
+            Decimal('9.90'),
+            datetime.date(2024, 2, 29),
+            uuid.uuid4(),
+            1,
+        ]
+        assert decode_cursor(encode_cursor(values), keys) == values
+
+    def test_invalid_cursor(self):
+        query = Item.query()
+        _, keys = get_keyset(query)
+        with pytest.raises(InvalidCursorError):
+            decode_cursor('not-a-cursor', keys)
+
+        with pytest.raises(InvalidCursorError):
+            paginate([1, 2, 3], page_token='WzFd')
+
+    def test_list_rpc_page_token(self):
+        request = struct_pb2.Struct()
+        request.update({'limit': 5, 'filters': {'name__like': 'cursor-%'}})
+        response = MessageToDict(
+            ItemResource(request, None, struct_pb2.Struct).list()
+        )
+        assert len(response['data']) == 5
+
+        request.update({'page_token': response['next_page_token']})
+        response = MessageToDict(
+            ItemResource(request, None, struct_pb2.Struct).list()
+        )
+        assert len(response['data']) == 2
+        assert response['next_page_token'] == ''
+
+    @pytest.mark.asyncio
+    async def test_list_route_cursor(self):
+        app = FastAPI()
+        app.include_router(CursorItemResource.as_router(), prefix='/items')
+        add_pagination(app)
+
+        async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+            response = await client.get('/items', params={'limit': 4})
+            page = response.json()
+            assert page['total'] == 7
+            assert len(page['items']) == 4
+
+            response = await client.get(
+                '/items', params={'limit': 4, 'cursor': page['next_cursor']}
+            )
+            page = response.json()
+            assert page['total'] is None
+            assert len(page['items']) == 3
+            assert page['next_cursor'] is None
+
+            response = await client.get('/items', params={'cursor': 'bad'})
+            assert response.status_code == 400
+
+
+class TestModelResourceCountPolicy:
+    def setup_class(self):
+        Item.__table__.create(bind=db.s.get_bind(), checkfirst=True)
+        ItemResource().batch_create([ItemSchema(name='count')] * 5)
+        set_page(LimitOffsetPage)
+
+    def paginate(self, count_policy, offset=0, query=None):
+        query = query or Item.query().filter(Item.name == 'count')
+        return paginate(
+            query,
+            params=LimitOffsetParams(limit=2, offset=offset),
+            is_rpc=True,
+            model_schema=ItemSchema,
+            count_policy=count_policy,
+        )
+
+    def test_count_exact(self):
+        response = self.paginate('exact')
+        assert response['count'] == 5
+        assert response['has_more'] is True
+        assert self.paginate('exact', offset=3)['has_more'] is False
+
+    def test_count_none(self):
+        response = self.paginate('none')
+        assert response['count'] is None
+        assert len(response['items']) == 2
+        assert response['has_more'] is True
+
+        response = self.paginate('none', offset=4)
+        assert len(response['items']) == 1
+        assert response['has_more'] is False
+
+    def test_count_estimated_fallback_exact(self):
+        query = Item.query().filter(Item.name == 'count')
+        # sqlite has no planner statistics
+        assert estimate_count(query) is None
+        assert self.paginate('estimated')['count'] == 5
+
+    def test_count_cached(self):
+        cache.connect('127.0.0.1', prefix='test_service')
+        query = Item.query().filter(Item.name == 'count')
+        key = get_count_cache_key(query)
+        cache.delete(cache.make_key(key))
+
+        assert self.paginate('cached')['count'] == 5
+        assert cache.get(key) == 5
+
+        # cached count is used until expired
+        cache.set(key, 100)
+        assert self.paginate('cached')['count'] == 100
+
+        # keyed by filters
+        other = Item.query().filter(Item.name == 'other')
+        assert get_count_cache_key(other) != key
+        assert get_count_cache_key(query.order_by(Item.id)) == key
+
+    def test_count_invalid_policy(self):
+        with pytest.raises(ValueError):
+            self.paginate('approximate')
+
+
+def make_sparse_request_message():
+    """Request message with `fields` FieldMask, as generated by protoc"""
+    pool = descriptor_pool.Default()
+    name = 'tests.sparse.SparseRequest'
+    try:
+        descriptor = pool.FindMessageTypeByName(name)
+    except KeyError:
+        field = descriptor_pb2.FieldDescriptorProto
+        file = descriptor_pb2.FileDescriptorProto(
+            name='tests/sparse.proto',
+            package='tests.sparse',
+            dependency=['google/protobuf/field_mask.proto'],
+        )
+        message = file.message_type.add(name='SparseRequest')
+        message.field.add(
+            name='id',
+            number=1,
+            type=field.TYPE_INT32,
+            label=field.LABEL_OPTIONAL,
+        )
+        message.field.add(
+            name='limit',
+            number=2,
+            type=field.TYPE_INT32,
+            label=field.LABEL_OPTIONAL,
+        )
+        message.field.add(
+            name='fields',
+            number=3,
+            type=field.TYPE_MESSAGE,
+            type_name='.google.protobuf.FieldMask',
+            label=field.LABEL_OPTIONAL,
+        )
+        pool.Add(file)
+        descriptor = pool.FindMessageTypeByName(name)
+    return message_factory.GetMessageClass(descriptor)
+
+
+class SparseItemResource(ItemResource):
+    @action()
+    async def list(self, schema_in: ListRequest = None):
+        return self._load_only(Item.query()).filter(Item.name == 'sparse')
+
+    @action()
+    async def get(self, pk=None):
+        return self._load_only(Item.query()).filter_by(id=pk).first()
+
+
+class TestModelResourceSparseFieldsets:
+    def setup_class(self):
+        Item.__table__.create(bind=db.s.get_bind(), checkfirst=True)
+        self.items = ItemResource().batch_create([ItemSchema(name='sparse')] * 3)
+        set_page(LimitOffsetPage)
+
+    def make_resource(self, query_string):
+        request = Request({
+            'type': 'http',
+            'query_string': query_string.encode(),
+            'headers': [],
+        })
+        return ItemResource(request)
+
+    def test_get_fields(self):
+        assert self.make_resource('').get_fields() == []
+        assert self.make_resource('fields=id,name').get_fields() == ['id', 'name']
+        # repeated params, unknown fields are ignored
+        resource = self.make_resource('fields=name&fields=password,name')
+        assert resource.get_fields() == ['name']
+
+        request = make_sparse_request_message()(
+            fields=field_mask_pb2.FieldMask(paths=['id'])
+        )
+        assert ItemResource(request).get_fields() == ['id']
+
+    def test_load_only(self):
+        db.s.expunge_all()
+        resource = self.make_resource('fields=id')
+        items = resource.list(ListRequest(filters={'name': 'sparse'})).all()
+        assert len(items) == 3
+        # deferred column is not loaded
+        assert all('name' not in item.__dict__ for item in items)
+
+        db.s.expunge_all()
+        item = resource.get(pk=self.items[0].id)
+        assert 'name' not in item.__dict__
+
+    def test_sparse_rpc(self):
+        db.s.expunge_all()
+        request = make_sparse_request_message()(
+            id=self.items[0].id,
+            limit=2,
+            fields=field_mask_pb2.FieldMask(paths=['name']),
+        )
+        response = MessageToDict(
+            ItemResource(request, None, struct_pb2.Struct).get()
+        )
+        assert response == {'data': {'name': 'sparse'}}
+
+        response = MessageToDict(
+            ItemResource(request, None, struct_pb2.Struct).list()
+        )
+        assert len(response['data']) == 2
+        assert all(list(item) == ['name'] for item in response['data'])
+
+    @pytest.mark.asyncio
+    async def test_sparse_routes(self):
+        app = FastAPI()
+        app.include_router(SparseItemResource.as_router(), prefix='/items')
+        add_pagination(app)
+
+        async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+            response = await client.get('/items', params={'fields': 'id'})
+            page = response.json()
+            assert page['total'] == 3
+            assert page['items'] == [{'id': item.id} for item in self.items]
+
+            item_id = self.items[0].id
+            response = await client.get(f'/items/{item_id}?fields=name')
+            assert response.json() == {'name': 'sparse'}
+
+            response = await client.get(f'/items/{item_id}')
+            assert response.json() == {'id': item_id, 'name': 'sparse'}
+
+
+class TestModelResourceConditionalRequests:
+    def setup_class(self):
+        Item.__table__.create(bind=db.s.get_bind(), checkfirst=True)
+        self.items = ItemResource().batch_create([ItemSchema(name='etag')] * 3)
+        set_page(LimitOffsetPage)
+
+    def test_version_without_loading_body(self):
+        resource = ItemResource()
+        item = self.items[0]
+        etag, last_modified = resource.get_version(item)
+        assert etag.startswith('W/"')
+        assert last_modified == item.updated_time
+
+        db.s.expunge_all()
+        assert resource.get_version_by_pk(item.id) == (etag, last_modified)
+        loaded = db.s.identity_map.values()
+        assert all('name' not in obj.__dict__ for obj in loaded)
+        assert resource.get_version_by_pk(0) is None
+
+        # overridden `get` may not load by primary key
+        assert SparseItemResource().get_version_by_pk(item.id) is None
+
+    def test_page_version(self):
+        resource = SparseItemResource()
+        query = Item.query().filter(Item.name == 'etag')
+        params = LimitOffsetParams(limit=2, offset=0)
+
+        rows = []
+        page = paginate(query, params, on_page_rows=rows.extend)
+        version = resource.get_version(
+            rows, get_page_key(query, params, total=page.total)
+        )
+
+        db.s.expunge_all()
+        assert resource.get_page_version(query, params=params) == version
+        loaded = db.s.identity_map.values()
+        assert all('name' not in obj.__dict__ for obj in loaded)
+
+    @pytest.mark.asyncio
+    async def test_conditional_routes(self):
+        app = FastAPI()
+        app.include_router(EtagItemResource.as_router(), prefix='/items')
+        add_pagination(app)
+        item = self.items[0]
+
+        async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+            response = await client.get(f'/items/{item.id}')
+            etag = response.headers['etag']
+            assert response.headers['last-modified']
+
+            response = await client.get(
+                f'/items/{item.id}', headers={'If-None-Match': etag}
+            )
+            assert response.status_code == 304
+            assert response.content == b''
+            assert response.headers['etag'] == etag
+
+            # ETag varies by sparse fieldset
+            response = await client.get(
+                f'/items/{item.id}?fields=name', headers={'If-None-Match': etag}
+            )
+            assert response.status_code == 200
+            assert response.headers['etag'] != etag
+
+            response = await client.get('/items')
+            etag = response.headers['etag']
+            response = await client.get('/items', headers={'If-None-Match': etag})
+            assert response.status_code == 304
+
+            # lists are validated by ETag only, a deleted row doesn't
+            # advance the max `updated_time`
+            assert 'last-modified' not in response.headers
+            response = await client.get(
+                '/items',
+                headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'},
+            )
+            assert response.status_code == 200
+            assert 'last-modified' not in response.headers
+
+            # updated row changes the ETag
+            item.name = 'etag'
+            item.updated_time = item.updated_time.replace(year=2100)
+            item.save()
+            response = await client.get('/items', headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            assert response.headers['etag'] != etag
+
+            # ETag varies by page parameters and total
+            response = await client.get('/items?limit=1')
+            etag = response.headers['etag']
+            response = await client.get(
+                '/items?limit=2', headers={'If-None-Match': etag}
+            )
+            assert response.status_code == 200
+
+            ItemResource().batch_create([ItemSchema(name='etag')])
+            response = await client.get(
+                '/items?limit=1', headers={'If-None-Match': etag}
+            )
+            assert response.status_code == 200
+            assert response.json()['total'] == 4
+
+
+class EtagItemResource(ItemResource):
+    @action()
+    async def list(self, schema_in: ListRequest = None):
+        return Item.query().filter(Item.name == 'etag')
+
+    @action()
+    async def get(self, pk=None):
+        return Item.query().filter_by(id=pk).first()
+
+
+class Book(db.BaseModel):
+    __tablename__ = "ordered_books"
+    id = Column(Integer, primary_key=True)
+    title = Column(String(50), index=True)
+    price = Column(Integer)
+
+
+class BookSchema(BaseModel):
+    id: Optional[int]
+    title: Optional[str]
+
+    class Config:
+        orm_mode = True
+
+
+class BookResource(ModelResource):
+    model = Book
+    schema = BookSchema
+    ordering_fields = ['id', 'title']
+
+
+class TestModelResourceOrdering:
+    def setup_class(self):
+        Book.__table__.create(bind=db.s.get_bind(), checkfirst=True)
+        for title, price in [('b', 1), ('c', 3), ('a', 2)]:
+            Book.create(title=title, price=price)
+
+    def test_list_ordering(self):
+        resource = BookResource()
+        query = resource.list(ListRequest(ordering=['-title']))
+        assert [book.title for book in query] == ['c', 'b', 'a']
+
+        # fields not in `ordering_fields` are ignored
+        query = resource.list(ListRequest(ordering=['price', 'title']))
+        assert [book.title for book in query] == ['a', 'b', 'c']
+
+    def test_list_rpc_ordering(self):
+        request = struct_pb2.Struct()
+        request.update({'limit': 2, 'ordering': ['-id']})
+        response = MessageToDict(
+            BookResource(request, None, struct_pb2.Struct).list()
+        )
+        assert [book['title'] for book in response['data']] == ['a', 'c']
+
+    def test_ordering_param_in_openapi(self):
+        app = FastAPI()
+        app.include_router(BookResource.as_router(), prefix='/books')
+        parameters = app.openapi()['paths']['/books']['get']['parameters']
+        assert 'ordering' in [p['name'] for p in parameters]
+
+    def test_unindexed_ordering_fields(self, caplog):
+        class PriceResource(BookResource):
+            ordering_fields = ['title', 'price']
+
+        with pytest.raises(ValueError, match='price'):
+            PriceResource.as_router()
+
+        PriceResource.allow_unindexed_ordering = True
+        PriceResource.as_router()
+        assert 'not indexed' in caplog.text
+
+        class UnknownResource(BookResource):
+            ordering_fields = ['author']
+            allow_unindexed_ordering = True
+
+        with pytest.raises(ValueError, match='author'):
+            UnknownResource.check_ordering_fields()
+
+    def test_indexed_columns_exclude_constraints(self):
+        class Shelf(declarative_base()):
+            __tablename__ = 'shelves'
+            __table_args__ = (CheckConstraint('capacity > 0'), )
+            id = Column(Integer, primary_key=True)
+            code = Column(String(20), unique=True)
+            label = Column(String(20), index=True)
+            capacity = Column(Integer)
+            parent_id = Column(Integer, ForeignKey('shelves.id'))
+
+        columns = {c.name for c in get_indexed_columns(Shelf)}
+        assert columns == {'id', 'code', 'label'}
+
+
+class TestModelResourceSingleStatementWrites:
+    def setup_class(self):
+        Item.__table__.create(bind=db.s.get_bind(), checkfirst=True)
+
+    def execute(self, func, *args, **kwargs):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *_):
+            statements.append(statement.split()[0])
+
+        engine = db.s.get_bind()
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            return func(*args, **kwargs), statements
+        finally:
+            event.remove(
+                engine, 'before_cursor_execute', before_cursor_execute
+            )
+
+    def test_update(self):
+        item = Item.create(name='single')
+        updated_time = item.updated_time
+
+        resource = ItemResource()
+        result, statements = self.execute(
+            resource.update, ItemSchema(name='updated'), pk=item.id
+        )
+        # sqlite without RETURNING: `UPDATE` then `SELECT`, row not loaded first
+        assert statements == ['UPDATE', 'SELECT']
+        assert result is item
+        assert result.name == 'updated'
+        assert result.updated_time > updated_time
+
+        assert resource.update(ItemSchema(name='missing'), pk=0) is None
+
+    def test_delete(self):
+        item = Item.create(name='single')
+
+        resource = ItemResource()
+        result, statements = self.execute(resource.delete, pk=item.id)
+        assert statements == ['DELETE']
+        assert result == {'id': item.id, 'result': True}
+        assert resource.delete(pk=item.id) == {'id': item.id, 'result': False}
+
+    def test_disabled(self):
+        class InstanceItemResource(ItemResource):
+            single_statement_writes = False
+
+        item = Item.create(name='single')
+        resource = InstanceItemResource()
+        result, statements = self.execute(
+            resource.update, ItemSchema(name='updated'), pk=item.id
+        )
+        assert statements == ['SELECT', 'UPDATE']
+        assert result.name == 'updated'
+
+        result, statements = self.execute(resource.delete, pk=item.id)
+        assert statements == ['SELECT', 'DELETE']
+        assert result == {'id': item.id, 'result': True}
+
+    def test_batch_delete(self):
+        class InstanceItemResource(ItemResource):
+            single_statement_writes = False
+
+        deleted = []
+
+        def after_delete(mapper, connection, target):
+            deleted.append(target.id)
+
+        event.listen(Item, 'after_delete', after_delete)
+        try:
+            ids = [Item.create(name='batch').id for _ in range(2)]
+            result, statements = self.execute(
+                ItemResource().batch_delete, ids + [0]
+            )
+            assert statements == ['SELECT', 'DELETE']
+            assert result == {'result': False, 'missing': [0]}
+            assert deleted == []
+
+            # deleted by instance, ORM events and cascades apply
+            ids = [Item.create(name='batch').id for _ in range(2)]
+            result = InstanceItemResource().batch_delete(ids)
+            assert result == {'result': True, 'missing': []}
+            assert sorted(deleted) == ids
+            assert ItemResource().batch_get(ids) == []
+        finally:
+            event.remove(Item, 'after_delete', after_delete)
+
+
+class AsyncItemResource(AsyncModelResource):
+    model = Item
+    schema = ItemSchema
+    filters = [
+        {'name': str},
+    ]  # yapf: disable
+    ordering_fields = ['id']
+
+
+class TestAsyncModelResource:
+    @staticmethod
+    async def create_table():
+        # sync and async engines are different sqlite instances
+        async with db._async_engine.begin() as conn:
+            await conn.run_sync(Item.__table__.create, checkfirst=True)
+
+    def create_app(self):
+        app = FastAPI()
+        app.include_router(AsyncItemResource.as_router(), prefix='/items')
+        add_pagination(app)
+        return app
+
+    @pytest.mark.asyncio
+    async def test_http_actions(self):
+        await self.create_table()
+        async with httpx.AsyncClient(
+            app=self.create_app(), base_url='http://test'
+        ) as client:
+            ids = []
+            for i in range(5):
+                response = await client.post('/items', json={'name': 'aio'})
+                assert response.status_code == 201
+                ids.append(response.json()['id'])
+
+            response = await client.get(f'/items/{ids[0]}')
+            assert response.json() == {'id': ids[0], 'name': 'aio'}
+
+            response = await client.get(
+                '/items', params={'name': 'aio', 'ordering': '-id', 'limit': 2}
+            )
+            page = response.json()
+            assert page['total'] == 5
+            assert [item['id'] for item in page['items']] == ids[:-3:-1]
+            assert page['has_more']
+
+            response = await client.get(
+                '/items',
+                params={
+                    'name': 'aio',
+                    'ordering': '-id',
+                    'limit': 2,
+                    'cursor': page['next_cursor'],
+                },
+            )
+            page = response.json()
+            assert [item['id'] for item in page['items']] == ids[-3:-5:-1]
+
+            response = await client.patch(
+                f'/items/{ids[0]}', json={'name': 'aio-updated'}
+            )
+            assert response.json() == {'id': ids[0], 'name': 'aio-updated'}
+
+            response = await client.delete(f'/items/{ids[0]}')
+            assert response.json() == {'result': True}
+            response = await client.get('/items', params={'name': 'aio'})
+            assert response.json()['total'] == 4
+
+    @pytest.mark.asyncio
+    async def test_rpc_actions(self):
+        await self.create_table()
+        request = struct_pb2.Struct()
+        request.update({'data': {'name': 'aio-rpc'}})
+        response = MessageToDict(
+            await AsyncItemResource(request, None, struct_pb2.Struct).create()
+        )
+        assert response['data']['name'] == 'aio-rpc'
+
+        request = struct_pb2.Struct()
+        request.update({
+            'limit': 10,
+            'filters': {'name': 'aio-rpc'},
+            'ordering': ['-id'],
+        })
+        response = MessageToDict(
+            await AsyncItemResource(request, None, struct_pb2.Struct).list()
+        )
+        assert response['count'] == 1
+        assert response['data'][0]['name'] == 'aio-rpc'
+
+    @pytest.mark.asyncio
+    async def test_count_policy(self):
+        await self.create_table()
+        resource = AsyncItemResource()
+        for _ in range(3):
+            await resource.create(ItemSchema(name='aio-count'))
+
+        statement = await resource.list(
+            ListRequest(filters={'name': 'aio-count'})
+        )
+        params = LimitOffsetParams(limit=2, offset=0)
+        set_page(LimitOffsetPage)
+
+        page = await async_paginate(
+            statement,
+            params,
+            is_rpc=True,
+            model_schema=ItemSchema,
+            count_policy='none',
+        )
+        assert page['count'] is None
+        assert page['has_more'] is True
+        assert len(page['items']) == 2
+
+        # sqlite has no estimated count, counted exactly
+        page = await async_paginate(
+            statement,
+            params,
+            is_rpc=True,
+            model_schema=ItemSchema,
+            count_policy='estimated',
+        )
+        assert page['count'] == 3
+
+
+class AsyncStreamItemResource(AsyncItemResource):
+    stream_list = True
+
+
+class TestAsyncModelResourceStreamList:
+    @pytest.mark.asyncio
+    async def test_stream_routes(self):
+        await TestAsyncModelResource.create_table()
+        resource = AsyncItemResource()
+        for _ in range(3):
+            await resource.create(ItemSchema(name='aio-stream'))
+
+        app = FastAPI()
+        app.include_router(AsyncStreamItemResource.as_router(), prefix='/items')
+        async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+            response = await client.get(
+                '/items/stream', params={'name': 'aio-stream', 'limit': 2}
+            )
+            assert response.status_code == 200
+            lines = [json.loads(line) for line in response.text.splitlines()]
+            assert [line['name'] for line in lines] == ['aio-stream'] * 2
+
+    @pytest.mark.asyncio
+    async def test_stream_rpc(self):
+        await TestAsyncModelResource.create_table()
+        resource = AsyncItemResource()
+        for _ in range(3):
+            await resource.create(ItemSchema(name='aio-stream-rpc'))
+
+        request = struct_pb2.Struct()
+        request.update({
+            'offset': 1,
+            'limit': 0,
+            'filters': {'name': 'aio-stream-rpc'},
+        })
+        resource = AsyncStreamItemResource(request, None, struct_pb2.Struct)
+        responses = [
+            MessageToDict(response)
+            async for response in process_stream_rpc_async(resource)
+        ]
+        assert [response['count'] for response in responses] == [2]
+        assert responses[0]['data'][0]['name'] == 'aio-stream-rpc'
+
+        statement = await AsyncItemResource().list(
+            ListRequest(filters={'name': 'aio-stream-rpc'})
+        )
+        chunks = [
+            chunk async for chunk in async_iter_chunks(
+                statement, model_schema=ItemSchema, chunk_size=2
+            )
+        ]
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+
+
+class FastItemResource(AsyncItemResource):
+    fast_response = True
+
+
+class TestModelResourceFastResponse:
+    def create_app(self, resource_cls):
+        app = FastAPI()
+        app.include_router(resource_cls.as_router(), prefix='/items')
+        add_pagination(app)
+        return app
+
+    @pytest.mark.asyncio
+    async def test_fast_routes(self):
+        await TestAsyncModelResource.create_table()
+        async with httpx.AsyncClient(
+            app=self.create_app(FastItemResource), base_url='http://test'
+        ) as client:
+            ids = []
+            for _ in range(3):
+                response = await client.post('/items', json={'name': 'fast'})
+                assert response.status_code == 201
+                ids.append(response.json()['id'])
+
+            response = await client.get(f'/items/{ids[0]}')
+            assert response.json() == {'id': ids[0], 'name': 'fast'}
+
+            params = {'name': 'fast', 'ordering': 'id', 'limit': 2}
+            response = await client.get('/items', params=params)
+            page = response.json()
+            assert page['items'] == [{'id': i, 'name': 'fast'} for i in ids[:2]]
+
+            # the same content as validated response
+            async with httpx.AsyncClient(
+                app=self.create_app(AsyncItemResource), base_url='http://test'
+            ) as validated_client:
+                validated = await validated_client.get('/items', params=params)
+            assert page == validated.json()
+
+            response = await client.get(
+                '/items', params={**params, 'fields': 'name'}
+            )
+            assert response.json()['items'] == [{'name': 'fast'}] * 2
+
+            response = await client.patch(
+                f'/items/{ids[0]}', json={'name': 'fast-updated'}
+            )
+            assert response.json() == {'id': ids[0], 'name': 'fast-updated'}
+
+    def test_compile_encoder(self):
+        class AliasSchema(BaseModel):
+            id: str
+            title: str = Field(alias='name')
+            tags: list = []
+
+            class Config:
+                orm_mode = True
+
+        class NestedSchema(BaseModel):
+            id: int
+            item: ItemSchema
+
+            class Config:
+                orm_mode = True
+
+        encode = compile_encoder(AliasSchema)
+        assert compile_encoder(AliasSchema) is encode
+        # read by alias and validated, the same as `from_orm`
+        item = Item(id=1, name='a')
+        assert encode(item) == {'id': '1', 'name': 'a', 'tags': []}
+        assert encode(item) == AliasSchema.from_orm(item).dict(by_alias=True)
+        assert encode({'id': 1}) == {'id': 1}
+        assert compile_encoder(AliasSchema, ('name',))(item) == {'name': 'a'}
+        # fieldsets are normalized, encoders are not cached per ordering
+        sparse = compile_encoder(AliasSchema, ('tags', 'id', 'unknown', 'id'))
+        assert compile_encoder(AliasSchema, ('id', 'tags')) is sparse
+        assert list(sparse(item)) == ['id', 'tags']
+
+        row = NestedSchema(id=1, item=ItemSchema(id=2, name='b'))
+        assert compile_encoder(NestedSchema)(row) == {
+            'id': 1, 'item': {'id': 2, 'name': 'b'}
+        }
+        assert dumps({'id': 1, 'price': Decimal('1.5')}) == b'{"id":1,"price":1.5}'
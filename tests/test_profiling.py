@@ -0,0 +1,45 @@
+import subprocess
+import sys
+
+from bali.profiling import (
+    group_by_package,
+    parse_importtime,
+    parse_schema_stats,
+)
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |   foo.bar
+import time:        50 |        150 | foo
+import time:        30 |         30 | baz
+"""
+
+
+def test_parse_importtime():
+    records = parse_importtime(IMPORTTIME_OUTPUT)
+    assert [r.module for r in records] == ['foo.bar', 'foo', 'baz']
+    assert records[1].cumulative_us == 150
+
+
+def test_group_by_package():
+    records = parse_importtime(IMPORTTIME_OUTPUT)
+    assert group_by_package(records) == [('foo', 150), ('baz', 30)]
+
+
+def test_parse_schema_stats():
+    output = 'started\n{"schemas": 2, "hits": 3, "misses": 2, "build_time": 0.01}\n'
+    assert parse_schema_stats(output)['hits'] == 3
+    assert parse_schema_stats('started\n') is None
+
+
+def test_import_bali_lazy_subsystems():
+    code = (
+        'import sys, bali; '
+        'print(",".join(m for m in ("fastapi", "uvicorn", "grpc", "kombu", '
+        '"redis", "typer", "fastapi_migrate") if m in sys.modules))'
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ''
@@ -1,13 +1,30 @@
-from typing import Optional
+import asyncio
+import json
+import threading
+from typing import List, Optional
 
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from fastapi_pagination import add_pagination
+from google.protobuf import struct_pb2
 from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, text
 
+from bali.core import cache
 from bali.db import db
 from bali.db.operators import get_filters_expr
 from bali.decorators import action
+from bali.executors import configure_executor, get_executor
+from bali.permissions import AuthCache, BasePermission, auth_cache
 from bali.resources import Resource, pre_process
+from bali.resources import resource as resource_module
+from bali.resources import generic_routes
+from bali.resources.generic_routes import compile_list_params
+from bali.resources.grpc_actions import process_stream_rpc
 from bali.schemas import ListRequest
+from bali.utils import MessageToDict
 from tests.main import IsAuthenticated
 
 DB_URI = 'sqlite:///:memory:'
@@ -81,6 +98,9 @@ def test_resource_instance():
     assert resource._is_http
     assert not resource._is_rpc
 
+    # per request state of base Resource is slotted
+    assert not hasattr(Resource(), '__dict__')
+
 
 def test_resource_generic_actions():
     resource = UserResource()
@@ -100,3 +120,466 @@ class TestResourcePreProcess:
 
         result = pre_process(TestResource)
         assert result is TestResource
+
+
+class NamedAuth(BasePermission):
+    def process_auth(self):
+        request = self.resource._request
+        self.resource.auth = BaseModel.construct(
+            name=request.query_params.get('name')
+        )
+
+
+class ConcurrentResource(Resource):
+    permission_classes = [NamedAuth]
+
+    @action(detail=False)
+    async def whoami(self):
+        await asyncio.sleep(0.01)
+        return {
+            'name': self._request.query_params.get('name'),
+            'auth': self.auth.name,
+        }
+
+
+@pytest.mark.asyncio
+async def test_resource_request_scoped_under_concurrency():
+    app = FastAPI()
+    app.include_router(ConcurrentResource.as_router(), prefix='/concurrents')
+
+    async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+        names = [f'user-{i}' for i in range(20)]
+        responses = await asyncio.gather(
+            *[
+                client.get('/concurrents/whoami', params={'name': name})
+                for name in names
+            ]
+        )
+
+    for name, response in zip(names, responses):
+        assert response.json() == {'name': name, 'auth': name}
+
+
+class TestListParams:
+    filters = {
+        'username': str,
+        'age': Optional[int],
+        'id__in': List[int],
+        'age__between': int,
+        'is_active': Optional[bool],
+    }
+
+    def parse(self, query_string):
+        from starlette.datastructures import QueryParams
+        parse = compile_list_params(self.filters)
+        return parse(QueryParams(query_string))
+
+    def test_filters(self):
+        schema_in = self.parse('username=Lucy&age=13&is_active=false&extra=1')
+        assert isinstance(schema_in, ListRequest)
+        assert schema_in.filters == {
+            'username': 'Lucy',
+            'age': 13,
+            'is_active': False,
+        }
+
+    def test_multi_valued_filters(self):
+        schema_in = self.parse('id__in=1&id__in=2,3&age__between=10,20')
+        assert schema_in.filters == {
+            'id__in': [1, 2, 3],
+            'age__between': [10, 20],
+        }
+
+    def test_convert_failed_filter_ignored(self):
+        schema_in = self.parse('age=thirteen&username=Lucy')
+        assert schema_in.filters == {'username': 'Lucy'}
+
+    def test_offset_limit_ordering(self):
+        schema_in = self.parse('offset=10&limit=5&ordering=-age,username')
+        assert schema_in.offset == 10
+        assert schema_in.limit == 5
+        assert schema_in.ordering == ['-age', 'username']
+
+        schema_in = self.parse('offset=x')
+        assert schema_in.offset == 0
+        assert schema_in.limit == 0
+        assert schema_in.ordering == []
+
+
+class NumberSchema(BaseModel):
+    id: int
+
+
+class NumberResource(Resource):
+    schema = NumberSchema
+    filters = [
+        {'id__in': Optional[List[int]]},
+    ]  # yapf: disable
+
+    @action()
+    def list(self, schema_in: ListRequest = None):
+        ids = schema_in.filters.get('id__in', range(1, 10))
+        return [{'id': i} for i in ids]
+
+
+def test_resource_list_filters():
+    app = FastAPI()
+    app.include_router(NumberResource.as_router(), prefix='/numbers')
+    add_pagination(app)
+    client = TestClient(app)
+
+    response = client.get('/numbers', params={'id__in': [1, 3]})
+    assert response.status_code == 200
+    assert response.json()['items'] == [{'id': 1}, {'id': 3}]
+
+    response = client.get('/numbers?id__in=2,4&limit=1')
+    assert response.json()['items'] == [{'id': 2}]
+    assert response.json()['total'] == 2
+
+
+class StreamResource(Resource):
+    schema = NumberSchema
+    stream_list = True
+    filters = [
+        {'id__in': Optional[List[int]]},
+    ]  # yapf: disable
+
+    @action()
+    def list(self, schema_in: ListRequest = None):
+        ids = schema_in.filters.get('id__in') or range(1, 1201)
+        return ({'id': i} for i in ids)
+
+
+def test_resource_stream_list():
+    app = FastAPI()
+    app.include_router(StreamResource.as_router(), prefix='/streams')
+    client = TestClient(app)
+
+    response = client.get('/streams/stream')
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = response.text.splitlines()
+    assert len(lines) == 1200
+    assert json.loads(lines[-1]) == {'id': 1200}
+
+    response = client.get('/streams/stream?offset=10&limit=2')
+    assert response.text == '{"id": 11}\n{"id": 12}\n'
+
+    response = client.get('/streams/stream?id__in=3,5')
+    assert response.text == '{"id": 3}\n{"id": 5}\n'
+
+    # streamed by the workers of `stream` executor
+    occupancy = get_executor('stream').occupancy()
+    assert occupancy['completed'] >= 3
+    assert occupancy['active'] == 0
+
+    # stream route is generated only when `stream_list` enabled
+    paths = [route.path for route in NumberResource.as_router().routes]
+    assert '/stream' not in paths
+
+
+class BoomStreamResource(StreamResource):
+    @action()
+    def list(self, schema_in: ListRequest = None):
+        if schema_in.filters.get('id__in'):
+            return ({'id': 1 // (i - 2)} for i in schema_in.filters['id__in'])
+        raise HTTPException(status_code=400, detail='boom')
+
+
+@pytest.mark.asyncio
+async def test_resource_stream_list_errors():
+    app = FastAPI()
+    app.include_router(BoomStreamResource.as_router(), prefix='/booms')
+
+    async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+        # errors before the first chunk are responded as errors
+        response = await asyncio.wait_for(client.get('/booms/stream'), 5)
+        assert response.status_code == 400
+
+        with pytest.raises(ZeroDivisionError):
+            await asyncio.wait_for(client.get('/booms/stream?id__in=2'), 5)
+
+    # the workers are released
+    await asyncio.sleep(0.1)
+    assert get_executor('stream').occupancy()['active'] == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_not_consumed_releases_worker(monkeypatch):
+    monkeypatch.setattr(generic_routes, 'STREAM_PUT_TIMEOUT', 0.2)
+    monkeypatch.setattr(generic_routes, 'STREAM_POLL_INTERVAL', 0.05)
+    executor = configure_executor('unconsumed-stream', max_workers=1)
+    closed = threading.Event()
+
+    def numbers():
+        try:
+            yield from range(100)
+        finally:
+            closed.set()
+
+    # the response never started, eg: client disconnected
+    generic_routes.iterate_in_thread(numbers, 'unconsumed-stream')
+    assert await asyncio.get_running_loop().run_in_executor(
+        None, closed.wait, 5
+    )
+    executor.shutdown(wait=True)
+
+
+def test_resource_stream_list_executor_full():
+    class BusyStreamResource(StreamResource):
+        executor = 'busy-stream'
+
+    executor = configure_executor('busy-stream', max_workers=1, max_queue=0)
+    app = FastAPI()
+    app.include_router(BusyStreamResource.as_router(), prefix='/streams')
+    client = TestClient(app)
+
+    released = threading.Event()
+    executor.submit(released.wait)
+    try:
+        response = client.get('/streams/stream')
+        assert response.status_code == 503
+    finally:
+        released.set()
+    executor.shutdown(wait=True)
+
+
+def test_resource_stream_rpc():
+    request = struct_pb2.Struct()
+    request.update({'offset': 0, 'limit': 0, 'filters': {}})
+    resource = StreamResource(request, None, struct_pb2.Struct)
+
+    responses = [
+        MessageToDict(response) for response in process_stream_rpc(resource)
+    ]
+    assert [response['count'] for response in responses] == [500, 500, 200]
+    assert responses[-1]['data'][-1] == {'id': 1200}
+
+
+class AllowedNameAuth(NamedAuth):
+    def has_permission(self):
+        return self.resource.auth.name != 'blocked'
+
+
+class CachedResource(Resource):
+    schema = NumberSchema
+    permission_classes = [AllowedNameAuth]
+    cache = {
+        'list': {'timeout': 60, 'vary_by': ['limit', 'offset']},
+        'whoami': 60,
+    }
+    calls = 0
+    numbers = [1, 2]
+
+    @action()
+    def list(self, schema_in: ListRequest = None):
+        CachedResource.calls += 1
+        return [{'id': i} for i in self.numbers]
+
+    @action()
+    def create(self, schema_in: NumberSchema = None):
+        self.numbers.append(schema_in.id)
+        return schema_in
+
+    @action(detail=False)
+    def whoami(self):
+        CachedResource.calls += 1
+        return {'name': self.auth.name}
+
+
+def test_resource_response_cache():
+    cache.connect('127.0.0.1', prefix='test_service')
+    CachedResource.invalidate_cache()
+
+    app = FastAPI()
+    app.include_router(CachedResource.as_router(), prefix='/cached')
+    add_pagination(app)
+    client = TestClient(app)
+
+    response = client.get('/cached?name=a')
+    assert response.json()['items'] == [{'id': 1}, {'id': 2}]
+    assert CachedResource.calls == 1
+
+    # served from cache, `name` is not in `vary_by`
+    response = client.get('/cached?name=b')
+    assert response.json()['items'] == [{'id': 1}, {'id': 2}]
+    assert response.headers['content-type'] == 'application/json'
+    assert CachedResource.calls == 1
+
+    response = client.get('/cached?name=a&limit=1')
+    assert response.json()['items'] == [{'id': 1}]
+    assert CachedResource.calls == 2
+
+    # permissions are checked before served from cache
+    response = client.get('/cached?name=blocked')
+    assert response.status_code == 403
+
+    # write actions invalidate cached responses
+    response = client.post('/cached?name=a', json={'id': 3})
+    assert response.status_code == 201
+    response = client.get('/cached?name=a')
+    assert response.json()['items'] == [{'id': 1}, {'id': 2}, {'id': 3}]
+    assert CachedResource.calls == 3
+
+    # varies by all query params and auth by default
+    assert client.get('/cached/whoami?name=a').json() == {'name': 'a'}
+    assert client.get('/cached/whoami?name=b').json() == {'name': 'b'}
+    assert client.get('/cached/whoami?name=a').json() == {'name': 'a'}
+    assert CachedResource.calls == 5
+
+
+class TokenAuth(BasePermission):
+    auth_cache_timeout = 60
+    decoded = []
+
+    async def process_auth(self):
+        await asyncio.sleep(0)
+        token = self.get_token()
+        self.decoded.append(token)
+        self.resource.auth = BaseModel.construct(name=token)
+
+
+class IsNamed(TokenAuth):
+    def has_permission(self):
+        return bool(self.resource.auth.name)
+
+
+class IsNotBlocked(TokenAuth):
+    async def has_permission(self):
+        return self.resource.auth.name != 'blocked'
+
+
+class TokenResource(Resource):
+    permission_classes = [IsNamed, IsNotBlocked]
+
+    @action(detail=False)
+    def sync_whoami(self):
+        return {'name': self.auth.name}
+
+    @action(detail=False)
+    async def whoami(self):
+        return {'name': self.auth.name}
+
+
+@pytest.mark.asyncio
+async def test_resource_async_permissions():
+    auth_cache.clear()
+    TokenAuth.decoded.clear()
+
+    app = FastAPI()
+    app.include_router(TokenResource.as_router(), prefix='/tokens')
+
+    async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+        headers = {'Authorization': 'a'}
+        response = await client.get('/tokens/whoami', headers=headers)
+        assert response.json() == {'name': 'a'}
+        # auth is resolved once for both permission classes
+        assert TokenAuth.decoded == ['a']
+
+        # decoded principal is cached by token
+        response = await client.get('/tokens/sync-whoami', headers=headers)
+        assert response.json() == {'name': 'a'}
+        assert TokenAuth.decoded == ['a']
+
+        response = await client.get(
+            '/tokens/whoami', headers={'Authorization': 'blocked'}
+        )
+        assert response.status_code == 403
+        response = await client.get('/tokens/sync-whoami')
+        assert response.status_code == 403
+        assert TokenAuth.decoded == ['a', 'blocked', None]
+
+
+class SessionAuth(BasePermission):
+    reused_sessions = []
+
+    def process_auth(self):
+        # scoped session left by previous requests in the worker thread
+        self.reused_sessions.append(db.s.registry.has())
+        db.s.execute(text('SELECT 1'))
+        self.resource.auth = BaseModel.construct(name='session')
+
+    def has_permission(self):
+        return db.s.execute(text('SELECT 1')).scalar() == 1
+
+
+class SessionResource(Resource):
+    permission_classes = [SessionAuth]
+
+    @action(detail=False)
+    def whoami(self):
+        return {'name': self.auth.name}
+
+
+@pytest.mark.asyncio
+async def test_resource_sync_permissions_remove_session():
+    SessionAuth.reused_sessions.clear()
+    app = FastAPI()
+    app.include_router(SessionResource.as_router(), prefix='/sessions')
+
+    async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+        for _ in range(5):
+            responses = await asyncio.gather(
+                *[client.get('/sessions/whoami') for _ in range(30)]
+            )
+            assert all(r.json() == {'name': 'session'} for r in responses)
+
+    assert len(SessionAuth.reused_sessions) == 150
+    assert not any(SessionAuth.reused_sessions)
+
+
+class ThreadAuth(BasePermission):
+    threads = []
+
+    def has_permission(self):
+        self.threads.append(threading.get_ident())
+        return True
+
+
+class BodyResource(Resource):
+    permission_classes = [ThreadAuth]
+
+    @action(detail=False, methods=['POST'])
+    async def echo(self, schema_in: NumberSchema):
+        # body is read by the endpoint's request before the action
+        return {'size': len(await self._request.body())}
+
+    @action(detail=False)
+    def thread(self):
+        return {'thread': threading.get_ident()}
+
+
+@pytest.mark.asyncio
+async def test_resource_permissions_request_body(monkeypatch):
+    app = FastAPI()
+    app.include_router(BodyResource.as_router(), prefix='/bodies')
+
+    async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+        response = await asyncio.wait_for(
+            client.post('/bodies/echo', json={'id': 1}), timeout=5
+        )
+        assert response.json() == {'size': 9}
+
+        # sync permissions are checked in the sync endpoint's thread,
+        # not in an extra thread pool hop
+        hops = []
+        monkeypatch.setattr(
+            resource_module, 'run_in_threadpool', lambda *a: hops.append(a)
+        )
+        ThreadAuth.threads.clear()
+        response = await client.get('/bodies/thread')
+        assert ThreadAuth.threads == [response.json()['thread']]
+        assert hops == []
+
+
+def test_permission_auth_cache_expires():
+    cache = AuthCache(maxsize=2)
+    cache.set('a', 1, 60)
+    cache.set('b', 2, 0)
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+
+    cache.set('c', 3, 60)
+    cache.set('d', 4, 60)
+    assert cache.get('a') is None
+    assert [cache.get('c'), cache.get('d')] == [3, 4]
@@ -1,7 +1,10 @@
-from sqlalchemy import Column, Integer
+import pytest
+from pydantic import ValidationError, create_model
+from sqlalchemy import Column, Integer, String
 
 from bali.db import db
-from bali.schemas import model_to_schema
+from bali.declarative import API
+from bali.schemas import SchemaRegistry, model_to_schema, schema_registry
 
 DB_URI = 'sqlite:///:memory:'
 
@@ -50,3 +53,58 @@ def test_model_to_schema_from_orm():
     assert user_schema.dict() == expected, 'Schema to dict value should equal origin model'
 
 
+
+
+def test_model_to_schema_registry():
+    class Post(db.BaseModel):
+        __tablename__ = "registry_posts"
+        id = Column(Integer, primary_key=True)
+        title = Column(String(20))
+
+    schema = model_to_schema(Post, partial=True)
+    assert model_to_schema(Post, partial=True) is schema
+    assert model_to_schema(Post) is not schema
+    assert model_to_schema(Post, exclude=['id', 'title']) is model_to_schema(
+        Post, exclude={'title', 'id'}
+    )
+    assert model_to_schema(Post, partial=True, cache=False) is not schema
+
+    entries = [i for i in schema_registry.schemas() if i['key'][0] is Post]
+    assert len(entries) == 3
+    assert entries[0]['schema'] == 'Post'
+    assert entries[0]['hits'] == 1
+    assert 'title' in entries[0]['fields']
+    assert 'title' not in entries[2]['fields']
+
+    stats = schema_registry.stats()
+    assert stats['schemas'] == len(schema_registry)
+    assert stats['hits'] >= 2
+    assert stats['build_time'] > 0
+
+
+def test_declarative_schema_registry():
+    response = {'hello': 'world'}
+    first = API('RegistryGreeter').list([response]).get(response)
+    second = API('RegistryGreeter').get(dict(response))
+    assert first._schema is second._schema
+    # keyed by field types, not values
+    assert API('RegistryGreeter').get({'hello': 'bali'})._schema is first._schema
+    assert API('RegistryGreeter').get({'hello': 1})._schema is not first._schema
+
+    # values of the first response are not defaults of the shared schema
+    assert first._schema.__fields__['hello'].required
+    with pytest.raises(ValidationError):
+        first._schema()
+
+
+def test_schema_registry_clear():
+    registry = SchemaRegistry()
+    schema = registry.get_or_create('key', lambda: create_model('Empty'))
+    assert registry.get_or_create('key', lambda: None) is schema
+    assert 'key' in registry
+
+    registry.clear()
+    assert len(registry) == 0
+    assert registry.stats() == {
+        'schemas': 0, 'hits': 0, 'misses': 0, 'build_time': 0
+    }
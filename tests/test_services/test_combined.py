@@ -0,0 +1,60 @@
+import asyncio
+import socket
+
+import grpc
+import httpx
+import pytest
+import uvicorn
+
+from bali import Bali, APIRouter
+from bali.launcher import serve_combined
+from . import helloworld_rpc_service
+from .protos import helloworld_pb2 as pb2
+from .protos import helloworld_pb2_grpc as pb2_grpc
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.asyncio
+async def test_serve_http_and_rpc_in_one_loop():
+    Bali.__clear__()
+
+    router = APIRouter()
+
+    @router.get('/')
+    async def read_main():
+        return {'msg': 'Hello World'}
+
+    http_port, rpc_port = get_free_port(), get_free_port()
+    app = Bali(
+        title='helloworld',
+        rpc_service=helloworld_rpc_service,
+        routers=[{'router': router, 'prefix': '/api'}],
+        http_host='127.0.0.1',
+        http_port=http_port,
+        rpc_host='127.0.0.1',
+        rpc_port=rpc_port,
+    )
+
+    config = uvicorn.Config(app, host='127.0.0.1', port=http_port)
+    http_server = uvicorn.Server(config)
+    task = asyncio.ensure_future(serve_combined(app, http_server))
+    while not http_server.started:
+        await asyncio.sleep(0.05)
+
+    async with httpx.AsyncClient(follow_redirects=True) as client:
+        response = await client.get(f'http://127.0.0.1:{http_port}/api')
+        assert response.json() == {'msg': 'Hello World'}
+
+    async with grpc.aio.insecure_channel(f'127.0.0.1:{rpc_port}') as channel:
+        stub = pb2_grpc.HelloworldStub(channel)
+        response = await stub.SayHello(pb2.HelloRequest(name='Bali'))
+        assert response.message == 'Hello, Bali!'
+
+    http_server.should_exit = True
+    await asyncio.wait_for(task, timeout=10)
+    Bali.__clear__()
@@ -0,0 +1,148 @@
+import asyncio
+import inspect
+import socket
+import types
+
+import grpc
+import pytest
+
+from bali import Bali, Resource
+from bali.aio.interceptors import ProcessInterceptor
+from bali.decorators import action
+from bali.servicer import make_grpc_aio_server, make_grpc_serve
+from .protos import helloworld_pb2 as pb2
+from .protos import helloworld_pb2_grpc as pb2_grpc
+
+
+class HelloworldServicer(pb2_grpc.HelloworldServicer):
+    async def SayHello(self, request, context):
+        await asyncio.sleep(0)
+        return pb2.HelloReply(message='Hello, %s!' % request.name)
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def create_app(**kwargs):
+    Bali.__clear__()
+    return Bali(
+        title='helloworld',
+        rpc_service=types.SimpleNamespace(
+            HelloworldServicer=HelloworldServicer
+        ),
+        **kwargs,
+    )
+
+
+def test_make_grpc_serve_aio_option():
+    app = create_app(rpc_aio=True)
+    assert inspect.iscoroutinefunction(make_grpc_serve(app))
+    assert not inspect.iscoroutinefunction(make_grpc_serve(app, aio=False))
+
+
+@pytest.mark.asyncio
+async def test_aio_server_async_servicer():
+    rpc_port = get_free_port()
+    app = create_app(
+        rpc_host='127.0.0.1',
+        rpc_port=rpc_port,
+        rpc_compression='gzip',
+        rpc_maximum_concurrent_rpcs=100,
+    )
+
+    server = make_grpc_aio_server(app)
+    await server.start()
+    async with grpc.aio.insecure_channel(f'127.0.0.1:{rpc_port}') as channel:
+        stub = pb2_grpc.HelloworldStub(channel)
+        responses = await asyncio.gather(
+            *[stub.SayHello(pb2.HelloRequest(name=str(i))) for i in range(50)]
+        )
+    await server.stop(None)
+
+    assert [r.message for r in responses] == [
+        'Hello, %s!' % i for i in range(50)
+    ]
+
+
+def test_async_action_generates_async_servicer():
+    app = create_app()
+
+    class GreeterResource(Resource):
+        @action(detail=False)
+        async def hello(self, schema_in: pb2.HelloRequest = None):
+            return {'message': 'hello'}
+
+    GreeterResource.as_servicer(app)
+
+    assert inspect.iscoroutinefunction(app.rpc_servicer.HelloGreeter)
+    Bali.__clear__()
+
+
+class RecordingInterceptor(ProcessInterceptor):
+    def __init__(self):
+        self.calls = []
+
+    def setup(self):
+        self.calls.append('setup')
+
+    def teardown(self):
+        self.calls.append('teardown')
+        super().teardown()
+
+
+def replies(request):
+    return [pb2.HelloReply(message=str(i)) for i in range(int(request.name))]
+
+
+async def async_count(request, context):
+    for reply in replies(request):
+        await asyncio.sleep(0)
+        yield reply
+
+
+def count(request, context):
+    yield from replies(request)
+
+
+async def write_count(request, context):
+    for reply in replies(request):
+        await context.write(reply)
+
+
+@pytest.mark.asyncio
+async def test_aio_interceptor_unary_stream():
+    rpc_port = get_free_port()
+    interceptor = RecordingInterceptor()
+    server = grpc.aio.server(interceptors=[interceptor])
+    server.add_generic_rpc_handlers([
+        grpc.method_handlers_generic_handler('test.Counter', {
+            name: grpc.unary_stream_rpc_method_handler(
+                behavior,
+                request_deserializer=pb2.HelloRequest.FromString,
+                response_serializer=pb2.HelloReply.SerializeToString,
+            )
+            for name, behavior in [
+                ('AsyncCount', async_count),
+                ('Count', count),
+                ('WriteCount', write_count),
+            ]
+        })
+    ])  # yapf: disable
+    server.add_insecure_port(f'127.0.0.1:{rpc_port}')
+    await server.start()
+    async with grpc.aio.insecure_channel(f'127.0.0.1:{rpc_port}') as channel:
+        for name in ('AsyncCount', 'Count', 'WriteCount'):
+            interceptor.calls.clear()
+            call = channel.unary_stream(
+                f'/test.Counter/{name}',
+                request_serializer=pb2.HelloRequest.SerializeToString,
+                response_deserializer=pb2.HelloReply.FromString,
+            )
+            responses = [r.message async for r in call(pb2.HelloRequest(name='3'))]
+            # setup/teardown wrap the whole response stream
+            assert responses == ['0', '1', '2']
+            assert interceptor.calls == ['setup', 'teardown']
+    await server.stop(None)
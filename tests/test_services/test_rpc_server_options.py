@@ -0,0 +1,45 @@
+import grpc
+import pytest
+
+from bali import Bali
+from bali.servicer import get_grpc_server_options, make_thread_pool
+
+
+class TestRpcServerOptions:
+    def setup_method(self):
+        Bali.__clear__()
+
+    def teardown_method(self):
+        Bali.__clear__()
+
+    def test_default_options(self):
+        app = Bali()
+        options = get_grpc_server_options(app)
+        assert options == {
+            'options': [],
+            'maximum_concurrent_rpcs': None,
+            'compression': None,
+        }
+        assert make_thread_pool(app)._max_workers == 10
+
+    def test_custom_options(self):
+        app = Bali(
+            rpc_max_workers=32,
+            rpc_maximum_concurrent_rpcs=1000,
+            rpc_max_receive_message_length=1024,
+            rpc_keepalive_time_ms=30000,
+            rpc_compression='gzip',
+            rpc_options=[('grpc.so_reuseport', 0)],
+        )
+        options = get_grpc_server_options(app)
+        assert options['maximum_concurrent_rpcs'] == 1000
+        assert options['compression'] == grpc.Compression.Gzip
+        assert ('grpc.max_receive_message_length', 1024) in options['options']
+        assert ('grpc.keepalive_time_ms', 30000) in options['options']
+        assert ('grpc.so_reuseport', 0) in options['options']
+        assert make_thread_pool(app)._max_workers == 32
+
+    def test_unknown_compression(self):
+        app = Bali(rpc_compression='brotli')
+        with pytest.raises(KeyError):
+            get_grpc_server_options(app)